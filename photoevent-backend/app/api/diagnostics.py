@@ -0,0 +1,43 @@
+"""
+Routes de diagnostic des performances (administration)
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+
+from app.core.profiling import profile_store
+from app.core.security import require_admin
+from app.core.tracing import trace_recorder
+
+router = APIRouter()
+
+
+@router.get("/traces/slowest", dependencies=[Depends(require_admin)])
+async def get_slowest_traces(
+    limit: int = Query(20, ge=1, le=200),
+    route: Optional[str] = Query(None, description="Ex: 'POST /api/v1/search/face'")
+):
+    """
+    Traces récentes les plus lentes
+    Durée de chaque étape (décodage, détection, reconnaissance, index, scoring, enrichissement...)
+    """
+    return {"traces": trace_recorder.slowest(limit=limit, route=route)}
+
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Profils enregistrés (du plus récent au plus ancien)"""
+    return {"profiles": profile_store.list()}
+
+
+@router.get("/profiles/{name}", dependencies=[Depends(require_admin)])
+async def download_profile(name: str):
+    """Télécharger un profil (collapsed stacks : flamegraph.pl, speedscope, inferno)"""
+    path = profile_store.path_of(name)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profil {name} non trouvé"
+        )
+    return FileResponse(path, media_type="text/plain", filename=name)
@@ -1,11 +1,16 @@
 """
 Routes API pour les photos
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, status, Depends, Form
+from fastapi import APIRouter, UploadFile, File, HTTPException, status, Depends, Form, Query, Request
 from fastapi.responses import StreamingResponse
-from typing import List
+from typing import List, Optional
 from sqlalchemy.orm import Session
+import asyncio
+import base64
+import binascii
+import json
 import os
+import uuid
 from pathlib import Path
 from datetime import datetime
 from bson.objectid import ObjectId
@@ -13,6 +18,14 @@ from app.database import get_db, get_mongodb
 from app.schemas import PhotoUploadResponse
 from app.db.models import Event
 from app.services.face_recognition import get_face_service
+from app.services.face_index import add_event_faces, delete_event_photo
+from app.services.session_matcher import match_new_faces
+from app.services.progress import progress_broker, progress_snapshot
+from app.services.event_stats import get_event_stats, record_faces_added, record_photo_added, record_photos_removed
+from app.services.storage_integrity import check_storage_integrity, integrity_jobs
+from app.core.security import require_admin
+from app.core.config import settings
+from app.core.tracing import span
 from PIL import Image
 import io
 
@@ -54,11 +67,87 @@ def compress_image(file_content: bytes, quality: int = COMPRESSION_QUALITY) -> b
         return file_content  # Retourner l'original si erreur
 
 
+def make_thumbnail(file_content: bytes, size: int = 200, quality: int = 80) -> bytes:
+    """Miniature JPEG (size x size max) d'une photo"""
+    img = Image.open(io.BytesIO(file_content))
+    img.thumbnail((size, size), Image.Resampling.LANCZOS)
+    
+    # Convertir RGBA en RGB
+    if img.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+        img = background
+    
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=quality, optimize=False)
+    return output.getvalue()
+
+
+def compress_and_save(original_content: bytes, file_path: Path) -> bytes:
+    """Compresser et écrire la photo (exécuté dans un thread, hors boucle d'événements)"""
+    with span("compress"):
+        compressed_content = compress_image(original_content)
+    with span("write_file"), open(file_path, "wb") as buffer:
+        buffer.write(compressed_content)
+    return compressed_content
+
+
+def insert_photo(mongo_db, photo_doc: dict):
+    """Document photo et compteur event_stats (exécuté dans un thread)"""
+    with span("photo_insert"):
+        result = mongo_db.photos.insert_one(photo_doc)
+    record_photo_added(mongo_db, photo_doc["event_id"])
+    return result.inserted_id
+
+
+def process_photo_faces(mongo_db, event_id: int, photo_oid: ObjectId, file_path: Path) -> int:
+    """
+    Détection et encodage des visages, index de recherche, sessions kiosque,
+    statut de la photo (exécuté dans un thread : la boucle continue de
+    diffuser la progression SSE pendant le traitement)
+
+    Returns:
+        Nombre de visages retenus
+    """
+    face_service = get_face_service()
+    faces, skipped = face_service.extract_faces_with_stats(str(file_path))
+    
+    # Sauvegarder chaque visage dans MongoDB
+    faces_collection = mongo_db.faces
+    face_docs = []
+    for face in faces:
+        face_doc = {
+            "photo_id": photo_oid,
+            "event_id": event_id,
+            "embedding": face['embedding'],
+            "bbox": face['bbox'],
+            "confidence": face['confidence'],
+            "created_at": datetime.now()
+        }
+        with span("faces_insert"):
+            faces_collection.insert_one(face_doc)
+        face_docs.append(face_doc)
+    # Segment mutable de l'index : consultable sans reconstruction
+    with span("index_append"):
+        add_event_faces(event_id, face_docs)
+    # Recherche inverse : galeries des sessions kiosque actives
+    with span("session_match"):
+        match_new_faces(event_id, face_docs)
+    
+    # Mettre à jour le statut de la photo
+    mongo_db.photos.update_one(
+        {"_id": photo_oid},
+        {"$set": {"status": "ready", "faces_count": len(faces), "faces_skipped": skipped}}
+    )
+    record_faces_added(mongo_db, event_id, len(faces))
+    return len(faces)
+
 
 @router.post("/upload", response_model=List[PhotoUploadResponse])
 async def upload_photos(
     event_id: int = Form(..., description="ID de l'événement"),
     files: List[UploadFile] = File(..., description="Photos à uploader"),
+    batch_id: Optional[str] = Form(None, description="Lot d'upload (généré si absent)"),
     db: Session = Depends(get_db)
 ):
     """Upload multiple photos pour un événement"""
@@ -82,28 +171,27 @@ async def upload_photos(
     mongo_db = get_mongodb()
     photos_collection = mongo_db.photos
     
-    for file in files:
-        # Vérifier l'extension
-        if not file.filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-            continue
+    # Lot suivi en direct par les abonnés SSE de l'événement
+    batch_id = batch_id or uuid.uuid4().hex
+    valid_files = [f for f in files if f.filename.lower().endswith(('.jpg', '.jpeg', '.png'))]
+    progress_broker.start_batch(event_id, batch_id, len(valid_files))
+    
+    for batch_index, file in enumerate(valid_files):
         
         # Générer un nom unique
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         unique_filename = f"{event.code}_{timestamp}_{file.filename}"
         file_path = UPLOAD_DIR / unique_filename
         
-        # Lire et compresser le fichier
-        original_content = await file.read()
-        compressed_content = compress_image(original_content)
+        # Lire, compresser et sauvegarder le fichier (hors boucle d'événements)
+        with span("read"):
+            original_content = await file.read()
+        compressed_content = await asyncio.to_thread(compress_and_save, original_content, file_path)
         
         # Calculer la économie d'espace
         compression_ratio = len(compressed_content) / len(original_content) if original_content else 1
         saved_mb = (len(original_content) - len(compressed_content)) / (1024 * 1024)
         
-        # Sauvegarder le fichier compressé localement
-        with open(file_path, "wb") as buffer:
-            buffer.write(compressed_content)
-        
         # Créer le document MongoDB
         # IMPORTANT: Sauvegarder le chemin relatif, pas le chemin absolu
         photo_doc = {
@@ -116,49 +204,38 @@ async def upload_photos(
             "file_size": len(compressed_content),
             "original_size": len(original_content),
             "compression_ratio": round(compression_ratio, 2),
-            "storage_saved_mb": round(saved_mb, 2)
+            "storage_saved_mb": round(saved_mb, 2),
+            "batch_id": batch_id,
+            "batch_index": batch_index
         }
         
-        result = photos_collection.insert_one(photo_doc)
-        photo_doc["_id"] = str(result.inserted_id)
+        photo_oid = await asyncio.to_thread(insert_photo, mongo_db, photo_doc)
+        photo_doc["_id"] = str(photo_oid)
+        photo_id = str(photo_oid)
+        progress_broker.publish(event_id, batch_id, photo_id, "pending", batch_index, file.filename)
         
-        # Traiter les visages immédiatement
+        # Traiter les visages immédiatement (thread : la progression est diffusée pendant le traitement)
         try:
-            face_service = get_face_service()
-            faces = face_service.extract_faces_from_image(str(file_path))
-            
-            # Sauvegarder chaque visage dans MongoDB
-            faces_collection = mongo_db.faces
-            for face in faces:
-                face_doc = {
-                    "photo_id": result.inserted_id,
-                    "event_id": event_id,
-                    "embedding": face['embedding'],
-                    "bbox": face['bbox'],
-                    "confidence": face['confidence'],
-                    "created_at": datetime.now()
-                }
-                faces_collection.insert_one(face_doc)
-            
-            # Mettre à jour le statut de la photo
-            photos_collection.update_one(
-                {"_id": result.inserted_id},
-                {"$set": {"status": "ready", "faces_count": len(faces)}}
-            )
+            progress_broker.publish(event_id, batch_id, photo_id, "processing", batch_index, file.filename)
+            faces_count = await asyncio.to_thread(process_photo_faces, mongo_db, event_id, photo_oid, file_path)
+            progress_broker.publish(event_id, batch_id, photo_id, "ready", batch_index, file.filename, faces_count=faces_count)
             
         except Exception as e:
             print(f"Erreur traitement visages pour {unique_filename}: {e}")
-            photos_collection.update_one(
-                {"_id": result.inserted_id},
+            await asyncio.to_thread(
+                photos_collection.update_one,
+                {"_id": photo_oid},
                 {"$set": {"status": "error"}}
             )
+            progress_broker.publish(event_id, batch_id, photo_id, "error", batch_index, file.filename, error=str(e))
         
         uploaded_photos.append(PhotoUploadResponse(
-            photo_id=str(result.inserted_id),
+            photo_id=photo_id,
             filename=unique_filename,
             event_id=event_id,
             status="ready",
-            uploaded_at=datetime.now()
+            uploaded_at=datetime.now(),
+            batch_id=batch_id
         ))
     
     if not uploaded_photos:
@@ -189,6 +266,15 @@ async def get_event_photos(
     photos_from_db = list(mongo_db.photos.find({"event_id": event_id}))
     faces_collection = mongo_db.faces
     
+    # Visages par photo en une seule agrégation
+    faces_per_photo = {
+        row["_id"]: row["count"]
+        for row in faces_collection.aggregate([
+            {"$match": {"event_id": event_id}},
+            {"$group": {"_id": "$photo_id", "count": {"$sum": 1}}}
+        ])
+    }
+    
     # Vérifier que les fichiers existent réellement
     valid_photos = []
     for photo in photos_from_db:
@@ -208,9 +294,7 @@ async def get_event_photos(
         else:
             photo["file_exists"] = False
         
-        # Compter les faces détectées pour cette photo
-        faces_count = faces_collection.count_documents({"photo_id": photo_id})
-        photo["faces_detected"] = faces_count
+        photo["faces_detected"] = faces_per_photo.get(photo_id, 0)
         
         valid_photos.append(photo)
     
@@ -227,15 +311,57 @@ async def get_event_photos(
     }
 
 
+# Champs renvoyés par la liste paginée (pas de document brut)
+PHOTO_LIST_FIELDS = {
+    "filename": 1, "original_filename": 1, "status": 1, "uploaded_at": 1,
+    "faces_count": 1, "file_size": 1, "batch_id": 1
+}
 
-@router.get("/event/{event_id}/verify")
-async def verify_event_photos(
+
+def encode_cursor(photo: dict) -> str:
+    """
+    Curseur opaque : position (uploaded_at, _id) de la dernière photo de la page
+    
+    uploaded_at absent ou non daté (anciens documents) : "u" vaut null, la
+    pagination se poursuit parmi les photos non datées, triées par _id.
+    """
+    uploaded_at = photo.get("uploaded_at")
+    raw = json.dumps({
+        "u": uploaded_at.isoformat() if isinstance(uploaded_at, datetime) else None,
+        "id": str(photo["_id"])
+    })
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """(uploaded_at ou None pour une photo non datée, _id)"""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        uploaded_at = None if raw["u"] is None else datetime.fromisoformat(raw["u"])
+        return uploaded_at, ObjectId(raw["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Curseur invalide: {str(e)}"
+        )
+
+
+@router.get("/event/{event_id}/list")
+async def list_event_photos(
     event_id: int,
+    cursor: Optional[str] = Query(None, description="next_cursor de la page précédente"),
+    limit: int = Query(100, ge=1, le=500),
     db: Session = Depends(get_db)
 ):
-    """Vérifier l'intégrité des photos d'un événement"""
+    """
+    Photos d'un événement, paginées par curseur (plus récentes d'abord)
     
-    # Vérifier que l'événement existe
+    Tri (uploaded_at, _id) décroissant servi par idx_photos_event_uploaded :
+    chaque page coûte O(limit) quelle que soit sa position. Les photos sans
+    uploaded_at daté viennent ensuite, triées par _id (idx_photos_event_id). Champs projetés,
+    visages lus dans faces_count, total lu dans event_stats ; la présence des
+    fichiers se vérifie via /event/{event_id}/verify.
+    """
     event = db.query(Event).filter(Event.id == event_id).first()
     if not event:
         raise HTTPException(
@@ -243,42 +369,143 @@ async def verify_event_photos(
             detail=f"Événement {event_id} non trouvé"
         )
     
+    uploaded_at = last_id = None
+    if cursor:
+        uploaded_at, last_id = decode_cursor(cursor)
+    
     mongo_db = get_mongodb()
-    photos_from_db = list(mongo_db.photos.find({"event_id": event_id}))
+    docs = []
+    # 1. Photos datées, (uploaded_at, _id) décroissant
+    if last_id is None or uploaded_at is not None:
+        query = {"event_id": event_id, "uploaded_at": {"$type": "date"}}
+        if last_id is not None:
+            query["$or"] = [
+                {"uploaded_at": {"$lt": uploaded_at}},
+                {"uploaded_at": uploaded_at, "_id": {"$lt": last_id}}
+            ]
+        docs = list(
+            mongo_db.photos.find(query, PHOTO_LIST_FIELDS)
+            .sort([("uploaded_at", -1), ("_id", -1)])
+            .limit(limit + 1)
+        )
+    # 2. Puis photos sans date exploitable, _id décroissant
+    if len(docs) <= limit:
+        query = {"event_id": event_id, "uploaded_at": {"$not": {"$type": "date"}}}
+        if last_id is not None and uploaded_at is None:
+            query["_id"] = {"$lt": last_id}
+        docs += list(
+            mongo_db.photos.find(query, PHOTO_LIST_FIELDS)
+            .sort("_id", -1)
+            .limit(limit + 1 - len(docs))
+        )
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    
+    photos = [
+        {
+            "id": str(doc["_id"]),
+            "filename": doc.get("filename"),
+            "original_filename": doc.get("original_filename"),
+            "status": doc.get("status"),
+            "uploaded_at": doc.get("uploaded_at"),
+            "faces_count": doc.get("faces_count", 0),
+            "file_size": doc.get("file_size"),
+            "batch_id": doc.get("batch_id")
+        }
+        for doc in docs
+    ]
+    stats = get_event_stats(mongo_db, event_id)
     
-    missing_files = []
-    valid_files = []
+    return {
+        "event_id": event_id,
+        "photos": photos,
+        "next_cursor": encode_cursor(docs[-1]) if has_more else None,
+        "limit": limit,
+        "total": stats["photos"],
+        "total_faces": stats["faces"]
+    }
+
+
+def sse_message(event_type: str, data: dict) -> str:
+    """Trame Server-Sent Events"""
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/event/{event_id}/progress")
+async def stream_event_progress(
+    event_id: int,
+    request: Request,
+    batch_id: Optional[str] = Query(None, description="Suivre un seul lot d'upload"),
+    db: Session = Depends(get_db)
+):
+    """
+    Progression du traitement en Server-Sent Events (remplace le polling de /event/{event_id})
     
-    for photo in photos_from_db:
-        file_path_str = photo.get("file_path", "")
-        filename = photo.get("filename", "")
-        
-        # Convertir en Path et rendre absolu si nécessaire
-        file_path = Path(file_path_str)
-        if not file_path.is_absolute():
-            file_path = Path.cwd() / file_path
-        
-        if file_path.exists():
-            valid_files.append({
-                "id": str(photo.get("_id")),
-                "filename": filename,
-                "status": "OK"
-            })
-        else:
-            missing_files.append({
-                "id": str(photo.get("_id")),
-                "filename": filename,
-                "expected_path": str(file_path),
-                "status": "MISSING"
-            })
+    - snapshot : compteurs par statut (une agrégation MongoDB), à la connexion
+      puis toutes les PROGRESS_SNAPSHOT_SECONDS sans activité
+    - batch : début d'un lot d'upload
+    - photo : transition pending -> processing -> ready / error d'une photo,
+      avec visages trouvés et agrégat du lot (débit, temps restant)
+    """
+    event = db.query(Event).filter(Event.id == event_id).first()
+    if not event:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Événement {event_id} non trouvé"
+        )
+    
+    mongo_db = get_mongodb()
+    
+    async def events():
+        with progress_broker.subscribe(event_id, batch_id) as subscriber:
+            # Reconnexion automatique du navigateur (EventSource) après 3 s
+            yield "retry: 3000\n\n"
+            snapshot = await asyncio.to_thread(progress_snapshot, mongo_db, event_id, batch_id)
+            yield sse_message("snapshot", snapshot)
+            while not await request.is_disconnected():
+                message = await subscriber.get(timeout=settings.PROGRESS_SNAPSHOT_SECONDS)
+                if message is None:
+                    snapshot = await asyncio.to_thread(progress_snapshot, mongo_db, event_id, batch_id)
+                    yield sse_message("snapshot", snapshot)
+                else:
+                    yield sse_message(message["type"], message)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+
+@router.get("/event/{event_id}/verify")
+async def verify_event_photos(
+    event_id: int,
+    db: Session = Depends(get_db)
+):
+    """Vérifier l'intégrité des photos d'un événement (un parcours du répertoire, un curseur)"""
+    
+    # Vérifier que l'événement existe
+    event = db.query(Event).filter(Event.id == event_id).first()
+    if not event:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Événement {event_id} non trouvé"
+        )
+    
+    report = await asyncio.to_thread(check_storage_integrity, get_mongodb(), UPLOAD_DIR, event_id=event_id)
     
     return {
         "event_id": event_id,
         "event_code": event.code,
-        "total_in_db": len(photos_from_db),
-        "valid_files": len(valid_files),
-        "missing_files": len(missing_files),
-        "missing": missing_files
+        "total_in_db": report.photos_checked,
+        "valid_files": report.photos_checked - report.missing_photos,
+        "missing_files": report.missing_photos,
+        "orphan_faces": report.orphan_faces,
+        "missing": [
+            {"id": m["id"], "filename": m["filename"], "expected_path": m["expected_path"], "status": "MISSING"}
+            for m in report.missing
+        ]
     }
 
 
@@ -287,7 +514,7 @@ async def cleanup_missing_photos(
     event_id: int,
     db: Session = Depends(get_db)
 ):
-    """Supprimer les photos manquantes de la base de données"""
+    """Supprimer les photos manquantes et leurs visages de la base de données"""
     
     # Vérifier que l'événement existe
     event = db.query(Event).filter(Event.id == event_id).first()
@@ -297,35 +524,57 @@ async def cleanup_missing_photos(
             detail=f"Événement {event_id} non trouvé"
         )
     
-    mongo_db = get_mongodb()
-    photos_from_db = list(mongo_db.photos.find({"event_id": event_id}))
-    
-    deleted_count = 0
-    deleted_files = []
-    
-    for photo in photos_from_db:
-        file_path_str = photo.get("file_path", "")
-        
-        # Convertir en Path et rendre absolu si nécessaire
-        file_path = Path(file_path_str)
-        if not file_path.is_absolute():
-            file_path = Path.cwd() / file_path
-        
-        # Si le fichier n'existe pas, supprimer l'enregistrement
-        if not file_path.exists():
-            result = mongo_db.photos.delete_one({"_id": photo["_id"]})
-            if result.deleted_count > 0:
-                deleted_count += 1
-                deleted_files.append(photo.get("filename", "unknown"))
+    report = await asyncio.to_thread(
+        check_storage_integrity, get_mongodb(), UPLOAD_DIR, event_id=event_id, repair=True
+    )
     
     return {
         "event_id": event_id,
-        "deleted_count": deleted_count,
-        "deleted_files": deleted_files,
-        "message": f"{deleted_count} photo(s) orpheline(s) supprimée(s)"
+        "deleted_count": report.deleted_photos,
+        "deleted_faces": report.deleted_faces,
+        "deleted_files": [m["filename"] or "unknown" for m in report.missing],
+        "message": f"{report.deleted_photos} photo(s) orpheline(s) supprimée(s)"
     }
 
 
+@router.post("/integrity/jobs", status_code=status.HTTP_202_ACCEPTED, tags=["admin"],
+             dependencies=[Depends(require_admin)])
+async def start_integrity_job(
+    event_id: Optional[int] = Query(None, description="Limiter à un événement (sans détection des fichiers orphelins)"),
+    repair: bool = Query(False, description="Supprimer photos manquantes et visages orphelins"),
+    orphans: str = Query("report", pattern="^(report|quarantine)$", description="Fichiers orphelins : signaler ou mettre en quarantaine")
+):
+    """Lancer en tâche de fond l'analyse d'intégrité de tout le stockage (suivi : GET /integrity/jobs/{job_id})"""
+    try:
+        report = integrity_jobs.start(
+            get_mongodb(), UPLOAD_DIR, event_id=event_id, repair=repair, orphans_action=orphans
+        )
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    return report.to_dict()
+
+
+@router.get("/integrity/jobs", tags=["admin"], dependencies=[Depends(require_admin)])
+async def list_integrity_jobs():
+    """Analyses d'intégrité récentes (plus récente d'abord)"""
+    return {"jobs": [report.to_dict() for report in integrity_jobs.list()]}
+
+
+@router.get("/integrity/jobs/{job_id}", tags=["admin"], dependencies=[Depends(require_admin)])
+async def get_integrity_job(job_id: str):
+    """Progression et résultat d'une analyse d'intégrité"""
+    report = integrity_jobs.get(job_id)
+    if report is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Analyse {job_id} non trouvée"
+        )
+    return report.to_dict()
+
+
 @router.post("/migrate-paths")
 async def migrate_file_paths(db: Session = Depends(get_db)):
     """Migrer tous les chemins absolus vers des chemins relatifs (une seule fois)"""
@@ -364,6 +613,7 @@ async def migrate_file_paths(db: Session = Depends(get_db)):
 async def upload_photos_fast(
     event_id: int = Form(..., description="ID de l'événement"),
     files: List[UploadFile] = File(..., description="Photos à uploader"),
+    batch_id: Optional[str] = Form(None, description="Lot d'upload (généré si absent)"),
     db: Session = Depends(get_db)
 ):
     """Upload rapide: compresse et sauvegarde SANS détection faciale immédiate (optimisé pour vitesse)"""
@@ -385,12 +635,14 @@ async def upload_photos_fast(
     
     uploaded_photos = []
     mongo_db = get_mongodb()
-    photos_collection = mongo_db.photos
     
-    for file in files:
-        # Vérifier l'extension
-        if not file.filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-            continue
+    # Lot suivi en direct par les abonnés SSE de l'événement
+    batch_id = batch_id or uuid.uuid4().hex
+    valid_files = [f for f in files if f.filename.lower().endswith(('.jpg', '.jpeg', '.png'))]
+    progress_broker.start_batch(event_id, batch_id, len(valid_files))
+    
+    for batch_index, file in enumerate(valid_files):
+        photo_id = None
         
         try:
             # Générer un nom unique
@@ -398,18 +650,15 @@ async def upload_photos_fast(
             unique_filename = f"{event.code}_{timestamp}_{file.filename}"
             file_path = UPLOAD_DIR / unique_filename
             
-            # Lire et compresser le fichier
-            original_content = await file.read()
-            compressed_content = compress_image(original_content)
+            # Lire, compresser et sauvegarder le fichier (hors boucle d'événements)
+            with span("read"):
+                original_content = await file.read()
+            compressed_content = await asyncio.to_thread(compress_and_save, original_content, file_path)
             
             # Calculer la économie d'espace
             compression_ratio = len(compressed_content) / len(original_content) if original_content else 1
             saved_mb = (len(original_content) - len(compressed_content)) / (1024 * 1024)
             
-            # Sauvegarder le fichier compressé localement
-            with open(file_path, "wb") as buffer:
-                buffer.write(compressed_content)
-            
             # Créer le document MongoDB
             photo_doc = {
                 "event_id": event_id,
@@ -422,49 +671,38 @@ async def upload_photos_fast(
                 "original_size": len(original_content),
                 "compression_ratio": round(compression_ratio, 2),
                 "storage_saved_mb": round(saved_mb, 2),
-                "faces_count": 0  # Sera mis à jour en arrière-plan
+                "faces_count": 0,  # Sera mis à jour en arrière-plan
+                "batch_id": batch_id,
+                "batch_index": batch_index
             }
             
-            result = photos_collection.insert_one(photo_doc)
+            photo_oid = await asyncio.to_thread(insert_photo, mongo_db, photo_doc)
+            photo_id = str(photo_oid)
+            progress_broker.publish(event_id, batch_id, photo_id, "pending", batch_index, file.filename)
             
             uploaded_photos.append(PhotoUploadResponse(
-                photo_id=str(result.inserted_id),
+                photo_id=photo_id,
                 filename=unique_filename,
                 event_id=event_id,
                 status="pending",
-                uploaded_at=datetime.now()
+                uploaded_at=datetime.now(),
+                batch_id=batch_id
             ))
             
             # Traiter les visages en arrière-plan (sans bloquer la réponse)
             try:
-                face_service = get_face_service()
-                faces = face_service.extract_faces_from_image(str(file_path))
-                
-                # Sauvegarder chaque visage dans MongoDB
-                faces_collection = mongo_db.faces
-                for face in faces:
-                    face_doc = {
-                        "photo_id": result.inserted_id,
-                        "event_id": event_id,
-                        "embedding": face['embedding'],
-                        "bbox": face['bbox'],
-                        "confidence": face['confidence'],
-                        "created_at": datetime.now()
-                    }
-                    faces_collection.insert_one(face_doc)
-                
-                # Mettre à jour le statut de la photo
-                photos_collection.update_one(
-                    {"_id": result.inserted_id},
-                    {"$set": {"status": "ready", "faces_count": len(faces)}}
-                )
+                progress_broker.publish(event_id, batch_id, photo_id, "processing", batch_index, file.filename)
+                faces_count = await asyncio.to_thread(process_photo_faces, mongo_db, event_id, photo_oid, file_path)
+                progress_broker.publish(event_id, batch_id, photo_id, "ready", batch_index, file.filename, faces_count=faces_count)
                 
             except Exception as e:
                 print(f"Erreur traitement visages en background pour {unique_filename}: {e}")
                 # Ne pas échouer l'upload si la détection faciale échoue
+                progress_broker.publish(event_id, batch_id, photo_id, "error", batch_index, file.filename, error=str(e))
         
         except Exception as e:
             print(f"Erreur upload fichier {file.filename}: {e}")
+            progress_broker.publish(event_id, batch_id, photo_id or f"{batch_id}:{batch_index}", "error", batch_index, file.filename, error=str(e))
             continue
     
     if not uploaded_photos:
@@ -515,7 +753,9 @@ async def delete_photo(photo_id: str, db: Session = Depends(get_db)):
     
     # Supprimer les faces associées
     faces_collection = mongo_db.faces
-    faces_collection.delete_many({"photo_id": mongo_id})
+    faces_result = faces_collection.delete_many({"photo_id": mongo_id})
+    delete_event_photo(photo.get("event_id"), photo_id)
+    record_photos_removed(mongo_db, photo.get("event_id"), result.deleted_count, faces_result.deleted_count)
     
     return {
         "photo_id": photo_id,
@@ -666,21 +906,8 @@ async def get_photo_thumbnail(photo_id: str):
     # Créer une miniature
     try:
         with open(file_path, "rb") as f:
-            img = Image.open(io.BytesIO(f.read()))
-        
-        # Créer miniature 200x200
-        img.thumbnail((200, 200), Image.Resampling.LANCZOS)
-        
-        # Convertir RGBA en RGB
-        if img.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-            img = background
-        
-        output = io.BytesIO()
-        img.save(output, format='JPEG', quality=80, optimize=False)
-        output.seek(0)
-        thumbnail_content = output.getvalue()
+            # Créer miniature 200x200
+            thumbnail_content = make_thumbnail(f.read())
         
         # Utiliser streaming
         async def iterfile():
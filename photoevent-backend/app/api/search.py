@@ -1,12 +1,24 @@
 """
 Routes API pour la recherche faciale
 """
-from fastapi import APIRouter, HTTPException, status, Depends
+from datetime import datetime
+from typing import Dict, List, Optional
+import secrets
+import string
+
+from fastapi import APIRouter, HTTPException, status, Depends, Query
 from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.security import require_admin
 from app.database import get_db, get_mongodb
-from app.schemas import FaceSearchRequest, FaceSearchResponse
+from app.schemas import FaceSearchRequest, FaceSearchResponse, KioskSessionCreate, KioskSessionResponse
 from app.db.models import Event
+from app.db.event_links import admin_event_id, event_id_for_admin
+from app.models.database_models import KioskSession
 from app.services.face_recognition import get_face_service
+from app.services.face_index import get_event_index, index_registry
+from app.services.session_matcher import session_matcher, store_session_matches
+from app.core.tracing import span
 from bson import ObjectId
 
 router = APIRouter()
@@ -26,7 +38,8 @@ async def search_by_face(
     - Retourne les photos correspondantes
     """
     # Vérifier que l'événement existe
-    event = db.query(Event).filter(Event.id == search_request.event_id).first()
+    with span("event_lookup"):
+        event = db.query(Event).filter(Event.id == search_request.event_id).first()
     if not event:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -43,6 +56,7 @@ async def search_by_face(
         )
     
     # Extraire l'embedding du visage recherché
+    # Étapes decode / detection / recognition tracées dans le service
     query_embedding = face_service.extract_face_from_base64(search_request.face_image)
     
     if query_embedding is None:
@@ -51,14 +65,12 @@ async def search_by_face(
             detail="Aucun visage détecté dans l'image fournie"
         )
     
-    # Récupérer tous les visages de l'événement depuis MongoDB
+    # Index mémoire des visages de l'événement (chargé une fois depuis MongoDB)
     mongo_db = get_mongodb()
-    faces_collection = mongo_db.faces
-    
-    # Trouver toutes les faces de cet événement
-    event_faces = list(faces_collection.find({"event_id": search_request.event_id}))
+    with span("index_load"):
+        event_index = get_event_index(search_request.event_id)
     
-    if not event_faces:
+    if len(event_index) == 0:
         return FaceSearchResponse(
             event_id=search_request.event_id,
             matches=[],
@@ -66,41 +78,25 @@ async def search_by_face(
             threshold_used=search_request.threshold
         )
     
-    # Préparer les données pour la recherche
-    photos_embeddings = {}
-    for face_doc in event_faces:
-        photo_id = str(face_doc['photo_id'])
-        if photo_id not in photos_embeddings:
-            photos_embeddings[photo_id] = []
-        photos_embeddings[photo_id].append({
-            'embedding': face_doc['embedding'],
-            'bbox': face_doc['bbox']
-        })
-    
-    # Convertir en liste de tuples
-    embeddings_list = [(pid, faces) for pid, faces in photos_embeddings.items()]
-    
-    # Rechercher les correspondances
-    matches = face_service.search_faces_in_event(
-        query_embedding,
-        embeddings_list,
-        threshold=search_request.threshold
-    )
+    # Rechercher les correspondances (produit matriciel sur tout l'événement)
+    with span("scoring"):
+        matches = event_index.search(query_embedding, search_request.threshold)
     
     # Enrichir avec les infos des photos
     photos_collection = mongo_db.photos
     enriched_matches = []
     
-    for match in matches:
-        photo = photos_collection.find_one({"_id": ObjectId(match['photo_id'])})
-        if photo:
-            enriched_matches.append({
-                'photo_id': match['photo_id'],
-                'filename': photo.get('filename', ''),
-                'similarity': match['similarity'],
-                'bbox': match['bbox'],
-                'face_index': match['face_index']
-            })
+    with span("enrichment"):
+        for match in matches:
+            photo = photos_collection.find_one({"_id": ObjectId(match['photo_id'])})
+            if photo:
+                enriched_matches.append({
+                    'photo_id': match['photo_id'],
+                    'filename': photo.get('filename', ''),
+                    'similarity': match['similarity'],
+                    'bbox': match['bbox'],
+                    'face_index': match['face_index']
+                })
     
     return FaceSearchResponse(
         event_id=search_request.event_id,
@@ -108,3 +104,164 @@ async def search_by_face(
         total_matches=len(enriched_matches),
         threshold_used=search_request.threshold
     )
+
+
+@router.get("/admin/index-stats", tags=["admin"], dependencies=[Depends(require_admin)])
+async def get_index_stats():
+    """
+    Index de visages résidents en mémoire
+    Budget, taux de succès du cache, évictions et rechargements
+    """
+    return index_registry.stats()
+
+
+# ============================================================================
+# SESSIONS KIOSQUE (galerie mise à jour par la recherche inverse)
+# ============================================================================
+
+SESSION_CODE_ATTEMPTS = 10  # Tirages avant d'abandonner (espace de codes saturé ou base lente)
+
+
+def generate_session_code() -> str:
+    """Code de session (8 caractères alphanumériques, pour le QR code)"""
+    chars = string.ascii_uppercase + string.digits
+    return ''.join(secrets.choice(chars) for _ in range(8))
+
+
+def list_session_matches(mongo_db, session_id: int, since: Optional[datetime] = None) -> List[Dict]:
+    query = {"session_id": session_id}
+    if since is not None:
+        query["matched_at"] = {"$gt": since}
+    return [
+        {
+            "photo_id": str(match["photo_id"]),
+            "similarity": match["similarity"],
+            "bbox": match.get("bbox"),
+            "source": match.get("source"),
+            "matched_at": match["matched_at"].isoformat()
+        }
+        for match in mongo_db.session_matches.find(query).sort("matched_at", 1)
+    ]
+
+
+def get_session_or_404(db: Session, session_code: str) -> KioskSession:
+    session = db.query(KioskSession).filter(KioskSession.session_code == session_code).first()
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Session kiosque {session_code} non trouvée"
+        )
+    return session
+
+
+@router.post("/sessions", response_model=KioskSessionResponse, status_code=status.HTTP_201_CREATED)
+async def create_kiosk_session(request: KioskSessionCreate, db: Session = Depends(get_db)):
+    """
+    Ouvrir une session kiosque à partir d'un selfie
+
+    - Recherche complète immédiate sur l'événement
+    - Les photos uploadées ensuite sont ajoutées automatiquement à la session
+      (recherche inverse à l'ingestion, sans nouvelle recherche)
+
+    `event_id` est l'id `events` utilisé par les photos et la recherche ; la
+    session est rattachée à la fiche `events_admin` du même code.
+    """
+    if not db.query(Event.id).filter(Event.id == request.event_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Événement {request.event_id} non trouvé"
+        )
+    admin_id = admin_event_id(db, request.event_id)
+    if admin_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Événement {request.event_id} sans fiche administrateur (sessions kiosque indisponibles)"
+        )
+
+    try:
+        face_service = get_face_service()
+    except ImportError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    query_embedding = face_service.extract_face_from_base64(request.face_image)
+    if query_embedding is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Aucun visage détecté dans l'image fournie"
+        )
+
+    for _ in range(SESSION_CODE_ATTEMPTS):
+        session_code = generate_session_code()
+        if not db.query(KioskSession.id).filter(KioskSession.session_code == session_code).first():
+            break
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Impossible de générer un code de session unique, réessayez"
+        )
+    session = KioskSession(
+        event_id=admin_id,
+        session_code=session_code,
+        visitor_name=request.visitor_name,
+        visitor_email=request.visitor_email,
+        face_template=[float(v) for v in query_embedding],
+        is_active=True,
+        matched_photos=0,
+        # Même horloge que la fenêtre KIOSK_SESSION_MAX_AGE_HOURS (session_matcher)
+        created_at=datetime.now()
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+
+    # Photos déjà présentes : recherche complète, meilleur visage par photo
+    with span("scoring"):
+        event_index = get_event_index(request.event_id)
+        face_matches = event_index.search(query_embedding, settings.KIOSK_SESSION_THRESHOLD) if len(event_index) else []
+    photos: Dict[str, Dict] = {}
+    for match in face_matches:
+        if match['photo_id'] not in photos or match['similarity'] > photos[match['photo_id']]['similarity']:
+            photos[match['photo_id']] = {"similarity": match['similarity'], "bbox": match['bbox']}
+
+    mongo_db = get_mongodb()
+    new_photos = store_session_matches(mongo_db, request.event_id, {session.id: photos}, source="search")
+    session.matched_photos = new_photos.get(session.id, 0)
+    if session.matched_photos:
+        session.last_matched = datetime.now()
+    db.commit()
+    # Nouveau template pris en compte par la prochaine ingestion
+    session_matcher.invalidate(request.event_id)
+
+    return KioskSessionResponse(
+        session_code=session.session_code,
+        event_id=request.event_id,
+        matched_photos=session.matched_photos,
+        matches=list_session_matches(mongo_db, session.id)
+    )
+
+
+@router.get("/sessions/{session_code}", response_model=KioskSessionResponse)
+async def get_kiosk_session(
+    session_code: str,
+    since: Optional[datetime] = Query(None, description="Uniquement les photos ajoutées après cette date"),
+    db: Session = Depends(get_db)
+):
+    """Photos d'une session kiosque (les nouvelles arrivent sans relancer de recherche)"""
+    session = get_session_or_404(db, session_code)
+    return KioskSessionResponse(
+        session_code=session.session_code,
+        event_id=event_id_for_admin(db, session.event_id),
+        matched_photos=session.matched_photos or 0,
+        matches=list_session_matches(get_mongodb(), session.id, since)
+    )
+
+
+@router.delete("/sessions/{session_code}")
+async def close_kiosk_session(session_code: str, db: Session = Depends(get_db)):
+    """Fermer une session : elle ne reçoit plus les nouvelles photos"""
+    session = get_session_or_404(db, session_code)
+    session.is_active = False
+    db.commit()
+    event_id = event_id_for_admin(db, session.event_id)
+    if event_id is not None:
+        session_matcher.invalidate(event_id)
+    return {"message": "Session fermée", "session_code": session_code}
@@ -1,10 +1,16 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Tuple
 from bson import ObjectId
+import asyncio
+import hashlib
 import uuid
 import logging
 from ..database import get_db, get_mongodb
+from ..services.zip_stream import ArchiveTooLarge, StoredZipStream, ZipEntry
 from sqlalchemy.orm import Session
 
 router = APIRouter(tags=["shares"])
@@ -251,3 +257,132 @@ async def track_download(share_code: str, photo_id: str = Query(...)):
         logger.error(f"Erreur track-download: {str(e)}")
         # Ne pas bloquer le téléchargement si le tracking échoue
         return {"success": False, "message": "Tracking échoué (mais fichier téléchargé)"}
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    En-tête Range "bytes=debut-fin" -> (debut, fin) inclus, None pour
+    l'archive complète. Plages multiples ignorées (réponse 200 complète).
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            # "bytes=-N" : les N derniers octets
+            suffix = int(last)
+            if suffix <= 0:
+                raise ValueError
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        raise HTTPException(status_code=416, detail="En-tête Range invalide", headers={"Content-Range": f"bytes */{size}"})
+    if start >= size or end < start:
+        raise HTTPException(status_code=416, detail="Plage hors de l'archive", headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+
+def build_share_archive(share: dict, photos_collection) -> Tuple[StoredZipStream, str]:
+    """Entrées de l'archive (ordre du partage) et ETag stable entre deux requêtes"""
+    photos = {p["_id"]: p for p in photos_collection.find({"_id": {"$in": share.get("selected_photo_ids", [])}})}
+    entries = []
+    names = set()
+    mtimes = {}
+    fingerprint = hashlib.sha1(share["share_code"].encode())
+    for photo_id in share.get("selected_photo_ids", []):
+        photo = photos.get(photo_id)
+        if not photo or not photo.get("file_path"):
+            continue
+        file_path = Path(photo["file_path"])
+        if not file_path.is_absolute():
+            file_path = Path.cwd() / file_path
+        try:
+            stat = file_path.stat()
+        except OSError:
+            logger.warning(f"Archive {share['share_code']}: fichier manquant {file_path}")
+            continue
+
+        name = photo.get("filename") or f"{photo_id}.jpg"
+        if name in names:
+            name = f"{photo_id}_{name}"
+        names.add(name)
+        modified = photo.get("uploaded_at") if isinstance(photo.get("uploaded_at"), datetime) \
+            else datetime.fromtimestamp(stat.st_mtime)
+        # CRC mis en cache dans la photo, valable tant que taille et date de modification sont inchangées
+        cached = photo.get("crc32_size") == stat.st_size and photo.get("crc32_mtime_ns") == stat.st_mtime_ns
+        crc = photo.get("crc32") if cached else None
+        mtimes[photo_id] = stat.st_mtime_ns
+        entries.append(ZipEntry(name=name, path=file_path, size=stat.st_size, modified=modified, crc32=crc, key=photo_id))
+        fingerprint.update(f"{photo_id}:{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+
+    def cache_crc(entry: ZipEntry) -> None:
+        photos_collection.update_one({"_id": entry.key}, {"$set": {
+            "crc32": entry.crc32, "crc32_size": entry.size, "crc32_mtime_ns": mtimes[entry.key]
+        }})
+
+    return StoredZipStream(entries, on_crc=cache_crc), f'"{fingerprint.hexdigest()}"'
+
+
+@router.api_route("/{share_code}/archive", methods=["GET", "HEAD"])
+async def download_share_archive(share_code: str, request: Request):
+    """
+    Télécharger toutes les photos d'un partage en une seule archive ZIP
+
+    - fichiers stockés sans recompression (déjà en JPEG), générés à la volée
+    - taille connue d'avance (Content-Length) et reprise via Range / If-Range
+    - un seul téléchargement comptabilisé par archive (pas à chaque reprise)
+    """
+    mongo_db = get_mongodb()
+    shares_collection = mongo_db["shares"]
+    photos_collection = mongo_db["photos"]
+
+    share = shares_collection.find_one({"share_code": share_code})
+    if not share:
+        raise HTTPException(status_code=404, detail="Code de partage invalide")
+    if datetime.utcnow() > share["expires_at"]:
+        raise HTTPException(status_code=410, detail="Ce partage a expiré (48h max)")
+
+    try:
+        # Lecture MongoDB et stat() de chaque fichier hors de la boucle d'événements
+        archive, etag = await asyncio.to_thread(build_share_archive, share, photos_collection)
+    except ArchiveTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    if not archive.entries:
+        raise HTTPException(status_code=404, detail="Aucun fichier photo disponible pour ce partage")
+
+    byte_range = parse_range(request.headers.get("range"), archive.size)
+    # If-Range : l'archive a changé depuis le début du téléchargement -> tout renvoyer
+    if_range = request.headers.get("if-range")
+    if byte_range and if_range and if_range != etag:
+        byte_range = None
+
+    start, end = byte_range or (0, archive.size - 1)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Length": str(end - start + 1),
+        "Content-Disposition": f'attachment; filename="photos_{share_code}.zip"'
+    }
+    status_code = 200
+    if byte_range:
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{archive.size}"
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type="application/zip")
+
+    if start == 0:
+        # Les reprises (Range au-delà du début) ne comptent pas un nouveau téléchargement
+        shares_collection.update_one(
+            {"_id": share["_id"]},
+            {"$inc": {"downloads_count": 1}, "$set": {"last_archive_download_at": datetime.utcnow()}}
+        )
+        logger.info(f"Archive téléchargée: {share_code} ({len(archive.entries)} photos, {archive.size} octets)")
+
+    return StreamingResponse(
+        archive.iter_range(start, end),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/zip"
+    )
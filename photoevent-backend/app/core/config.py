@@ -3,7 +3,7 @@ Configuration globale de l'application PhotoEvent Backend
 """
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List, Union, Any
+from typing import Dict, List, Union, Any
 from pydantic import field_validator, model_validator
 
 
@@ -39,6 +39,8 @@ class Settings(BaseSettings):
     # MongoDB
     MONGODB_URL: str = "mongodb://localhost:27017"
     MONGODB_DB: str = "photoevent"
+    # Registre d'index (app/db/mongo_indexes.py) appliqué au démarrage
+    MONGO_ENSURE_INDEXES: bool = True
     
     # Redis
     REDIS_HOST: str = "localhost"
@@ -61,6 +63,51 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440
     
+    # Rate limiting (GCRA par IP) : RATE_LIMIT_CAPACITY unités par fenêtre,
+    # chaque route coûte des unités (préfixe le plus long ; 0 = non limitée)
+    RATE_LIMIT_CAPACITY: int = 600
+    RATE_LIMIT_WINDOW_SECONDS: int = 60
+    RATE_LIMIT_DEFAULT_COST: int = 6  # ~100 requêtes ordinaires / minute
+    RATE_LIMIT_ROUTE_COSTS: Dict[str, int] = {
+        "/uploads/": 0,
+        "/health": 1,
+        "/ready": 1,
+        "/metrics": 1,
+        "/api/v1/search/face": 10,
+        "/api/v1/photos/upload": 10,
+    }
+    RATE_LIMIT_SHARDS: int = 16
+    RATE_LIMIT_CLEANUP_SECONDS: int = 300  # Purge des IPs inactives
+    # "memory" (par processus) ou "redis" (partagé entre workers/hôtes, repli mémoire)
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_REDIS_TIMEOUT_SECONDS: float = 0.05
+    RATE_LIMIT_REDIS_RETRY_SECONDS: float = 5.0  # Délai avant de retenter Redis après une erreur
+    
+    # Métriques (/metrics)
+    METRICS_BACKLOG_TTL_SECONDS: int = 15  # Cache du comptage des photos en attente
+    
+    # Traces par étape (Server-Timing, JSONL, traces les plus lentes)
+    TRACE_ENABLED: bool = True
+    TRACE_SAMPLE_RATE: float = 0.01  # Fraction des traces écrites sur disque
+    TRACE_SLOW_MS: float = 1000  # Traces plus lentes toujours écrites
+    TRACE_FILE: str = "logs/traces.jsonl"
+    TRACE_FILE_MAX_MB: int = 50
+    TRACE_RECENT_MAX: int = 500  # Traces récentes gardées en mémoire
+    
+    # Routes d'administration (tag "admin") : "sub" JWT autorisés (app/core/security.py)
+    ADMIN_USERS: List[str] = ["photographer"]
+    
+    # Profilage à la demande (en-tête X-Profile / ?profile=1 avec un JWT admin,
+    # ou échantillonnage des routes PROFILING_ROUTES)
+    PROFILING_ENABLED: bool = True
+    PROFILING_ADMIN_USERS: List[str] = ["photographer"]  # "sub" JWT autorisés
+    PROFILING_SAMPLE_RATE: float = 0.0  # Fraction des requêtes profilées sur PROFILING_ROUTES
+    PROFILING_ROUTES: List[str] = ["/api/v1/search/face"]
+    PROFILING_INTERVAL_MS: float = 5  # Période de l'échantillonneur de piles
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 50
+    PROFILING_MAX_MB: int = 100
+    
     # Celery
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/2"
@@ -72,9 +119,66 @@ class Settings(BaseSettings):
     MAX_WORKERS: int = 4
     
     # Reconnaissance faciale
+    # "auto" : InsightFace puis DeepFace ; "fake" : moteur déterministe hors ligne
+    # (tests de charge / bout en bout sans modèle téléchargé)
+    FACE_ENGINE: str = "auto"
+    FACE_FAKE_GRID: int = 3  # Moteur factice : grille de cases candidates
+    FACE_FAKE_DETECTION_MS: float = 30  # Latence simulée d'une détection à 640 px
+    FACE_FAKE_RECOGNITION_MS: float = 8  # Latence simulée par visage encodé
     FACE_DETECTION_CONFIDENCE: float = 0.5
     FACE_MATCH_THRESHOLD: float = 0.6
     MAX_FACES_PER_PHOTO: int = 20
+    FACE_MIN_SIZE_PX: int = 40  # Côté min. d'un visage stocké (ignore l'arrière-plan)
+    # Taille d'entrée du détecteur selon l'usage (benchmark: tests/bench_detector_sizes.py)
+    FACE_QUERY_DET_SIZES: List[int] = [320, 640]  # Selfie kiosque : escalade si aucun visage
+    FACE_INGEST_DET_SIZE: int = 1024  # Photos d'événement
+    FACE_INGEST_TILE_ABOVE_PX: int = 2500  # Détection par tuiles au-delà (0 = jamais)
+    FACE_INGEST_TILE_SIZE: int = 1280
+    FACE_INGEST_TILE_OVERLAP: float = 0.2
+    
+    # Index mémoire des visages : "float32", "float16" ou "int8"
+    # (benchmark mémoire/rappel : tests/bench_index_quantization.py)
+    FACE_INDEX_DTYPE: str = "float32"
+    FACE_INDEX_RESCORE_LIMIT: int = 1000  # Candidats re-scorés en pleine précision
+    FACE_INDEX_RESCORE_MARGIN: float = 0.05  # Marge sous le seuil pour les scores approchés
+    FACE_INDEX_MEMORY_BUDGET_MB: int = 2048  # Budget global des index résidents (éviction LRU)
+    FACE_INDEX_PIN_REFRESH_SECONDS: int = 60  # Rafraîchissement des événements ACTIVE épinglés
+    # Snapshots disque des index (relus en memory-map au démarrage des workers)
+    FACE_INDEX_SNAPSHOTS: bool = True
+    FACE_INDEX_SNAPSHOT_DIR: str = "index_snapshots"
+    # Fraîcheur des index résidents (visages ingérés par d'autres workers) : relecture
+    # du pointeur CURRENT et du compteur event_stats au plus une fois par période
+    FACE_INDEX_VERSION_CHECK_SECONDS: float = 2
+    # Segments de l'index (ingestion en direct) et compaction de fond
+    FACE_INDEX_SEGMENT_SIZE: int = 256  # Visages du segment mutable avant scellement
+    FACE_INDEX_MAX_SEGMENTS: int = 8  # Segments scellés avant compaction forcée
+    FACE_INDEX_COMPACTION_RATIO: float = 0.1  # Ajouts / index de base déclenchant la compaction
+    FACE_INDEX_PUBLISH_MAX_AGE_SECONDS: int = 60  # Délai max avant publication des ajouts
+    FACE_INDEX_COMPACTION_INTERVAL_SECONDS: int = 5
+    # Précision du modèle de reconnaissance ArcFace : "fp32" ou "int8"
+    # (modèle INT8 généré par scripts/quantize_recognition_model.py)
+    FACE_RECOGNITION_PRECISION: str = "fp32"
+    FACE_RECOGNITION_INT8_MODEL: str = "models/w600k_r50_int8.onnx"
+    
+    # Préchargement au démarrage (sinon lazy-load à la première requête)
+    FACE_MODEL_PRELOAD: bool = False
+    FACE_MODEL_WARMUP: bool = True
+    PRELOAD_EVENT_IDS: List[int] = []
+    
+    # Sessions kiosque : recherche inverse des nouvelles photos (app/services/session_matcher.py)
+    KIOSK_SESSION_THRESHOLD: float = 0.6
+    KIOSK_SESSION_REFRESH_SECONDS: int = 30  # Rechargement des templates actifs par événement
+    KIOSK_SESSION_MAX_AGE_HOURS: int = 48  # Au-delà, la session ne reçoit plus de photos
+    
+    # Progression du traitement poussée en SSE (app/services/progress.py)
+    PROGRESS_QUEUE_SIZE: int = 1000  # Événements en attente par client avant perte des plus anciens
+    PROGRESS_MAX_BATCHES: int = 200  # Lots récents gardés en mémoire
+    PROGRESS_SNAPSHOT_SECONDS: int = 15  # Instantané MongoDB (et keep-alive) sans événement
+    
+    # Intégrité du stockage (app/services/storage_integrity.py)
+    STORAGE_QUARANTINE_DIR: str = "uploads/quarantine"  # Fichiers sans document déplacés ici
+    STORAGE_ORPHAN_MIN_AGE_SECONDS: int = 3600  # Fichiers plus récents ignorés (upload en cours)
+    STORAGE_INTEGRITY_INTERVAL_HOURS: int = 0  # Analyse périodique sans réparation (0 = désactivée)
     
     # Téléchargements
     DOWNLOAD_LINK_EXPIRY_DAYS: int = 7
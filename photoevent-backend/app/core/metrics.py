@@ -0,0 +1,341 @@
+"""
+Métriques au format Prometheus (exposition texte 0.0.4), sans dépendance externe
+
+Conçu pour rester actif en production :
+- pré-agrégé : compteurs et histogrammes à seaux fixes, jamais d'échantillons bruts
+- sans verrou sur le chemin chaud : chaque thread incrémente ses propres
+  compteurs (threading.local), fusionnés seulement au moment du scrape
+- jauges calculées au scrape (collecteurs) pour les valeurs déjà tenues ailleurs
+  (cache d'index, file d'attente de l'executor, backlog d'ingestion)
+"""
+
+import bisect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seaux de latence (secondes) : de la milliseconde aux requêtes de plusieurs secondes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _ThreadSharded:
+    """Un dictionnaire d'état par thread, fusionné à la lecture"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Dict] = []
+        self._shards_lock = threading.Lock()
+
+    def shard(self) -> Dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            # Seul point avec verrou : première mesure de chaque thread
+            shard = {}
+            self._local.shard = shard
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def shards(self) -> List[Dict]:
+        with self._shards_lock:
+            return list(self._shards)
+
+
+class Counter:
+    """Compteur monotone avec labels"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._state = _ThreadSharded()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        shard = self._state.shard()
+        shard[labelvalues] = shard.get(labelvalues, 0.0) + amount
+
+    def values(self) -> Dict[LabelValues, float]:
+        totals: Dict[LabelValues, float] = {}
+        for shard in self._state.shards():
+            for labels, value in list(shard.items()):
+                totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+    def expose(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self.values().items())
+        ]
+
+
+class Histogram:
+    """Histogramme à seaux fixes avec labels"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._state = _ThreadSharded()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        shard = self._state.shard()
+        series = shard.get(labelvalues)
+        if series is None:
+            # [compte par seau..., +Inf, somme]
+            series = shard[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *labelvalues: str) -> "_Timer":
+        """Chronométrer un bloc : with histogram.time("label"): ..."""
+        return _Timer(self, labelvalues)
+
+    def values(self) -> Dict[LabelValues, List[float]]:
+        totals: Dict[LabelValues, List[float]] = {}
+        for shard in self._state.shards():
+            for labels, series in list(shard.items()):
+                total = totals.setdefault(labels, [0] * len(series))
+                for i, value in enumerate(list(series)):
+                    total[i] += value
+        return totals
+
+    def expose(self) -> List[str]:
+        lines = []
+        for labels, series in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_labels", "_start")
+
+    def __init__(self, histogram: Histogram, labels: LabelValues):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start, *self._labels)
+        return False
+
+
+class GaugeFamily:
+    """Jauge calculée au scrape (valeurs fournies par un collecteur)"""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        collect: Callable[[], Iterable[Tuple[LabelValues, float]]] = None
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def expose(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self.collect()
+        ]
+
+
+class CounterFamily(GaugeFamily):
+    """Compteur tenu ailleurs (ex. statistiques du cache), lu au scrape"""
+
+    type_name = "counter"
+
+
+class MetricsRegistry:
+    """Ensemble des métriques exposées sur /metrics"""
+
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              collect: Callable = None) -> GaugeFamily:
+        return self.register(GaugeFamily(name, documentation, labelnames, collect))
+
+    def expose(self) -> str:
+        """Texte d'exposition Prometheus de toutes les métriques"""
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = metric.expose()
+            except Exception as e:
+                # Un collecteur en erreur (base indisponible) ne casse pas le scrape
+                print(f"⚠️ Métrique {metric.name} non collectée: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Requêtes HTTP (route = gabarit FastAPI, pas le chemin brut : cardinalité bornée)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "photoevent_http_request_duration_seconds",
+    "Durée des requêtes HTTP par route et statut",
+    ("method", "route", "status")
+)
+
+# Inférence : détection / reconnaissance, par photo (ingest) ou par requête kiosque (query)
+FACE_INFERENCE_SECONDS = registry.histogram(
+    "photoevent_face_inference_seconds",
+    "Temps d'inférence du modèle facial par étape et usage",
+    ("stage", "purpose")
+)
+
+FACES_EMBEDDED = registry.counter(
+    "photoevent_faces_embedded_total",
+    "Visages encodés par usage",
+    ("purpose",)
+)
+
+# Bases de données
+DB_QUERY_SECONDS = registry.histogram(
+    "photoevent_db_query_duration_seconds",
+    "Durée des requêtes MongoDB / PostgreSQL par opération",
+    ("db", "operation")
+)
+
+
+def observe_mongo_command(command_name: str, duration_seconds: float) -> None:
+    DB_QUERY_SECONDS.observe(duration_seconds, "mongodb", command_name)
+
+
+def instrument_mongo_listener():
+    """CommandListener pymongo à passer à MongoClient(event_listeners=[...])"""
+    from pymongo import monitoring
+
+    class MongoCommandMetrics(monitoring.CommandListener):
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            observe_mongo_command(event.command_name, event.duration_micros / 1e6)
+
+        def failed(self, event):
+            observe_mongo_command(event.command_name, event.duration_micros / 1e6)
+
+    return MongoCommandMetrics()
+
+
+def instrument_sqlalchemy_engine(engine) -> None:
+    """Mesurer chaque requête SQL de l'engine (événements cursor_execute)"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if starts:
+            operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "unknown"
+            DB_QUERY_SECONDS.observe(time.perf_counter() - starts.pop(), "postgresql", operation)
+
+
+class TrackedThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor comptant lui-même ses tâches en file et en cours"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counts_lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+
+    def submit(self, fn, /, *args, **kwargs):
+        def run():
+            with self._counts_lock:
+                self.queued -= 1
+                self.running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._counts_lock:
+                    self.running -= 1
+
+        with self._counts_lock:
+            self.queued += 1
+        try:
+            return super().submit(run)
+        except BaseException:
+            with self._counts_lock:
+                self.queued -= 1
+            raise
+
+
+class CachedCollector:
+    """Collecteur coûteux (requête base) recalculé au plus toutes les `ttl` secondes"""
+
+    def __init__(self, compute: Callable[[], List[Tuple[LabelValues, float]]], ttl: float):
+        self._compute = compute
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._value: Optional[List[Tuple[LabelValues, float]]] = None
+        self._expires = 0.0
+
+    def __call__(self) -> List[Tuple[LabelValues, float]]:
+        with self._lock:
+            if self._value is None or time.monotonic() >= self._expires:
+                self._value = self._compute()
+                self._expires = time.monotonic() + self._ttl
+            return self._value
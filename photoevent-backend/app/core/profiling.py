@@ -0,0 +1,173 @@
+"""
+Profilage à la demande des requêtes en production (sans redéploiement)
+
+Échantillonneur statistique de piles : un thread relève toutes les
+PROFILING_INTERVAL_MS les piles Python de tous les threads du processus
+(sys._current_frames) pendant la requête profilée. Les handlers synchrones
+tournent dans l'executor et le modèle ONNX dans ses propres appels : un
+profileur déterministe (cProfile) attaché à la boucle asyncio ne les verrait
+pas, et son surcoût fausserait les mesures.
+
+Sortie au format "collapsed stacks" (une ligne `cadre;cadre;... N` par pile),
+lisible par flamegraph.pl, speedscope ou inferno. Les fichiers sont conservés
+dans PROFILING_DIR, borné en nombre et en taille (les plus anciens sont supprimés).
+
+Les piles des autres requêtes concurrentes apparaissent aussi (on profile ce
+que fait le processus pendant la requête) ; un seul profil à la fois par worker.
+"""
+
+import re
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+PROFILE_SUFFIX = ".folded"
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    # Les ';' séparent les cadres dans le format collapsed
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _is_idle(frames: List) -> bool:
+    """Thread en attente : boucle asyncio dans select(), worker d'executor sans tâche"""
+    leaf = frames[-1].f_code
+    if leaf.co_filename.endswith("selectors.py"):
+        return True
+    return any(
+        f.f_code.co_name == "get" and f.f_code.co_filename.endswith("queue.py")
+        for f in frames[-3:]
+    )
+
+
+class StackSampler:
+    """Relevé périodique des piles de tous les threads (sauf le sien)"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval = interval_seconds
+        self.stacks: StackCounter = StackCounter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(exclude=own_id)
+
+    def sample(self, exclude: Optional[int] = None) -> None:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == exclude:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(frame)
+                frame = frame.f_back
+            frames.reverse()
+            if not frames or _is_idle(frames):
+                continue
+            thread_name = names.get(thread_id, str(thread_id)).replace(";", ":").replace(" ", "_")
+            self.stacks[";".join([thread_name] + [_frame_label(f) for f in frames])] += 1
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """Répertoire de profils borné (nombre de fichiers et taille totale)"""
+
+    def __init__(self, directory: Path, max_files: int, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def save(self, route: str, duration_ms: float, content: str) -> str:
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_")[:80] or "root"
+        name = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{slug}_{int(duration_ms)}ms{PROFILE_SUFFIX}"
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / name).write_text(content, encoding="utf-8")
+            self._prune()
+        return name
+
+    def _prune(self) -> None:
+        files = sorted(self.directory.glob(f"*{PROFILE_SUFFIX}"), key=lambda p: p.name, reverse=True)
+        total = 0
+        for i, path in enumerate(files):
+            total += path.stat().st_size
+            # Le profil le plus récent est toujours conservé
+            if i > 0 and (i >= self.max_files or total > self.max_bytes):
+                path.unlink(missing_ok=True)
+
+    def list(self) -> List[Dict]:
+        if not self.directory.exists():
+            return []
+        profiles = []
+        for path in sorted(self.directory.glob(f"*{PROFILE_SUFFIX}"), key=lambda p: p.name, reverse=True):
+            stat = path.stat()
+            profiles.append({
+                "name": path.name,
+                "size_bytes": stat.st_size,
+                "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat()
+            })
+        return profiles
+
+    def path_of(self, name: str) -> Optional[Path]:
+        """Chemin d'un profil existant (None si nom invalide ou hors du répertoire)"""
+        if "/" in name or "\\" in name or not name.endswith(PROFILE_SUFFIX):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+
+class RequestProfiler:
+    """Un profil à la fois par processus : les demandes concurrentes ne sont pas profilées"""
+
+    def __init__(self, store: ProfileStore, interval_seconds: float):
+        self.store = store
+        self.interval = interval_seconds
+        self._busy = threading.Lock()
+
+    def try_start(self) -> Optional[StackSampler]:
+        if not self._busy.acquire(blocking=False):
+            return None
+        return StackSampler(self.interval).start()
+
+    def finish(self, sampler: StackSampler, route: str, started: float) -> Optional[str]:
+        """Arrêter l'échantillonnage et écrire le profil (None si aucun échantillon)"""
+        try:
+            sampler.stop()
+        finally:
+            self._busy.release()
+        if not sampler.stacks:
+            return None
+        duration_ms = (time.perf_counter() - started) * 1000
+        return self.store.save(route, duration_ms, sampler.collapsed())
+
+
+profile_store = ProfileStore(
+    directory=Path(settings.PROFILING_DIR),
+    max_files=settings.PROFILING_MAX_FILES,
+    max_bytes=settings.PROFILING_MAX_MB * 1024 * 1024
+)
+
+request_profiler = RequestProfiler(profile_store, interval_seconds=settings.PROFILING_INTERVAL_MS / 1000)
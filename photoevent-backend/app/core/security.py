@@ -0,0 +1,34 @@
+"""
+Accès aux routes d'administration
+
+Un JWT (Authorization: Bearer ...) dont le "sub" figure dans ADMIN_USERS est
+requis par les routes taguées "admin" (diagnostics, index de recherche,
+intégrité du stockage).
+"""
+from typing import List, Optional
+
+from fastapi import Header, HTTPException, status
+
+from app.auth.jwt_manager import HTTPAuthCredentials, verify_token
+from app.core.config import settings
+
+
+async def token_in(authorization: Optional[str], users: List[str]) -> bool:
+    """JWT valide dont le "sub" est dans `users`"""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return False
+    try:
+        token_data = await verify_token(HTTPAuthCredentials(scheme="Bearer", credentials=authorization[7:].strip()))
+    except HTTPException:
+        return False
+    return token_data.username in users
+
+
+async def require_admin(authorization: Optional[str] = Header(None)):
+    """Dépendance des routes d'administration : JWT d'un utilisateur de ADMIN_USERS requis"""
+    if not await token_in(authorization, settings.ADMIN_USERS):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token administrateur requis",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
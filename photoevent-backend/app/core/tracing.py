@@ -0,0 +1,193 @@
+"""
+Traces légères par requête (étapes de la recherche et de l'upload)
+
+- `with span("detection"):` chronomètre une étape de la requête en cours
+  (sans trace active, par exemple dans un script, span ne fait rien)
+- chaque réponse porte un en-tête Server-Timing (durée cumulée par étape)
+- une fraction des traces (TRACE_SAMPLE_RATE) et toutes les traces lentes
+  (> TRACE_SLOW_MS) sont écrites en JSONL dans TRACE_FILE, par un thread
+  d'écriture (file bornée) : le middleware ne fait jamais d'E/S disque
+- les traces récentes restent en mémoire pour l'endpoint des plus lentes
+"""
+
+import json
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+
+class Trace:
+    """Étapes chronométrées d'une requête"""
+
+    __slots__ = ("trace_id", "name", "started_at", "start", "spans", "duration_ms", "status")
+
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        # (étape, début en ms depuis le début de la requête, durée en ms)
+        self.spans: List[tuple] = []
+        self.duration_ms: Optional[float] = None
+        self.status: Optional[int] = None
+
+    def add_span(self, name: str, start: float, duration: float) -> None:
+        self.spans.append((name, (start - self.start) * 1000, duration * 1000))
+
+    def finish(self, name: str, status: int) -> None:
+        self.name = name
+        self.status = status
+        self.duration_ms = (time.perf_counter() - self.start) * 1000
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Durée cumulée par étape (une étape peut se répéter, ex. une détection par photo)"""
+        totals: Dict[str, float] = {}
+        for name, _, duration in self.spans:
+            totals[name] = totals.get(name, 0.0) + duration
+        return totals
+
+    def server_timing(self) -> str:
+        entries = [f"{name};dur={duration:.2f}" for name, duration in self.stage_totals().items()]
+        if self.duration_ms is not None:
+            entries.append(f"total;dur={self.duration_ms:.2f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "route": self.name,
+            "status": self.status,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+            "duration_ms": round(self.duration_ms or 0.0, 3),
+            "stages_ms": {name: round(duration, 3) for name, duration in self.stage_totals().items()},
+            "spans": [
+                {"name": name, "offset_ms": round(offset, 3), "duration_ms": round(duration, 3)}
+                for name, offset, duration in self.spans
+            ]
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str):
+    """Chronométrer une étape de la requête en cours"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, start, time.perf_counter() - start)
+
+
+def start_trace(name: str):
+    """Démarrer une trace dans le contexte courant (renvoie le jeton de reset)"""
+    trace = Trace(name)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token) -> None:
+    _current_trace.reset(token)
+
+
+class TraceRecorder:
+    """Traces récentes en mémoire (bornées) et échantillonnage JSONL sur disque"""
+
+    def __init__(
+        self,
+        path: Path,
+        sample_rate: float,
+        slow_ms: float,
+        recent_max: int,
+        max_file_bytes: int,
+        queue_max: int = 1000
+    ):
+        self.path = Path(path)
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_file_bytes = max_file_bytes
+        self.dropped = 0  # Traces non écrites (file d'écriture pleine)
+        self._recent = deque(maxlen=recent_max)
+        self._pending: "queue.Queue[Trace]" = queue.Queue(maxsize=queue_max)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    def record(self, trace: Trace) -> None:
+        """Garder la trace en mémoire ; l'écriture disque est confiée au thread d'écriture"""
+        self._recent.append(trace)
+        if trace.duration_ms >= self.slow_ms or random.random() < self.sample_rate:
+            self._ensure_writer()
+            try:
+                self._pending.put_nowait(trace)
+            except queue.Full:
+                self.dropped += 1
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Attendre l'écriture des traces en file (tests, arrêt) ; False si le délai expire"""
+        deadline = time.monotonic() + timeout
+        while self._pending.unfinished_tasks:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            trace = self._pending.get()
+            try:
+                self._write(trace)
+            finally:
+                self._pending.task_done()
+
+    def _write(self, trace: Trace) -> None:
+        line = json.dumps(trace.to_dict(), ensure_ascii=False) + "\n"
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Rotation simple : un seul fichier précédent conservé
+            if self.path.exists() and self.path.stat().st_size > self.max_file_bytes:
+                self.path.replace(self.path.with_name(self.path.name + ".1"))
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            print(f"⚠️ Trace {trace.trace_id} non écrite: {e}")
+
+    def slowest(self, limit: int = 20, route: Optional[str] = None) -> List[Dict]:
+        """Traces récentes les plus lentes (optionnellement pour une route)"""
+        traces = [t for t in list(self._recent) if route is None or t.name == route]
+        traces.sort(key=lambda t: t.duration_ms, reverse=True)
+        return [t.to_dict() for t in traces[:limit]]
+
+
+trace_recorder = TraceRecorder(
+    path=Path(settings.TRACE_FILE),
+    sample_rate=settings.TRACE_SAMPLE_RATE,
+    slow_ms=settings.TRACE_SLOW_MS,
+    recent_max=settings.TRACE_RECENT_MAX,
+    max_file_bytes=settings.TRACE_FILE_MAX_MB * 1024 * 1024
+)
@@ -9,6 +9,7 @@ from sqlalchemy.orm import sessionmaker
 from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
+from app.core.metrics import instrument_mongo_listener, instrument_sqlalchemy_engine
 
 load_dotenv()
 
@@ -25,6 +26,7 @@ engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"client_encoding": "utf8"}
 )
+instrument_sqlalchemy_engine(engine)  # Latences SQL sur /metrics
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -33,7 +35,10 @@ MONGO_HOST = os.getenv("MONGO_HOST", "localhost")
 MONGO_PORT = int(os.getenv("MONGO_PORT", "27017"))
 MONGO_DB = os.getenv("MONGO_DB", "photoevent_db")
 
-mongo_client = MongoClient(f"mongodb://{MONGO_HOST}:{MONGO_PORT}/")
+mongo_client = MongoClient(
+    f"mongodb://{MONGO_HOST}:{MONGO_PORT}/",
+    event_listeners=[instrument_mongo_listener()]  # Latences MongoDB sur /metrics
+)
 mongo_db = mongo_client[MONGO_DB]
 
 # Collections MongoDB
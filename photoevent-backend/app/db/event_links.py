@@ -0,0 +1,35 @@
+"""
+Correspondance entre les deux tables d'événements
+
+Photos, visages, index de recherche et routes publiques sont indexés par
+app.db.models.Event.id (table `events`). Le statut (EventStatus) et les
+sessions kiosque (clé étrangère) vivent sur app.models.database_models.Event
+(table `events_admin`). Les deux lignes d'un même événement partagent leur
+`code`, unique dans chaque table : c'est la clé de correspondance.
+"""
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.db.models import Event
+from app.models.database_models import Event as AdminEvent, EventStatus
+
+
+def event_ids_with_status(db: Session, event_status: EventStatus) -> List[int]:
+    """Ids `events` des événements dont la fiche `events_admin` a ce statut"""
+    rows = db.query(Event.id).join(AdminEvent, AdminEvent.code == Event.code).filter(
+        AdminEvent.status == event_status
+    )
+    return [row.id for row in rows]
+
+
+def admin_event_id(db: Session, event_id: int) -> Optional[int]:
+    """Id `events_admin` d'un événement `events` (None sans fiche administrateur)"""
+    row = db.query(AdminEvent.id).join(Event, Event.code == AdminEvent.code).filter(Event.id == event_id).first()
+    return row.id if row else None
+
+
+def event_id_for_admin(db: Session, admin_id: int) -> Optional[int]:
+    """Id `events` d'une fiche `events_admin`"""
+    row = db.query(Event.id).join(AdminEvent, AdminEvent.code == Event.code).filter(AdminEvent.id == admin_id).first()
+    return row.id if row else None
@@ -3,7 +3,7 @@ Modèles SQLAlchemy pour PostgreSQL
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey, ARRAY, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey, ARRAY, Text, Boolean, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -37,7 +37,8 @@ class Order(Base):
     id = Column(Integer, primary_key=True, index=True)
     event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False, index=True)
     download_token = Column(String(255), unique=True, nullable=False, index=True)
-    photo_ids = Column(ARRAY(Text), nullable=False)  # Array de MongoDB ObjectIds
+    # Array de MongoDB ObjectIds (JSON sous SQLite pour les jeux de données locaux)
+    photo_ids = Column(ARRAY(Text).with_variant(JSON, "sqlite"), nullable=False)
     method = Column(String(20), nullable=False)  # 'qr' ou 'print'
     expires_at = Column(DateTime, nullable=False, index=True)
     created_at = Column(DateTime, default=func.now(), nullable=False)
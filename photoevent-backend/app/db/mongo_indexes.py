@@ -0,0 +1,175 @@
+"""
+Registre déclaratif des index MongoDB
+
+Chaque index couvre des requêtes réelles de app/ (listées dans QUERY_PATTERNS,
+rejouées avec explain() par test_mongo_indexes.py). ensure_indexes() est
+idempotent : appelé au démarrage (MONGO_ENSURE_INDEXES) ou par
+scripts/create_mongo_indexes.py, il crée les index manquants, remplace ceux
+dont la définition a changé et supprime les index obsolètes.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: Tuple[Tuple[str, int], ...]
+    name: str
+    unique: bool = False
+
+
+@dataclass
+class QueryPattern:
+    """Requête chaude : doit être servie par un index (pas de COLLSCAN)"""
+    source: str
+    collection: str
+    filter: Dict
+    sort: Optional[List[Tuple[str, int]]] = None
+    projection: Optional[Dict] = None
+
+
+MONGO_INDEXES: List[IndexSpec] = [
+    # Galerie / admin : photos d'un événement, triées par date d'upload ;
+    # _id départage les ex aequo de la pagination par curseur
+    IndexSpec("photos", (("event_id", 1), ("uploaded_at", -1), ("_id", -1)), "idx_photos_event_uploaded"),
+    # Pagination des photos sans uploaded_at daté (anciens documents), triées par _id
+    IndexSpec("photos", (("event_id", 1), ("_id", -1)), "idx_photos_event_id"),
+    # Métrique de backlog d'ingestion (pending / processing)
+    IndexSpec("photos", (("status", 1),), "idx_photos_status"),
+    # Progression d'un lot d'upload (agrégation par statut)
+    IndexSpec("photos", (("batch_id", 1),), "idx_photos_batch"),
+    # Construction d'index de recherche et comptes par événement ; photo_id
+    # dans la clé pour les regroupements par photo d'un événement
+    IndexSpec("faces", (("event_id", 1), ("photo_id", 1)), "idx_faces_event_photo"),
+    # Visages d'une photo (comptes, suppression en cascade)
+    IndexSpec("faces", (("photo_id", 1),), "idx_faces_photo"),
+    IndexSpec("shares", (("share_code", 1),), "idx_shares_code", unique=True),
+    IndexSpec("shares", (("event_id", 1), ("created_at", -1)), "idx_shares_event_created"),
+    # Liste admin de tous les partages, plus récents d'abord
+    IndexSpec("shares", (("created_at", -1),), "idx_shares_created"),
+    # Résultats des sessions kiosque : une photo par session, lus par date d'ajout
+    IndexSpec("session_matches", (("session_id", 1), ("photo_id", 1)), "idx_session_matches_photo", unique=True),
+    IndexSpec("session_matches", (("session_id", 1), ("matched_at", 1)), "idx_session_matches_time"),
+]
+
+# Index créés par l'ancien script : champ jamais écrit (faces.similarity) et
+# TTL sur photos.created_at alors que seul uploaded_at est stocké
+OBSOLETE_INDEXES: Dict[str, List[str]] = {
+    "faces": ["idx_event_id", "idx_event_similarity", "idx_photo_id"],
+    "photos": ["idx_expiry_photos"],
+}
+
+_SAMPLE_ID = ObjectId("000000000000000000000000")
+
+QUERY_PATTERNS: List[QueryPattern] = [
+    QueryPattern("photos.get_event_photos", "photos", {"event_id": 1}),
+    QueryPattern("events.get_admin_stats", "photos", {"event_id": 1}, projection={"file_size": 1}),
+    QueryPattern("photos.list_event_photos", "photos",
+                 {"event_id": 1, "uploaded_at": {"$type": "date"},
+                  "$or": [{"uploaded_at": {"$lt": datetime(2024, 1, 1)}},
+                          {"uploaded_at": datetime(2024, 1, 1), "_id": {"$lt": _SAMPLE_ID}}]},
+                 sort=[("uploaded_at", -1), ("_id", -1)]),
+    QueryPattern("photos.list_event_photos (première page)", "photos",
+                 {"event_id": 1, "uploaded_at": {"$type": "date"}}, sort=[("uploaded_at", -1), ("_id", -1)]),
+    QueryPattern("photos.list_event_photos (sans date)", "photos",
+                 {"event_id": 1, "uploaded_at": {"$not": {"$type": "date"}}, "_id": {"$lt": _SAMPLE_ID}},
+                 sort=[("_id", -1)]),
+    QueryPattern("metrics._ingestion_backlog", "photos", {"status": "pending"}),
+    QueryPattern("progress.progress_snapshot (lot)", "photos", {"event_id": 1, "batch_id": "abc"}),
+    QueryPattern("face_index.load_event_index_from_mongo", "faces", {"event_id": 1},
+                 projection={"photo_id": 1, "embedding": 1, "bbox": 1, "confidence": 1}),
+    QueryPattern("photos.get_event_photos (visages par photo)", "faces", {"photo_id": _SAMPLE_ID}),
+    QueryPattern("photos.delete_photo", "faces", {"photo_id": _SAMPLE_ID}),
+    QueryPattern("shares.get_share", "shares", {"share_code": "ABCD1234"}),
+    QueryPattern("shares.list_shares", "shares", {"event_id": 1}, sort=[("created_at", -1)]),
+    QueryPattern("shares.list_shares (tous)", "shares", {}, sort=[("created_at", -1)]),
+    QueryPattern("events.get_admin_stats (partages)", "shares", {"event_id": 1}, projection={"downloads_count": 1}),
+    QueryPattern("session_matcher.store_session_matches", "session_matches",
+                 {"session_id": {"$in": [1, 2]}, "photo_id": {"$in": [_SAMPLE_ID]}}),
+    QueryPattern("search.get_session_matches", "session_matches",
+                 {"session_id": 1, "matched_at": {"$gt": datetime(2024, 1, 1)}}, sort=[("matched_at", 1)]),
+]
+
+
+@dataclass
+class IndexReport:
+    created: List[str] = field(default_factory=list)
+    existing: List[str] = field(default_factory=list)
+    replaced: List[str] = field(default_factory=list)
+    dropped: List[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.created or self.replaced or self.dropped)
+
+
+def _same_definition(info: Dict, spec: IndexSpec) -> bool:
+    return tuple((k, int(v)) for k, v in info["key"]) == spec.keys and bool(info.get("unique")) == spec.unique
+
+
+def missing_indexes(db) -> List[str]:
+    """Index du registre absents ou différents de leur définition"""
+    missing = []
+    for spec in MONGO_INDEXES:
+        info = db[spec.collection].index_information().get(spec.name)
+        if info is None or not _same_definition(info, spec):
+            missing.append(f"{spec.collection}.{spec.name}")
+    return missing
+
+
+def ensure_indexes(db) -> IndexReport:
+    """Appliquer le registre (idempotent)"""
+    report = IndexReport()
+    for collection, names in OBSOLETE_INDEXES.items():
+        existing = db[collection].index_information()
+        for name in names:
+            if name in existing:
+                db[collection].drop_index(name)
+                report.dropped.append(f"{collection}.{name}")
+
+    for spec in MONGO_INDEXES:
+        collection = db[spec.collection]
+        label = f"{spec.collection}.{spec.name}"
+        info = collection.index_information().get(spec.name)
+        if info is not None:
+            if _same_definition(info, spec):
+                report.existing.append(label)
+                continue
+            collection.drop_index(spec.name)
+            report.replaced.append(label)
+        try:
+            collection.create_index(list(spec.keys), name=spec.name, unique=spec.unique)
+        except OperationFailure as e:
+            # Même clé déjà indexée sous un autre nom (index créé à la main)
+            if e.code in (85, 86):
+                report.existing.append(label)
+                continue
+            raise
+        if label not in report.replaced:
+            report.created.append(label)
+    return report
+
+
+def collection_scans(plan: Dict) -> List[str]:
+    """Étapes COLLSCAN d'un plan d'exécution explain()"""
+    stages = []
+    if plan.get("stage") == "COLLSCAN":
+        stages.append("COLLSCAN")
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            stages.extend(collection_scans(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(collection_scans(child))
+    return stages
+
+
+def explain_pattern(db, pattern: QueryPattern) -> Dict:
+    cursor = db[pattern.collection].find(pattern.filter, pattern.projection)
+    if pattern.sort:
+        cursor = cursor.sort(pattern.sort)
+    return cursor.explain()["queryPlanner"]["winningPlan"]
@@ -0,0 +1,147 @@
+"""
+Middleware de métriques HTTP et collecteurs de l'état applicatif pour /metrics
+"""
+import asyncio
+import time
+
+import anyio.to_thread
+from fastapi import Request
+
+from app.core.config import settings
+from app.core.metrics import (
+    HTTP_REQUEST_SECONDS, CachedCollector, CounterFamily, TrackedThreadPoolExecutor, registry
+)
+
+_in_flight = 0
+# Executor par défaut de la boucle (asyncio.to_thread), installé au démarrage
+_default_executor: TrackedThreadPoolExecutor = None
+# Limiteur du pool de threads anyio : routes et dépendances sync (Depends(get_db)),
+# itérateurs sync des StreamingResponse
+_threadpool_limiter = None
+
+
+def install_threadpool_metrics(loop: asyncio.AbstractEventLoop) -> None:
+    """
+    Instrumenter les deux pools de threads (à appeler dans la boucle, au démarrage)
+
+    - executor par défaut de la boucle remplacé par un executor instrumenté
+    - limiteur anyio de la boucle retenu : /metrics, route sync, le lit depuis
+      un thread du pool (le limiteur n'est accessible que dans la boucle)
+    """
+    global _default_executor, _threadpool_limiter
+    _default_executor = TrackedThreadPoolExecutor(thread_name_prefix="asyncio")
+    loop.set_default_executor(_default_executor)
+    _threadpool_limiter = anyio.to_thread.current_default_thread_limiter()
+
+
+async def metrics_middleware(request: Request, call_next):
+    """Latence par route (gabarit FastAPI) et statut, y compris les 429 du rate limiter"""
+    global _in_flight
+    _in_flight += 1
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        _in_flight -= 1
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            request.method,
+            getattr(route, "path", "unmatched"),
+            str(status_code)
+        )
+
+
+def _in_flight_requests():
+    return [((), _in_flight)]
+
+
+def _executor_queue():
+    """Tâches en attente / en cours de l'executor par défaut (asyncio.to_thread)"""
+    executor = _default_executor
+    if executor is None:
+        return [(("queued",), 0), (("running",), 0)]
+    return [
+        (("queued",), executor.queued),
+        (("running",), executor.running)
+    ]
+
+
+def _threadpool_tokens():
+    """Jetons du pool anyio : empruntés (dont celui de /metrics), tâches en attente, capacité"""
+    limiter = _threadpool_limiter
+    if limiter is None:
+        return []
+    stats = limiter.statistics()
+    return [
+        (("borrowed",), stats.borrowed_tokens),
+        (("waiting",), stats.tasks_waiting),
+        (("total",), stats.total_tokens)
+    ]
+
+
+def _index_cache_counters():
+    from app.services.face_index import index_registry
+
+    stats = index_registry.stats()
+    return [((name,), stats[name]) for name in ("hits", "misses", "evictions", "reloads")]
+
+
+def _index_cache_gauges():
+    from app.services.face_index import index_registry
+
+    stats = index_registry.stats()
+    hit_rate = stats["hit_rate"] if stats["hit_rate"] is not None else 0.0
+    return [
+        (("resident_bytes",), stats["resident_mb"] * 1024 * 1024),
+        (("budget_bytes",), stats["budget_mb"] * 1024 * 1024),
+        (("resident_events",), stats["resident_events"]),
+        (("hit_ratio",), hit_rate)
+    ]
+
+
+def _faces_per_event():
+    """Visages des index résidents (pas de requête MongoDB au scrape)"""
+    from app.services.face_index import index_registry
+
+    return [((str(e["event_id"]),), e["faces"]) for e in index_registry.stats()["events"]]
+
+
+def _ingestion_backlog():
+    from app.database import get_mongodb
+
+    photos = get_mongodb().photos
+    return [
+        ((photo_status,), photos.count_documents({"status": photo_status}))
+        for photo_status in ("pending", "processing")
+    ]
+
+
+registry.gauge(
+    "photoevent_http_requests_in_flight", "Requêtes HTTP en cours", (), _in_flight_requests
+)
+registry.gauge(
+    "photoevent_asyncio_executor_tasks", "Executor asyncio par défaut (asyncio.to_thread) : tâches en file et en cours",
+    ("kind",), _executor_queue
+)
+registry.gauge(
+    "photoevent_threadpool_tokens", "Pool de threads anyio (routes sync, Depends, streaming) : jetons",
+    ("kind",), _threadpool_tokens
+)
+registry.register(CounterFamily(
+    "photoevent_face_index_cache_total", "Accès au cache des index de visages", ("result",), _index_cache_counters
+))
+registry.gauge(
+    "photoevent_face_index_cache", "État du cache des index de visages", ("kind",), _index_cache_gauges
+)
+registry.gauge(
+    "photoevent_event_faces", "Visages indexés par événement (index résidents)", ("event_id",), _faces_per_event
+)
+registry.gauge(
+    "photoevent_ingestion_backlog_photos", "Photos en attente de traitement facial", ("status",),
+    # count_documents au plus toutes les METRICS_BACKLOG_TTL_SECONDS
+    CachedCollector(_ingestion_backlog, ttl=settings.METRICS_BACKLOG_TTL_SECONDS)
+)
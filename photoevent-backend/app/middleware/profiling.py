@@ -0,0 +1,65 @@
+"""
+Middleware de profilage à la demande
+
+Une requête est profilée si :
+- elle porte l'en-tête `X-Profile: 1` ou le paramètre `?profile=1` ET un JWT
+  (Authorization: Bearer ...) dont le "sub" est dans PROFILING_ADMIN_USERS
+- ou, sur les routes PROFILING_ROUTES, tirée au sort (PROFILING_SAMPLE_RATE)
+
+Le nom du fichier de profil est renvoyé dans l'en-tête X-Profile-Id.
+"""
+import asyncio
+import random
+import time
+from typing import Optional
+
+from fastapi import Request
+
+from app.core.config import settings
+from app.core.profiling import request_profiler
+from app.core.security import token_in
+
+PROFILE_FLAG_VALUES = ("1", "true", "yes")
+
+
+async def is_profiling_admin(authorization: Optional[str]) -> bool:
+    """JWT valide d'un utilisateur autorisé à profiler"""
+    return await token_in(authorization, settings.PROFILING_ADMIN_USERS)
+
+
+async def _should_profile(request: Request) -> bool:
+    flag = request.headers.get("x-profile") or request.query_params.get("profile")
+    if flag and flag.lower() in PROFILE_FLAG_VALUES:
+        return await is_profiling_admin(request.headers.get("authorization"))
+    if settings.PROFILING_SAMPLE_RATE > 0 and any(
+        request.url.path.startswith(prefix) for prefix in settings.PROFILING_ROUTES
+    ):
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+    return False
+
+
+async def profiling_middleware(request: Request, call_next):
+    """Échantillonner les piles pendant le handler des requêtes retenues"""
+    if not settings.PROFILING_ENABLED or not await _should_profile(request):
+        return await call_next(request)
+
+    sampler = request_profiler.try_start()
+    if sampler is None:
+        # Un profil est déjà en cours dans ce worker
+        return await call_next(request)
+
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        route = request.scope.get("route")
+        profile_name = await asyncio.to_thread(
+            request_profiler.finish,
+            sampler,
+            f"{request.method} {getattr(route, 'path', request.url.path)}",
+            started
+        )
+
+    if profile_name:
+        response.headers["X-Profile-Id"] = profile_name
+    return response
@@ -1,113 +1,329 @@
 """
 Middleware de Rate Limiting pour FastAPI
-10 requêtes par minute par IP
+Algorithme GCRA (token bucket à état constant) par IP, pondéré par route
+
+- un seul flottant par IP : l'heure d'arrivée théorique (TAT), en temps monotone
+- RATE_LIMIT_CAPACITY unités par RATE_LIMIT_WINDOW_SECONDS, chaque route a un coût
+  (une recherche faciale coûte bien plus qu'un /health)
+- la requête refusée est rejetée AVANT l'exécution du handler
+- verrous répartis par shard d'IP, purge planifiée des IPs inactives
+
+Backend (RATE_LIMIT_BACKEND) :
+- memory : état local au processus (chaque worker uvicorn a son propre budget)
+- redis  : état partagé par tous les workers/hôtes, décision atomique par
+  script Lua (horloge du serveur Redis) ; repli automatique sur le backend
+  mémoire si Redis est indisponible
 """
-from fastapi import Request, HTTPException, status
+from fastapi import Request, status
 from fastapi.responses import JSONResponse
-from datetime import datetime, timedelta
-from typing import Dict, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
 import asyncio
+import logging
+import math
+import threading
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    remaining: int  # unités encore disponibles
+    reset_in: int  # secondes avant le prochain essai (refus) ou la recharge complète
+
+
+def gcra(tat: Optional[float], now: float, cost: int, interval: float, burst: float) -> Tuple[bool, float, float]:
+    """
+    Une décision GCRA
+
+    Args:
+        tat: heure d'arrivée théorique stockée (None si clé inconnue)
+        interval: secondes par unité (fenêtre / capacité)
+        burst: tolérance en secondes (= fenêtre : la capacité entière d'un coup)
+
+    Returns:
+        (autorisé, nouvelle TAT (inchangée si refus), attente avant essai en s)
+    """
+    tat = now if tat is None or tat < now else tat
+    new_tat = tat + cost * interval
+    allow_at = new_tat - burst
+    if allow_at > now + 1e-9:  # tolérance d'arrondi flottant
+        return False, tat, allow_at - now
+    return True, new_tat, 0.0
+
+
+class MemoryRateLimitBackend:
+    """État GCRA en mémoire du processus, réparti en shards (un verrou par shard)"""
+
+    def __init__(self, shards: int = 16):
+        self._shards: List[Dict[str, float]] = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    def _shard(self, key: str) -> int:
+        return hash(key) % len(self._shards)
+
+    def acquire(self, key: str, cost: int, interval: float, burst: float, now: Optional[float] = None) -> Tuple[bool, float, float]:
+        """Consommer `cost` unités : (autorisé, secondes de TAT restantes, attente avant essai)"""
+        now = time.monotonic() if now is None else now
+        i = self._shard(key)
+        with self._locks[i]:
+            allowed, tat, retry_after = gcra(self._shards[i].get(key), now, cost, interval, burst)
+            if allowed:
+                self._shards[i][key] = tat
+        return allowed, tat - now, retry_after
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Supprimer les clés dont le seau est de nouveau plein (état équivalent à une clé neuve)"""
+        now = time.monotonic() if now is None else now
+        evicted = 0
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                idle = [key for key, tat in shard.items() if tat <= now]
+                for key in idle:
+                    del shard[key]
+            evicted += len(idle)
+        return evicted
+
+    async def acquire_async(self, key: str, cost: int, interval: float, burst: float) -> Tuple[bool, float, float]:
+        return self.acquire(key, cost, interval, burst)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+# GCRA atomique côté Redis (même calcul que gcra()) ; la clé expire quand le
+# seau est de nouveau plein, Redis purge donc lui-même les IPs inactives.
+# Les flottants sont renvoyés en chaînes (Redis tronque les nombres Lua en entiers).
+GCRA_LUA = """
+local now = tonumber(ARGV[4])
+if not now then
+    local t = redis.call('TIME')
+    now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+end
+local cost = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+local new_tat = tat + cost * interval
+local allow_at = new_tat - burst
+if allow_at > now + 1e-9 then
+    return {0, tostring(tat - now), tostring(allow_at - now)}
+end
+redis.call('SET', KEYS[1], string.format('%.6f', new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, tostring(new_tat - now), '0'}
+"""
+
+
+class RedisRateLimitBackend:
+    """
+    État GCRA partagé dans Redis (client redis.asyncio pour le middleware,
+    client synchrone optionnel pour les appels hors boucle asyncio)
+
+    En cas d'erreur Redis, les décisions passent par le backend mémoire local
+    pendant retry_seconds avant de retenter Redis. Sans client synchrone,
+    acquire() décide avec le backend mémoire local.
+    """
+
+    def __init__(
+        self,
+        client,
+        fallback: Optional[MemoryRateLimitBackend] = None,
+        key_prefix: str = "ratelimit:",
+        retry_seconds: float = 5.0,
+        sync_client=None
+    ):
+        self.client = client
+        self.fallback = fallback if fallback is not None else MemoryRateLimitBackend()
+        self.key_prefix = key_prefix
+        self.retry_seconds = retry_seconds
+        self._script = client.register_script(GCRA_LUA)
+        self._sync_script = sync_client.register_script(GCRA_LUA) if sync_client is not None else None
+        self._down_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    @staticmethod
+    def _script_args(cost: int, interval: float, burst: float, now: Optional[float]) -> List:
+        args = [cost, repr(interval), repr(burst)]
+        if now is not None:
+            args.append(repr(now))
+        return args
+
+    def _redis_failed(self, error: Exception) -> None:
+        self._down_until = time.monotonic() + self.retry_seconds
+        logger.warning(f"Redis indisponible pour le rate limiting, repli mémoire local: {error}")
+
+    def acquire(
+        self, key: str, cost: int, interval: float, burst: float, now: Optional[float] = None
+    ) -> Tuple[bool, float, float]:
+        """Décision atomique dans Redis, appel bloquant (repli mémoire si Redis est indisponible)"""
+        if self._sync_script is not None and self.available:
+            try:
+                allowed, tat_ahead, retry_after = self._sync_script(
+                    keys=[self.key_prefix + key], args=self._script_args(cost, interval, burst, now)
+                )
+                return bool(int(allowed)), float(tat_ahead), float(retry_after)
+            except Exception as e:
+                self._redis_failed(e)
+        return self.fallback.acquire(key, cost, interval, burst)
+
+    async def acquire_async(
+        self, key: str, cost: int, interval: float, burst: float, now: Optional[float] = None
+    ) -> Tuple[bool, float, float]:
+        """Décision atomique dans Redis (repli mémoire si Redis est indisponible)"""
+        if self.available:
+            try:
+                allowed, tat_ahead, retry_after = await self._script(
+                    keys=[self.key_prefix + key], args=self._script_args(cost, interval, burst, now)
+                )
+                return bool(int(allowed)), float(tat_ahead), float(retry_after)
+            except Exception as e:
+                self._redis_failed(e)
+        return self.fallback.acquire(key, cost, interval, burst)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        # Les clés Redis expirent d'elles-mêmes ; seul le repli local est purgé
+        return self.fallback.evict_idle(now)
+
+    def __len__(self) -> int:
+        return len(self.fallback)
+
+
+def create_rate_limit_backend():
+    """Backend configuré par RATE_LIMIT_BACKEND (memory ou redis)"""
+    memory_backend = MemoryRateLimitBackend(shards=settings.RATE_LIMIT_SHARDS)
+    if settings.RATE_LIMIT_BACKEND != "redis":
+        return memory_backend
+    try:
+        import redis
+        import redis.asyncio as redis_asyncio
+    except ImportError:
+        logger.warning("Paquet redis non installé : rate limiting en mémoire locale")
+        return memory_backend
+
+    timeouts = {
+        "socket_timeout": settings.RATE_LIMIT_REDIS_TIMEOUT_SECONDS,
+        "socket_connect_timeout": settings.RATE_LIMIT_REDIS_TIMEOUT_SECONDS
+    }
+    return RedisRateLimitBackend(
+        redis_asyncio.Redis.from_url(settings.REDIS_URL, **timeouts),
+        fallback=memory_backend,
+        retry_seconds=settings.RATE_LIMIT_REDIS_RETRY_SECONDS,
+        sync_client=redis.Redis.from_url(settings.REDIS_URL, **timeouts)
+    )
+
 
 class RateLimiter:
     """
-    Rate limiter simple basé sur les IPs
-    Limite: 10 requêtes par minute par IP
+    Rate limiter GCRA par IP
+    Capacité: max_requests unités par window_seconds, coût par route
     """
-    def __init__(self, max_requests: int = 10, window_seconds: int = 60):
+    def __init__(
+        self,
+        max_requests: int = 600,
+        window_seconds: int = 60,
+        route_costs: Optional[Dict[str, int]] = None,
+        default_cost: int = 1,
+        backend=None
+    ):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests: Dict[str, list] = {}  # IP -> [timestamps]
-        self.lock = asyncio.Lock()
-    
-    async def check_rate_limit(self, client_ip: str) -> Tuple[bool, int, int]:
+        self.interval = window_seconds / max_requests
+        self.default_cost = min(default_cost, max_requests)
+        # Préfixes les plus longs d'abord (le plus spécifique gagne)
+        self.route_costs = sorted(
+            ((prefix, min(cost, max_requests)) for prefix, cost in (route_costs or {}).items()),
+            key=lambda item: len(item[0]),
+            reverse=True
+        )
+        self.backend = backend if backend is not None else MemoryRateLimitBackend()
+
+    def cost_for(self, path: str) -> int:
+        """Coût d'une requête selon sa route (0 = non limitée)"""
+        for prefix, cost in self.route_costs:
+            if path.startswith(prefix):
+                return cost
+        return self.default_cost
+
+    def _result(self, allowed: bool, tat_ahead: float, retry_after: float) -> RateLimitResult:
+        remaining = max(0, int((self.window_seconds - tat_ahead) / self.interval + 1e-9))
+        reset_in = retry_after if not allowed else tat_ahead
+        return RateLimitResult(allowed, remaining, max(math.ceil(reset_in), 1 if not allowed else 0))
+
+    def acquire(self, client_ip: str, cost: int = 1, now: Optional[float] = None) -> RateLimitResult:
+        """Décision O(1), appel synchrone avec le backend configuré (utilisable hors boucle asyncio)"""
+        return self._result(*self.backend.acquire(client_ip, cost, self.interval, self.window_seconds, now))
+
+    async def consume(self, client_ip: str, cost: int = 1) -> RateLimitResult:
+        """Décision O(1) avec le backend configuré (mémoire ou Redis)"""
+        return self._result(*await self.backend.acquire_async(client_ip, cost, self.interval, self.window_seconds))
+
+    async def check_rate_limit(self, client_ip: str, cost: int = 1) -> Tuple[bool, int, int]:
         """
         Vérifier si le client a dépassé le rate limit
         Retourne: (allowed, remaining, reset_in_seconds)
         """
-        async with self.lock:
-            now = datetime.utcnow()
-            
-            # Initialiser la liste si nécessaire
-            if client_ip not in self.requests:
-                self.requests[client_ip] = []
-            
-            # Nettoyer les anciennes requêtes
-            cutoff = now - timedelta(seconds=self.window_seconds)
-            self.requests[client_ip] = [
-                req_time for req_time in self.requests[client_ip]
-                if req_time > cutoff
-            ]
-            
-            # Vérifier le limit
-            current_count = len(self.requests[client_ip])
-            
-            if current_count >= self.max_requests:
-                # Calculer le temps avant réinitialisation
-                oldest_request = self.requests[client_ip][0]
-                reset_time = oldest_request + timedelta(seconds=self.window_seconds)
-                reset_in = (reset_time - now).total_seconds()
-                return False, 0, max(int(reset_in), 1)
-            
-            # Ajouter la requête
-            self.requests[client_ip].append(now)
-            remaining = self.max_requests - current_count - 1
-            
-            return True, remaining, self.window_seconds
-    
-    async def cleanup_old_ips(self):
-        """Nettoyer les IPs inactives toutes les heures"""
+        return tuple(await self.consume(client_ip, cost))
+
+    async def cleanup_old_ips(self, interval_seconds: Optional[int] = None):
+        """Purger périodiquement les IPs inactives (seau de nouveau plein)"""
         while True:
-            await asyncio.sleep(3600)
-            async with self.lock:
-                now = datetime.utcnow()
-                cutoff = now - timedelta(hours=1)
-                
-                to_delete = [
-                    ip for ip, requests in self.requests.items()
-                    if all(req < cutoff for req in requests)
-                ]
-                
-                for ip in to_delete:
-                    del self.requests[ip]
+            await asyncio.sleep(interval_seconds or settings.RATE_LIMIT_CLEANUP_SECONDS)
+            self.backend.evict_idle()
+
 
 # Instance globale du rate limiter
-# Limites: 100 requêtes par minute par IP (bien plus que 10 pour laisser de la flexibilité)
-rate_limiter = RateLimiter(max_requests=100, window_seconds=60)
+rate_limiter = RateLimiter(
+    max_requests=settings.RATE_LIMIT_CAPACITY,
+    window_seconds=settings.RATE_LIMIT_WINDOW_SECONDS,
+    route_costs=settings.RATE_LIMIT_ROUTE_COSTS,
+    default_cost=settings.RATE_LIMIT_DEFAULT_COST,
+    backend=create_rate_limit_backend()
+)
+
+
+def rate_limit_headers(result: RateLimitResult, cost: int) -> Dict[str, str]:
+    return {
+        "X-RateLimit-Limit": str(rate_limiter.max_requests),
+        "X-RateLimit-Remaining": str(result.remaining),
+        "X-RateLimit-Reset": str(int(time.time() + result.reset_in)),
+        "X-RateLimit-Cost": str(cost)
+    }
+
 
 async def rate_limit_middleware(request: Request, call_next):
     """
     Middleware pour appliquer le rate limiting
-    N'applique PAS le rate limiting aux fichiers statiques (/uploads/)
+    Routes de coût 0 (fichiers statiques /uploads/) non limitées
     """
-    # EXCLURE les fichiers statiques du rate limiting
-    if request.url.path.startswith("/uploads/"):
+    cost = rate_limiter.cost_for(request.url.path)
+    if cost == 0:
         return await call_next(request)
-    
+
     # Obtenir l'IP du client
     client_ip = request.client.host if request.client else "unknown"
-    
-    # Vérifier le rate limit
-    allowed, remaining, reset_in = await rate_limiter.check_rate_limit(client_ip)
-    
-    # Ajouter les headers de rate limit
-    response = await call_next(request)
-    response.headers["X-RateLimit-Limit"] = str(rate_limiter.max_requests)
-    response.headers["X-RateLimit-Remaining"] = str(max(0, remaining))
-    response.headers["X-RateLimit-Reset"] = str(int((datetime.utcnow() + timedelta(seconds=reset_in)).timestamp()))
-    
-    if not allowed:
+
+    # Vérifier le rate limit AVANT d'exécuter la route
+    result = await rate_limiter.consume(client_ip, cost)
+    headers = rate_limit_headers(result, cost)
+
+    if not result.allowed:
         return JSONResponse(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             content={
-                "detail": f"Rate limit exceeded. Retry after {reset_in} seconds",
-                "retry_after": reset_in
+                "detail": f"Rate limit exceeded. Retry after {result.reset_in} seconds",
+                "retry_after": result.reset_in
             },
-            headers={
-                "Retry-After": str(reset_in),
-                "X-RateLimit-Limit": str(rate_limiter.max_requests),
-                "X-RateLimit-Remaining": "0",
-                "X-RateLimit-Reset": str(int((datetime.utcnow() + timedelta(seconds=reset_in)).timestamp()))
-            }
+            headers={"Retry-After": str(result.reset_in), **headers}
         )
-    
+
+    response = await call_next(request)
+    response.headers.update(headers)
     return response
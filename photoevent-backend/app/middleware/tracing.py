@@ -0,0 +1,28 @@
+"""
+Middleware de traçage : une trace par requête, en-têtes Server-Timing et X-Trace-Id
+"""
+from fastapi import Request
+
+from app.core.config import settings
+from app.core.tracing import end_trace, start_trace, trace_recorder
+
+
+async def tracing_middleware(request: Request, call_next):
+    """Ouvrir la trace avant la route, la clôturer et l'enregistrer après"""
+    if not settings.TRACE_ENABLED:
+        return await call_next(request)
+
+    trace, token = start_trace(request.url.path)
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        end_trace(token)
+        route = request.scope.get("route")
+        trace.finish(f"{request.method} {getattr(route, 'path', 'unmatched')}", status_code)
+        trace_recorder.record(trace)
+
+    response.headers["Server-Timing"] = trace.server_timing()
+    response.headers["X-Trace-Id"] = trace.trace_id
+    return response
@@ -19,7 +19,9 @@ from app.schemas.photo import (
     PhotoUploadResponse,
     FaceDetectionResponse,
     FaceSearchRequest,
-    FaceSearchResponse
+    FaceSearchResponse,
+    KioskSessionCreate,
+    KioskSessionResponse
 )
 
 __all__ = [
@@ -33,5 +35,7 @@ __all__ = [
     "PhotoUploadResponse",
     "FaceDetectionResponse",
     "FaceSearchRequest",
-    "FaceSearchResponse"
+    "FaceSearchResponse",
+    "KioskSessionCreate",
+    "KioskSessionResponse"
 ]
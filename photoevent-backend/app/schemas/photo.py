@@ -15,6 +15,7 @@ class PhotoUploadResponse(BaseModel):
     event_id: int
     status: str = Field(..., description="Status: 'pending', 'processing', 'ready', 'error'")
     uploaded_at: datetime.datetime
+    batch_id: Optional[str] = Field(None, description="Lot d'upload (suivi via /photos/event/{event_id}/progress)")
 
 
 class FaceDetectionResponse(BaseModel):
@@ -37,3 +38,19 @@ class FaceSearchResponse(BaseModel):
     matches: list[dict] = Field(..., description="Photos correspondantes avec scores")
     total_matches: int
     threshold_used: float
+
+
+class KioskSessionCreate(BaseModel):
+    """Ouverture d'une session kiosque (selfie de référence)"""
+    event_id: int = Field(..., description="ID de l'événement")
+    face_image: str = Field(..., description="Image du visage en base64")
+    visitor_name: Optional[str] = Field(None, max_length=255)
+    visitor_email: Optional[str] = Field(None, max_length=255)
+
+
+class KioskSessionResponse(BaseModel):
+    """Session kiosque et photos déjà trouvées"""
+    session_code: str
+    event_id: Optional[int] = Field(None, description="ID de l'événement (table events)")
+    matched_photos: int
+    matches: list[dict] = Field(..., description="Photos de la session (plus anciennes d'abord)")
@@ -0,0 +1,84 @@
+"""
+Compteurs de photos et de visages par événement (collection `event_stats`)
+
+Un document par événement ({_id: event_id, photos, faces}) tenu à jour par
+$inc à l'upload, à la fin de l'extraction et à la suppression. Les listes
+paginées lisent le total ici au lieu de compter les documents à chaque page.
+
+Un compteur absent (événement antérieur, données importées) est initialisé
+au premier accès par un comptage. Les incréments font un upsert : un
+incrément arrivé avant l'initialisation crée le document marqué
+counted=False, remplacé par le comptage au premier accès (le document est
+écrit en une seule opération, sans fenêtre entre lecture et insertion).
+rebuild_event_stats() le recalcule en cas de dérive ; la
+réparation d'intégrité du stockage (app/services/storage_integrity.py)
+l'appelle pour chaque événement analysé.
+"""
+from datetime import datetime
+from typing import Dict
+
+from pymongo.errors import DuplicateKeyError
+
+
+def _increment(mongo_db, event_id: int, photos: int = 0, faces: int = 0) -> None:
+    mongo_db.event_stats.update_one(
+        {"_id": event_id},
+        {
+            "$inc": {"photos": photos, "faces": faces},
+            "$set": {"updated_at": datetime.utcnow()},
+            "$setOnInsert": {"counted": False}
+        },
+        upsert=True
+    )
+
+
+def record_photo_added(mongo_db, event_id: int) -> None:
+    _increment(mongo_db, event_id, photos=1)
+
+
+def record_faces_added(mongo_db, event_id: int, faces: int) -> None:
+    if faces:
+        _increment(mongo_db, event_id, faces=faces)
+
+
+def record_photos_removed(mongo_db, event_id: int, photos: int, faces: int = 0) -> None:
+    if photos or faces:
+        _increment(mongo_db, event_id, photos=-photos, faces=-faces)
+
+
+def rebuild_event_stats(mongo_db, event_id: int) -> Dict[str, int]:
+    """Recompter depuis photos / faces et écraser le compteur"""
+    counts = {
+        "photos": mongo_db.photos.count_documents({"event_id": event_id}),
+        "faces": mongo_db.faces.count_documents({"event_id": event_id})
+    }
+    mongo_db.event_stats.update_one(
+        {"_id": event_id},
+        {"$set": {**counts, "counted": True, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+    return counts
+
+
+def get_event_stats(mongo_db, event_id: int) -> Dict[str, int]:
+    """{"photos", "faces"} de l'événement (initialisé par comptage au premier accès)"""
+    doc = mongo_db.event_stats.find_one({"_id": event_id}, {"photos": 1, "faces": 1, "counted": 1})
+    # counted=False : créé par un incrément, pas encore compté
+    if doc is not None and doc.get("counted", True):
+        return {"photos": doc.get("photos", 0), "faces": doc.get("faces", 0)}
+
+    counts = {
+        "photos": mongo_db.photos.count_documents({"event_id": event_id}),
+        "faces": mongo_db.faces.count_documents({"event_id": event_id})
+    }
+    try:
+        # Absent ou non compté : écrit en une opération ; déjà compté : clé en double
+        mongo_db.event_stats.update_one(
+            {"_id": event_id, "counted": {"$ne": True}},
+            {"$set": {**counts, "counted": True, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Initialisé en parallèle par une autre requête
+        return get_event_stats(mongo_db, event_id)
+    return counts
@@ -0,0 +1,877 @@
+"""
+Index mémoire des visages par événement
+Les embeddings d'un événement sont chargés une seule fois depuis MongoDB
+dans une matrice numpy, puis la recherche se fait en un produit matriciel
+
+Représentation compressée optionnelle (FACE_INDEX_DTYPE) :
+- float32 : recherche exacte en une passe (4 octets / dimension)
+- float16 : 2 octets / dimension
+- int8    : 1 octet / dimension + une échelle float32 par vecteur
+En float16/int8 la recherche se fait en deux passes : scores approchés sur
+les codes compressés, puis re-scoring exact des meilleurs candidats à partir
+des embeddings pleine précision (snapshot disque ou MongoDB)
+
+Avec FACE_INDEX_SNAPSHOTS, l'index est relu en memory-map depuis son
+snapshot disque (voir face_snapshots.py) au lieu d'être reconstruit depuis MongoDB
+
+Pendant un événement en direct, l'ingestion ajoute les visages à un segment
+mutable (SegmentedEventIndex) au lieu d'invalider l'index ; une compaction de
+fond fusionne les segments et republie le snapshot
+"""
+
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+INDEX_DTYPES = ("float32", "float16", "int8")
+
+# Lignes converties en float32 à la fois pendant le scoring approché
+# (bloc tenant en cache CPU, borne la mémoire temporaire de la recherche)
+SCORING_CHUNK_ROWS = 2048
+
+ExactLoader = Callable[[np.ndarray], np.ndarray]
+
+
+def quantize_embeddings(embeddings: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Compresser une matrice d'embeddings L2-normalisés
+
+    Returns:
+        (codes, échelles par vecteur ou None)
+    """
+    if dtype == "float32":
+        return embeddings.astype(np.float32, copy=False), None
+    if dtype == "float16":
+        return embeddings.astype(np.float16), None
+    if dtype == "int8":
+        # Quantification scalaire symétrique : une échelle par vecteur
+        scales = np.abs(embeddings).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.round(embeddings / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"FACE_INDEX_DTYPE inconnu: {dtype} (attendu: {', '.join(INDEX_DTYPES)})")
+
+
+def approximate_scores(codes: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+    """Similarités cosinus (approchées si codes compressés) avec une requête normalisée"""
+    if codes.dtype == np.float32:
+        return codes @ query
+
+    scores = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), SCORING_CHUNK_ROWS):
+        block = codes[start:start + SCORING_CHUNK_ROWS].astype(np.float32)
+        scores[start:start + SCORING_CHUNK_ROWS] = block @ query
+    if scales is not None:
+        scores *= scales
+    return scores
+
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """Normaliser chaque ligne en L2 (en place)"""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    embeddings /= norms
+    return embeddings
+
+
+class EventFaceIndex:
+    """Matrice des embeddings L2-normalisés d'un événement
+
+    Chaque ligne correspond à un document de la collection `faces`.
+    `face_ordinals` conserve l'index du visage dans sa photo (même
+    numérotation que `search_faces_in_event`). Les ids (photo, visage)
+    sont stockés en tableaux d'octets fixes (ObjectId hex = 24 caractères)
+    plutôt qu'en listes de str Python.
+    """
+
+    def __init__(
+        self,
+        event_id: int,
+        codes: np.ndarray,
+        scales: Optional[np.ndarray],
+        photo_ids: np.ndarray,
+        face_ids: np.ndarray,
+        bboxes: np.ndarray,
+        confidences: np.ndarray,
+        face_ordinals: np.ndarray,
+        exact_loader: Optional[ExactLoader] = None
+    ):
+        self.event_id = event_id
+        self.codes = codes
+        self.scales = scales
+        self.photo_ids = photo_ids
+        self.face_ids = face_ids
+        self.bboxes = bboxes
+        self.confidences = confidences
+        self.face_ordinals = face_ordinals
+        self.exact_loader = exact_loader
+        # Version du snapshot disque d'origine (None si construit depuis MongoDB)
+        self.snapshot_version: Optional[str] = None
+        self.snapshot_faces: Optional[int] = None
+
+    @classmethod
+    def from_documents(
+        cls,
+        event_id: int,
+        face_docs,
+        dtype: Optional[str] = None,
+        exact_loader: Optional[ExactLoader] = None
+    ) -> "EventFaceIndex":
+        """Construire l'index depuis des documents `faces` MongoDB"""
+        dtype = dtype or settings.FACE_INDEX_DTYPE
+        photo_ids = []
+        face_ids = []
+        bboxes = []
+        confidences = []
+        face_ordinals = []
+        vectors = []
+        per_photo_count: Dict[str, int] = {}
+
+        for face_doc in face_docs:
+            photo_id = str(face_doc['photo_id'])
+            ordinal = per_photo_count.get(photo_id, 0)
+            per_photo_count[photo_id] = ordinal + 1
+
+            photo_ids.append(photo_id)
+            face_ids.append(str(face_doc.get('_id', '')))
+            vectors.append(face_doc['embedding'])
+            bboxes.append(face_doc['bbox'])
+            confidences.append(float(face_doc.get('confidence', 0.9)))
+            face_ordinals.append(ordinal)
+
+        if vectors:
+            # Re-normaliser (anciens documents potentiellement non normalisés)
+            embeddings = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        else:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+        del vectors
+
+        codes, scales = quantize_embeddings(embeddings, dtype)
+        face_ids = np.asarray(face_ids, dtype='S24')
+        if exact_loader is None and dtype != "float32":
+            exact_loader = mongo_exact_loader(face_ids)
+
+        return cls(
+            event_id=event_id,
+            codes=codes,
+            scales=scales,
+            photo_ids=np.asarray(photo_ids, dtype='S24'),
+            face_ids=face_ids,
+            bboxes=np.asarray(bboxes, dtype=np.int32).reshape(-1, 4),
+            confidences=np.asarray(confidences, dtype=np.float32),
+            face_ordinals=np.asarray(face_ordinals, dtype=np.int32),
+            exact_loader=exact_loader
+        )
+
+    @classmethod
+    def from_exact(cls, exact_index: "EventFaceIndex", dtype: Optional[str] = None) -> "EventFaceIndex":
+        """Compresser un index float32 (re-scoring depuis MongoDB si compressé)"""
+        dtype = dtype or settings.FACE_INDEX_DTYPE
+        if dtype == "float32":
+            return exact_index
+        codes, scales = quantize_embeddings(exact_index.codes, dtype)
+        return cls(
+            event_id=exact_index.event_id,
+            codes=codes,
+            scales=scales,
+            photo_ids=exact_index.photo_ids,
+            face_ids=exact_index.face_ids,
+            bboxes=exact_index.bboxes,
+            confidences=exact_index.confidences,
+            face_ordinals=exact_index.face_ordinals,
+            exact_loader=mongo_exact_loader(exact_index.face_ids)
+        )
+
+    def __len__(self) -> int:
+        return len(self.photo_ids)
+
+    @property
+    def dtype(self) -> str:
+        return self.codes.dtype.name
+
+    def exact_rows(self, positions: np.ndarray) -> np.ndarray:
+        """Embeddings pleine précision des lignes demandées"""
+        if self.codes.dtype == np.float32:
+            return np.asarray(self.codes[positions])
+        return self.exact_loader(positions)
+
+    @property
+    def nbytes(self) -> int:
+        """Taille mémoire des matrices numpy de l'index"""
+        arrays = [
+            self.codes, self.photo_ids, self.face_ids, self.bboxes,
+            self.confidences, self.face_ordinals
+        ]
+        if self.scales is not None:
+            arrays.append(self.scales)
+        return int(sum(a.nbytes for a in arrays))
+
+    def search(
+        self,
+        query_embedding,
+        threshold: float,
+        rescore_limit: Optional[int] = None,
+        margin: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Rechercher un visage dans l'index
+
+        Args:
+            rescore_limit: nombre max de candidats re-scorés en pleine précision
+            margin: marge sous le seuil pour les scores approchés
+
+        Returns:
+            Liste de matches triés par score (même format que
+            FaceRecognitionService.search_faces_in_event)
+        """
+        if len(self) == 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        query = query / norm
+
+        scores = approximate_scores(self.codes, self.scales, query)
+        if self.codes.dtype == np.float32:
+            positions = np.flatnonzero(scores >= threshold)
+            final_scores = scores[positions]
+        else:
+            positions, final_scores = self._rescore(
+                scores, query, threshold,
+                rescore_limit if rescore_limit is not None else settings.FACE_INDEX_RESCORE_LIMIT,
+                margin if margin is not None else settings.FACE_INDEX_RESCORE_MARGIN
+            )
+
+        # Trier par score décroissant
+        order = np.argsort(-final_scores, kind='stable')
+        return [
+            self._match(int(positions[i]), float(final_scores[i]))
+            for i in order
+        ]
+
+    def _rescore(
+        self,
+        approx_scores: np.ndarray,
+        query: np.ndarray,
+        threshold: float,
+        rescore_limit: int,
+        margin: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Deuxième passe : scores exacts des meilleurs candidats approchés"""
+        candidates = np.flatnonzero(approx_scores >= threshold - margin)
+        if len(candidates) > rescore_limit:
+            top = np.argpartition(-approx_scores[candidates], rescore_limit - 1)[:rescore_limit]
+            candidates = candidates[top]
+        if len(candidates) == 0:
+            return candidates, np.zeros(0, dtype=np.float32)
+
+        candidates.sort()
+        rows = self.exact_loader(candidates)
+        if rows.shape[1] != len(query):
+            return candidates[:0], np.zeros(0, dtype=np.float32)
+        exact = rows @ query
+        keep = exact >= threshold
+        return candidates[keep], exact[keep]
+
+    def _match(self, pos: int, similarity: float) -> Dict:
+        return {
+            'photo_id': self.photo_ids[pos].decode(),
+            'face_index': int(self.face_ordinals[pos]),
+            'similarity': max(0.0, similarity),
+            'bbox': [int(v) for v in self.bboxes[pos]],
+            'confidence': float(self.confidences[pos])
+        }
+
+
+def mongo_exact_loader(face_ids: np.ndarray) -> ExactLoader:
+    """Relire les embeddings pleine précision des candidats depuis MongoDB"""
+
+    def load(positions: np.ndarray) -> np.ndarray:
+        from bson import ObjectId
+        from app.database import get_mongodb
+
+        ids = [face_ids[pos].decode() for pos in positions]
+        docs = get_mongodb().faces.find(
+            {"_id": {"$in": [ObjectId(face_id) for face_id in ids]}},
+            {"embedding": 1}
+        )
+        by_id = {str(doc["_id"]): doc["embedding"] for doc in docs}
+
+        rows = np.zeros((len(ids), 0), dtype=np.float32)
+        vectors = [by_id.get(face_id) for face_id in ids]
+        dim = next((len(v) for v in vectors if v is not None), 0)
+        if dim:
+            # Visage supprimé entre-temps : ligne nulle, score 0
+            rows = np.asarray([v if v is not None else [0.0] * dim for v in vectors], dtype=np.float32)
+            normalize_rows(rows)
+        return rows
+
+    return load
+
+
+def load_event_index_from_mongo(event_id: int, dtype: Optional[str] = None) -> EventFaceIndex:
+    """Construire l'index d'un événement depuis MongoDB (projection minimale)"""
+    from app.database import get_mongodb
+
+    faces_collection = get_mongodb().faces
+    face_docs = faces_collection.find(
+        {"event_id": event_id},
+        {"photo_id": 1, "embedding": 1, "bbox": 1, "confidence": 1}
+    )
+    return EventFaceIndex.from_documents(event_id, face_docs, dtype=dtype)
+
+
+def load_event_index(event_id: int) -> EventFaceIndex:
+    """
+    Charger l'index d'un événement
+
+    Snapshot disque mappé s'il est à jour (même nombre de visages que MongoDB),
+    sinon reconstruction depuis MongoDB et écriture d'un nouveau snapshot
+    """
+    if not settings.FACE_INDEX_SNAPSHOTS:
+        return load_event_index_from_mongo(event_id)
+
+    from app.database import get_mongodb
+    from app.services.face_snapshots import load_event_snapshot, write_event_snapshot
+
+    faces_count = get_mongodb().faces.count_documents({"event_id": event_id})
+    snapshot = load_event_snapshot(event_id)
+    if snapshot is not None and snapshot.snapshot_faces == faces_count:
+        return snapshot
+
+    exact_index = load_event_index_from_mongo(event_id, dtype="float32")
+    try:
+        write_event_snapshot(exact_index)
+        snapshot = load_event_snapshot(event_id)
+        if snapshot is not None:
+            return snapshot
+    except OSError as e:
+        print(f"⚠️ Snapshot index événement {event_id} non écrit: {e}")
+    return load_event_index_from_mongo(event_id)
+
+
+def snapshot_version_of(event_id: int) -> Optional[str]:
+    """Version courante du snapshot disque (publiée par n'importe quel worker)"""
+    from app.services.face_snapshots import current_snapshot_version
+
+    return current_snapshot_version(event_id)
+
+
+def event_faces_count(event_id: int) -> Optional[int]:
+    """Nombre de visages de l'événement d'après event_stats (tous workers), None si illisible"""
+    from app.database import get_mongodb
+    from app.services.event_stats import get_event_stats
+
+    try:
+        return get_event_stats(get_mongodb(), event_id)["faces"]
+    except Exception as e:
+        print(f"⚠️ Compteur de visages de l'événement {event_id} illisible: {e}")
+        return None
+
+
+def merge_segments(
+    event_id: int,
+    segments: List[EventFaceIndex],
+    tombstones: frozenset,
+    drop_face_ids: Optional[np.ndarray] = None
+) -> EventFaceIndex:
+    """
+    Fusionner des segments en un index float32, sans les photos supprimées
+    (ni les visages de drop_face_ids)
+
+    Les embeddings exacts sont relus segment par segment (snapshot mappé ou
+    MongoDB pour un segment compressé construit sans snapshot)
+    """
+    segments = [segment for segment in segments if len(segment)]
+    if not segments:
+        return EventFaceIndex.from_documents(event_id, [], dtype="float32")
+
+    photo_ids = np.concatenate([segment.photo_ids for segment in segments])
+    keep = ~np.isin(photo_ids, np.asarray(list(tombstones), dtype='S24')) if tombstones else \
+        np.ones(len(photo_ids), dtype=bool)
+    if drop_face_ids is not None:
+        keep &= ~np.isin(np.concatenate([segment.face_ids for segment in segments]), drop_face_ids)
+
+    def merged(attribute: str) -> np.ndarray:
+        return np.concatenate([np.asarray(getattr(segment, attribute)) for segment in segments])[keep]
+
+    embeddings = np.concatenate([segment.exact_rows(np.arange(len(segment))) for segment in segments])
+    return EventFaceIndex(
+        event_id=event_id,
+        codes=np.ascontiguousarray(embeddings[keep], dtype=np.float32),
+        scales=None,
+        photo_ids=photo_ids[keep],
+        face_ids=merged("face_ids"),
+        bboxes=merged("bboxes"),
+        confidences=merged("confidences"),
+        face_ordinals=merged("face_ordinals")
+    )
+
+
+def publish_merged_index(merged: EventFaceIndex) -> EventFaceIndex:
+    """
+    Rendre consultable un index fusionné dans la représentation configurée
+
+    Avec les snapshots, l'index est écrit sur disque puis relu en memory-map
+    (les autres workers le rechargent via la nouvelle version). Si MongoDB
+    contient des visages inconnus de ce worker (ingérés par un autre), l'index
+    est reconstruit depuis MongoDB plutôt que publié incomplet.
+    """
+    if not settings.FACE_INDEX_SNAPSHOTS:
+        return EventFaceIndex.from_exact(merged)
+
+    from app.database import get_mongodb
+    from app.services.face_snapshots import load_event_snapshot, write_event_snapshot
+
+    if get_mongodb().faces.count_documents({"event_id": merged.event_id}) != len(merged):
+        return load_event_index(merged.event_id)
+    write_event_snapshot(merged)
+    return load_event_snapshot(merged.event_id) or EventFaceIndex.from_exact(merged)
+
+
+class SegmentedEventIndex:
+    """
+    Index d'un événement en segments (type LSM) pour les événements en direct
+
+    - segments scellés : matrices immuables (le premier est l'index de base,
+      en général le snapshot mappé)
+    - segment mutable : petits ajouts de l'ingestion, scellé à
+      FACE_INDEX_SEGMENT_SIZE visages
+    - pierres tombales : photos supprimées, filtrées à la recherche
+
+    La recherche parcourt tous les segments et fusionne les résultats triés ;
+    l'ingestion n'invalide plus l'index. La compaction (compact) fusionne
+    les segments hors du verrou et remplace la liste en une seule affectation.
+    """
+
+    def __init__(self, event_id: int, base: EventFaceIndex, publish: Callable = None):
+        self.event_id = event_id
+        self._publish = publish or publish_merged_index
+        self._lock = threading.Lock()
+        self._sealed: List[EventFaceIndex] = [base]
+        self._mutable_docs: List[Dict] = []
+        self._mutable: Optional[EventFaceIndex] = None
+        self._tombstones: frozenset = frozenset()
+        # Ajouts/suppressions non encore publiés (et depuis quand)
+        self._dirty_since: Optional[float] = None
+        self.snapshot_version = base.snapshot_version
+        self.compactions = 0
+
+    def _segments(self) -> Tuple[List[EventFaceIndex], frozenset]:
+        with self._lock:
+            segments = list(self._sealed)
+            if self._mutable is not None:
+                segments.append(self._mutable)
+            return segments, self._tombstones
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self._segments()[0])
+
+    @property
+    def dtype(self) -> str:
+        return self._sealed[0].dtype
+
+    @property
+    def nbytes(self) -> int:
+        return sum(segment.nbytes for segment in self._segments()[0])
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._segments()[0])
+
+    @property
+    def tombstone_count(self) -> int:
+        return len(self._tombstones)
+
+    def add_faces(self, face_docs: List[Dict]) -> None:
+        """Ajouter les visages d'une photo (documents `faces` déjà insérés)"""
+        if not face_docs:
+            return
+        with self._lock:
+            self._mutable_docs.extend(face_docs)
+            mutable = EventFaceIndex.from_documents(self.event_id, self._mutable_docs, dtype="float32")
+            if len(self._mutable_docs) >= settings.FACE_INDEX_SEGMENT_SIZE:
+                self._sealed.append(mutable)
+                self._mutable_docs = []
+                self._mutable = None
+            else:
+                self._mutable = mutable
+            if self._dirty_since is None:
+                self._dirty_since = time.time()
+
+    def delete_photo(self, photo_id: str) -> None:
+        """Masquer les visages d'une photo supprimée (pierre tombale)"""
+        with self._lock:
+            self._tombstones = self._tombstones | {str(photo_id).encode()}
+            if self._dirty_since is None:
+                self._dirty_since = time.time()
+
+    def search(self, query_embedding, threshold: float, **kwargs) -> List[Dict]:
+        """Rechercher dans tous les segments et fusionner par score décroissant"""
+        segments, tombstones = self._segments()
+        per_segment = [segment.search(query_embedding, threshold, **kwargs) for segment in segments]
+        if tombstones:
+            per_segment = [
+                [m for m in matches if m['photo_id'].encode() not in tombstones]
+                for matches in per_segment
+            ]
+        if len(per_segment) == 1:
+            return per_segment[0]
+        return list(heapq.merge(*per_segment, key=lambda m: -m['similarity']))
+
+    def needs_compaction(self) -> bool:
+        """Compaction due : trop de segments, ou ajouts/suppressions trop anciens
+        ou trop nombreux par rapport à l'index de base"""
+        with self._lock:
+            if self._dirty_since is None:
+                return False
+            if len(self._sealed) > settings.FACE_INDEX_MAX_SEGMENTS or self._tombstones:
+                return True
+            if time.time() - self._dirty_since >= settings.FACE_INDEX_PUBLISH_MAX_AGE_SECONDS:
+                return True
+            delta = sum(len(segment) for segment in self._sealed[1:]) + len(self._mutable_docs)
+            return delta >= settings.FACE_INDEX_COMPACTION_RATIO * max(len(self._sealed[0]), 1)
+
+    def compact(self) -> None:
+        """Fusionner tous les segments (hors verrou) puis publier l'index fusionné"""
+        with self._lock:
+            if self._mutable is not None:
+                self._sealed.append(self._mutable)
+                self._mutable_docs = []
+                self._mutable = None
+            segments = list(self._sealed)
+            tombstones = self._tombstones
+            dirty_since = self._dirty_since
+
+        merged_exact = merge_segments(self.event_id, segments, tombstones)
+        merged = self._publish(merged_exact)
+
+        with self._lock:
+            # Les segments scellés pendant la fusion sont conservés
+            later = self._sealed[len(segments):]
+            if len(merged) != len(merged_exact):
+                # Index relu depuis MongoDB : il contient déjà une partie des
+                # visages ajoutés pendant la fusion
+                if self._mutable is not None:
+                    later.append(self._mutable)
+                    self._mutable_docs = []
+                    self._mutable = None
+                later = [merge_segments(self.event_id, later, frozenset(), drop_face_ids=merged.face_ids)]
+            self._sealed = [merged] + [segment for segment in later if len(segment)]
+            self._tombstones = self._tombstones - tombstones
+            if self._dirty_since == dirty_since and len(self._sealed) == 1 \
+                    and self._mutable is None and not self._tombstones:
+                self._dirty_since = None
+            self.snapshot_version = merged.snapshot_version
+            self.compactions += 1
+
+
+class FaceIndexRegistry:
+    """
+    Index résidents en mémoire, sous un budget global (FACE_INDEX_MEMORY_BUDGET_MB)
+
+    - éviction LRU : l'événement le moins récemment recherché part en premier
+    - les événements ACTIVE sont épinglés (jamais évincés)
+    - un événement évincé est rechargé à la demande à la recherche suivante
+    - un index dont le snapshot disque a été republié, ou dont le compteur
+      event_stats a changé sans passer par ce worker (ingestion d'un autre
+      worker), est rechargé ; vérification au plus une fois toutes les
+      version_check_seconds par événement
+    - l'ingestion ajoute les visages au segment mutable de l'index résident
+      (add_faces / delete_photo) ; compact_all fusionne les segments en tâche de fond
+    """
+
+    def __init__(
+        self,
+        budget_bytes: int,
+        loader: Callable[[int], EventFaceIndex] = None,
+        version_of: Optional[Callable[[int], Optional[str]]] = None,
+        publish: Optional[Callable[[EventFaceIndex], EventFaceIndex]] = None,
+        version_check_seconds: Optional[float] = None,
+        faces_count_of: Optional[Callable[[int], Optional[int]]] = None
+    ):
+        self.budget_bytes = budget_bytes
+        self._loader = loader or load_event_index
+        self._version_of = version_of
+        self._faces_count_of = faces_count_of
+        # Compteur de visages attendu pour l'index résident (lu au chargement,
+        # suivi des ajouts de ce worker) ; None : à resynchroniser
+        self._faces_seen: Dict[int, Optional[int]] = {}
+        self.version_check_seconds = version_check_seconds if version_check_seconds is not None \
+            else settings.FACE_INDEX_VERSION_CHECK_SECONDS
+        # Dernière lecture du pointeur de version par événement
+        self._version_checked: Dict[int, float] = {}
+        self._publish = publish
+        self._lock = threading.Lock()
+        # Ordre LRU : le plus ancien en tête
+        self._indexes: "OrderedDict[int, SegmentedEventIndex]" = OrderedDict()
+        self._last_access: Dict[int, float] = {}
+        # Générations : un chargement démarré avant une invalidation n'est pas mis en cache
+        self._generations: Dict[int, int] = {}
+        self._pinned: Set[int] = set()
+        self._evicted: Set[int] = set()
+        # Événements modifiés sans index résident : snapshot à republier
+        self._stale_snapshots: Set[int] = set()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._reloads = 0
+        self._load_seconds = 0.0
+
+    def get(self, event_id: int) -> SegmentedEventIndex:
+        """Obtenir l'index d'un événement (chargé à la demande)"""
+        with self._lock:
+            index = self._indexes.get(event_id)
+            check = index is not None and (self._version_of or self._faces_count_of) is not None \
+                and self._version_due(event_id)
+        # Vérification de fraîcheur hors verrou (disque, MongoDB), au plus
+        # une fois toutes les version_check_seconds par événement
+        if check and not self._is_fresh(event_id, index):
+            with self._lock:
+                if self._indexes.get(event_id) is index:
+                    self._drop(event_id)
+            index = None
+
+        with self._lock:
+            if index is not None and self._indexes.get(event_id) is index:
+                self._indexes.move_to_end(event_id)
+                self._last_access[event_id] = time.time()
+                self._hits += 1
+                return index
+            self._misses += 1
+            generation = self._generations.get(event_id, 0)
+
+        # Chargement hors verrou : les autres événements restent consultables.
+        # Compteur lu avant le chargement : un ajout concurrent le rendra périmé
+        faces_seen = self._faces_count_of(event_id) if self._faces_count_of else None
+        start = time.perf_counter()
+        index = SegmentedEventIndex(event_id, self._loader(event_id), publish=self._publish)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._load_seconds += elapsed
+            if self._generations.get(event_id, 0) != generation:
+                return index
+            # Un autre thread a pu charger l'index entre-temps
+            existing = self._indexes.get(event_id)
+            if existing is not None:
+                return existing
+            if event_id in self._evicted:
+                self._evicted.discard(event_id)
+                self._reloads += 1
+            self._indexes[event_id] = index
+            self._last_access[event_id] = time.time()
+            self._version_checked[event_id] = time.monotonic()
+            self._faces_seen[event_id] = faces_seen
+            self._stale_snapshots.discard(event_id)
+            self._enforce_budget(keep=event_id)
+        return index
+
+    def add_faces(self, event_id: int, face_docs: List[Dict]) -> None:
+        """Ajouter des visages ingérés à l'index résident (sans invalidation)"""
+        if not face_docs:
+            return
+        with self._lock:
+            index = self._indexes.get(event_id)
+            if index is None:
+                self._mark_modified(event_id)
+                return
+            if self._faces_seen.get(event_id) is not None:
+                self._faces_seen[event_id] += len(face_docs)
+        index.add_faces(face_docs)
+
+    def delete_photo(self, event_id: int, photo_id: str) -> None:
+        """Masquer une photo supprimée dans l'index résident"""
+        with self._lock:
+            index = self._indexes.get(event_id)
+            if index is None:
+                self._mark_modified(event_id)
+                return
+            # Nombre de visages retirés inconnu ici : rechargé au prochain contrôle
+            self._faces_seen[event_id] = None
+        index.delete_photo(photo_id)
+
+    def _mark_modified(self, event_id: int) -> None:
+        """
+        Événement modifié sans index résident (appelé sous verrou) : un
+        chargement en cours, lu avant la modification, ne sera pas mis en
+        cache ; le snapshot sera republié par compact_all
+        """
+        self._generations[event_id] = self._generations.get(event_id, 0) + 1
+        self._stale_snapshots.add(event_id)
+
+    def compact_all(self) -> None:
+        """
+        Compaction de fond : fusionner les segments des index qui le demandent
+        et republier les snapshots des événements modifiés non résidents
+        """
+        with self._lock:
+            due = [(event_id, index) for event_id, index in self._indexes.items() if index.needs_compaction()]
+            stale = list(self._stale_snapshots)
+            self._stale_snapshots.clear()
+
+        for event_id, index in due:
+            start = time.perf_counter()
+            try:
+                index.compact()
+                print(f"🗜️ Index événement {event_id} compacté ({len(index)} visages, "
+                      f"{(time.perf_counter() - start) * 1000:.0f} ms)")
+            except Exception as e:
+                print(f"⚠️ Erreur compaction index événement {event_id}: {e}")
+
+        if stale and settings.FACE_INDEX_SNAPSHOTS:
+            from app.services.face_snapshots import rebuild_event_snapshot
+            for event_id in stale:
+                rebuild_event_snapshot(event_id)
+
+        with self._lock:
+            self._enforce_budget()
+
+    def _is_fresh(self, event_id: int, index: SegmentedEventIndex) -> bool:
+        """
+        Index résident toujours à jour : même version de snapshot et compteur
+        event_stats inchangé hors des ajouts de ce worker
+        """
+        if self._version_of is not None and self._version_of(event_id) != index.snapshot_version:
+            return False
+        if self._faces_count_of is None:
+            return True
+        count = self._faces_count_of(event_id)
+        if count is None:
+            return True
+        with self._lock:
+            seen = self._faces_seen.get(event_id)
+        # seen None : compteur inconnu au chargement ou photo supprimée ici
+        return seen is not None and count == seen
+
+    def _version_due(self, event_id: int) -> bool:
+        """Pointeur de version à relire (appelé sous verrou)"""
+        now = time.monotonic()
+        if now - self._version_checked.get(event_id, float("-inf")) < self.version_check_seconds:
+            return False
+        self._version_checked[event_id] = now
+        return True
+
+    def invalidate(self, event_id: int) -> None:
+        """Invalider l'index d'un événement (nouveaux visages ou suppression)"""
+        with self._lock:
+            self._generations[event_id] = self._generations.get(event_id, 0) + 1
+            self._drop(event_id)
+
+    def set_pinned(self, event_ids) -> None:
+        """Remplacer l'ensemble des événements épinglés"""
+        with self._lock:
+            self._pinned = set(event_ids)
+            self._enforce_budget()
+
+    def _drop(self, event_id: int) -> None:
+        if self._indexes.pop(event_id, None) is not None:
+            self._last_access.pop(event_id, None)
+            self._faces_seen.pop(event_id, None)
+
+    def _resident_bytes(self) -> int:
+        # Recalculé : la taille des index varie avec l'ingestion et la compaction
+        return sum(index.nbytes for index in self._indexes.values())
+
+    def _enforce_budget(self, keep: Optional[int] = None) -> None:
+        """Évincer les index LRU non épinglés jusqu'à repasser sous le budget"""
+        resident_bytes = self._resident_bytes()
+        for event_id in list(self._indexes):
+            if resident_bytes <= self.budget_bytes:
+                break
+            if event_id in self._pinned or event_id == keep:
+                continue
+            resident_bytes -= self._indexes[event_id].nbytes
+            self._drop(event_id)
+            self._evicted.add(event_id)
+            self._evictions += 1
+            print(f"♻️ Index événement {event_id} évincé (budget mémoire)")
+
+    def stats(self) -> Dict:
+        """Résidence, taux de succès et évictions"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "budget_mb": round(self.budget_bytes / (1024 * 1024), 2),
+                "resident_mb": round(self._resident_bytes() / (1024 * 1024), 2),
+                "resident_events": len(self._indexes),
+                "pinned_events": sorted(self._pinned),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+                "evictions": self._evictions,
+                "reloads": self._reloads,
+                "load_seconds_total": round(self._load_seconds, 3),
+                "events": [
+                    {
+                        "event_id": event_id,
+                        "faces": len(index),
+                        "dtype": index.dtype,
+                        "size_mb": round(index.nbytes / (1024 * 1024), 3),
+                        "pinned": event_id in self._pinned,
+                        "snapshot_version": index.snapshot_version,
+                        "segments": index.segment_count,
+                        "tombstones": index.tombstone_count,
+                        "compactions": index.compactions,
+                        "last_access": datetime.fromtimestamp(self._last_access[event_id]).isoformat()
+                    }
+                    # Plus récemment recherché en premier
+                    for event_id, index in reversed(self._indexes.items())
+                ]
+            }
+
+
+def refresh_pinned_events() -> None:
+    """
+    Épingler les événements au statut ACTIVE (PostgreSQL)
+
+    Le statut est porté par `events_admin` ; l'index est indexé par les ids
+    de `events` (correspondance par code, app/db/event_links.py).
+    """
+    from app.database import SessionLocal
+    from app.db.event_links import event_ids_with_status
+    from app.models.database_models import EventStatus
+
+    db = SessionLocal()
+    try:
+        active_ids = event_ids_with_status(db, EventStatus.ACTIVE)
+    finally:
+        db.close()
+    index_registry.set_pinned(active_ids)
+
+
+# Registre global (singleton)
+index_registry = FaceIndexRegistry(
+    budget_bytes=settings.FACE_INDEX_MEMORY_BUDGET_MB * 1024 * 1024,
+    version_of=snapshot_version_of if settings.FACE_INDEX_SNAPSHOTS else None,
+    faces_count_of=event_faces_count
+)
+
+
+def get_event_index(event_id: int) -> SegmentedEventIndex:
+    """Obtenir l'index d'un événement (chargé à la demande)"""
+    return index_registry.get(event_id)
+
+
+def add_event_faces(event_id: int, face_docs: List[Dict]) -> None:
+    """Rendre consultables les visages d'une photo ingérée"""
+    index_registry.add_faces(event_id, face_docs)
+
+
+def delete_event_photo(event_id: int, photo_id: str) -> None:
+    """Retirer de la recherche les visages d'une photo supprimée"""
+    index_registry.delete_photo(event_id, photo_id)
+
+
+def invalidate_event_index(event_id: int) -> None:
+    """Invalider l'index d'un événement (nouveaux visages ou suppression)"""
+    index_registry.invalidate(event_id)
@@ -9,9 +9,13 @@ from typing import List, Tuple, Optional, Dict
 import base64
 import tempfile
 import os
+import threading
 import warnings
+from pathlib import Path
 
 from app.core.config import settings
+from app.core.metrics import FACE_INFERENCE_SECONDS, FACES_EMBEDDED
+from app.core.tracing import span
 
 # Essayer InsightFace d'abord (meilleur modèle) - LAZY LOADED
 INSIGHTFACE_AVAILABLE = False
@@ -69,6 +73,78 @@ def normalize_embedding(embedding: List[float]) -> List[float]:
     return normalized.tolist()
 
 
+def select_detections(
+    scores: np.ndarray,
+    boxes: np.ndarray,
+    min_confidence: float,
+    min_size: int,
+    max_faces: int
+) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    Filtrer les détections avant la reconnaissance (étape la plus coûteuse)
+    
+    - supprime les visages sous le seuil de confiance
+    - supprime les visages trop petits (arrière-plan des photos de groupe)
+    - garde les max_faces meilleurs selon score × surface
+    
+    Args:
+        scores: scores de détection (N,)
+        boxes: bounding boxes (N, 4) au format [x1, y1, x2, y2]
+    
+    Returns:
+        (indices des détections gardées, compteurs de visages ignorés)
+    """
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    widths = boxes[:, 2] - boxes[:, 0]
+    heights = boxes[:, 3] - boxes[:, 1]
+    
+    confident = scores >= min_confidence
+    large_enough = np.minimum(widths, heights) >= min_size
+    candidates = np.flatnonzero(confident & large_enough)
+    
+    # Meilleurs visages d'abord : score × surface
+    rank = scores[candidates] * widths[candidates] * heights[candidates]
+    candidates = candidates[np.argsort(-rank, kind='stable')]
+    kept = candidates[:max_faces] if max_faces > 0 else candidates
+    
+    skipped = {
+        "low_confidence": int((~confident).sum()),
+        "too_small": int((confident & ~large_enough).sum()),
+        "over_limit": int(len(candidates) - len(kept))
+    }
+    return kept, skipped
+
+
+def tile_origins(length: int, tile: int, overlap: float) -> List[int]:
+    """Positions de départ des tuiles le long d'un axe (dernière tuile collée au bord)"""
+    if length <= tile:
+        return [0]
+    step = max(1, int(tile * (1.0 - overlap)))
+    origins = list(range(0, length - tile, step))
+    origins.append(length - tile)
+    return origins
+
+
+def nms(dets: np.ndarray, iou_threshold: float) -> List[int]:
+    """Non-maximum suppression sur des détections [x1, y1, x2, y2, score]"""
+    x1, y1, x2, y2, scores = dets[:, 0], dets[:, 1], dets[:, 2], dets[:, 3], dets[:, 4]
+    areas = (x2 - x1 + 1) * (y2 - y1 + 1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(int(i))
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+        inter = np.maximum(0.0, xx2 - xx1 + 1) * np.maximum(0.0, yy2 - yy1 + 1)
+        iou = inter / (areas[i] + areas[order[1:]] - inter)
+        order = order[np.flatnonzero(iou <= iou_threshold) + 1]
+    return keep
+
+
 class FaceRecognitionService:
     """Service reconnaissance faciale avec InsightFace (ArcFace) ou DeepFace (FaceNet512)
     
@@ -77,21 +153,34 @@ class FaceRecognitionService:
     """
     
     def __init__(self):
-        """Initialisation du meilleur modèle disponible"""
+        """Initialisation du meilleur modèle disponible (ou du moteur factice, FACE_ENGINE=fake)"""
         self.use_insightface = False
         self.model = None
         
+        if settings.FACE_ENGINE == "fake":
+            # Même interface que FaceAnalysis : tout le chemin InsightFace est exercé
+            from app.services.fake_face_engine import FakeFaceAnalysis
+            self.model = FakeFaceAnalysis()
+            self.use_insightface = True
+            print("🧪 Moteur facial factice déterministe activé (FACE_ENGINE=fake)")
+            return
+        
         # Préférer InsightFace (meilleure précision)
         if INSIGHTFACE_AVAILABLE:
             try:
                 # Modèle ArcFace - le meilleur pour reconnaissance personnelle
+                # Seuls détection + reconnaissance servent (pas d'âge/genre/landmarks)
                 self.model = insightface.app.FaceAnalysis(
                     name='buffalo_l',  # Grand modèle haute précision
+                    allowed_modules=['detection', 'recognition'],
                     providers=['CUDAExecutionProvider', 'CPUExecutionProvider']
                 )
                 self.model.prepare(ctx_id=0, det_size=(640, 640))  # GPU ou CPU auto
                 self.use_insightface = True
                 print("✅ InsightFace (ArcFace) activé - Précision : 99%")
+                
+                if settings.FACE_RECOGNITION_PRECISION == "int8":
+                    self._load_int8_recognizer()
             except Exception as e:
                 print(f"⚠️ Erreur InsightFace: {e}, utilisation DeepFace en fallback")
                 self.use_insightface = False
@@ -109,6 +198,31 @@ class FaceRecognitionService:
                 )
     
     
+    def _load_int8_recognizer(self):
+        """Remplacer le reconnaisseur ArcFace FP32 par sa variante quantifiée INT8
+        
+        Le détecteur reste en FP32 ; seule la reconnaissance (le plus coûteux
+        à l'ingestion sur CPU) est quantifiée.
+        """
+        model_path = Path(settings.FACE_RECOGNITION_INT8_MODEL)
+        if not model_path.exists():
+            print(f"⚠️ Modèle INT8 introuvable ({model_path}), reconnaissance FP32 conservée")
+            return
+        
+        fp32_recognizer = self.model.models['recognition']
+        recognizer = insightface.model_zoo.get_model(
+            str(model_path),
+            providers=['CPUExecutionProvider']
+        )
+        recognizer.prepare(ctx_id=-1)
+        # Même prétraitement que le modèle d'origine (les noeuds de normalisation
+        # ne sont plus détectables dans le graphe quantifié)
+        recognizer.input_mean = fp32_recognizer.input_mean
+        recognizer.input_std = fp32_recognizer.input_std
+        self.model.models['recognition'] = recognizer
+        print(f"✅ Reconnaissance ArcFace INT8 activée ({model_path.name})")
+    
+    
     def extract_faces_from_image(self, image_path: str) -> List[Dict]:
         """
         Extraire tous les visages d'une image avec embeddings haute précision
@@ -116,6 +230,19 @@ class FaceRecognitionService:
         Returns:
             Liste de dicts avec bbox, embedding, confidence
         """
+        faces, _ = self.extract_faces_with_stats(image_path)
+        return faces
+    
+    
+    def extract_faces_with_stats(self, image_path: str) -> Tuple[List[Dict], Dict[str, int]]:
+        """
+        Extraire les visages d'une image + compteurs des visages ignorés
+        (confiance < FACE_DETECTION_CONFIDENCE, taille < FACE_MIN_SIZE_PX,
+        au-delà de MAX_FACES_PER_PHOTO)
+        
+        Returns:
+            (liste de dicts avec bbox, embedding, confidence ; compteurs)
+        """
         try:
             if self.use_insightface:
                 return self._extract_insightface(image_path)
@@ -124,16 +251,112 @@ class FaceRecognitionService:
                 
         except Exception as e:
             print(f"⚠️ Erreur extraction visages: {e}")
-            return []
+            return [], {}
     
     
-    def _extract_insightface(self, image_path: str) -> List[Dict]:
+    def _detect(self, img: np.ndarray, purpose: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Détection avec une taille d'entrée adaptée à l'usage
+        
+        - "query" (selfie kiosque, gros plan) : petite taille rapide, on monte
+          en taille seulement si aucun visage n'est trouvé (FACE_QUERY_DET_SIZES)
+        - "ingest" (photos d'événement) : grande taille (FACE_INGEST_DET_SIZE),
+          et détection par tuiles pour les très grandes photos de groupe
+        
+        Le reconnaisseur reste unique : les embeddings restent comparables.
+        """
+        detector = self.model.det_model
+        
+        if purpose == "query":
+            bboxes, kpss = np.zeros((0, 5), dtype=np.float32), None
+            for size in settings.FACE_QUERY_DET_SIZES:
+                bboxes, kpss = detector.detect(img, input_size=(size, size), max_num=0, metric='default')
+                if bboxes.shape[0] > 0:
+                    break
+            return bboxes, kpss
+        
+        size = settings.FACE_INGEST_DET_SIZE
+        if settings.FACE_INGEST_TILE_ABOVE_PX > 0 and max(img.shape[:2]) > settings.FACE_INGEST_TILE_ABOVE_PX:
+            return self._detect_tiled(img, size)
+        return detector.detect(img, input_size=(size, size), max_num=0, metric='default')
+    
+    
+    def _detect_tiled(self, img: np.ndarray, size: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Détection par tuiles chevauchantes, fusionnées par NMS en coordonnées image"""
+        detector = self.model.det_model
+        tile = settings.FACE_INGEST_TILE_SIZE
+        overlap = settings.FACE_INGEST_TILE_OVERLAP
+        height, width = img.shape[:2]
+        
+        all_bboxes, all_kpss = [], []
+        for y in tile_origins(height, tile, overlap):
+            for x in tile_origins(width, tile, overlap):
+                crop = img[y:y + tile, x:x + tile]
+                bboxes, kpss = detector.detect(crop, input_size=(size, size), max_num=0, metric='default')
+                if bboxes.shape[0] == 0:
+                    continue
+                bboxes = bboxes.copy()
+                bboxes[:, [0, 2]] += x
+                bboxes[:, [1, 3]] += y
+                all_bboxes.append(bboxes)
+                if kpss is not None:
+                    kpss = kpss.copy()
+                    kpss[:, :, 0] += x
+                    kpss[:, :, 1] += y
+                    all_kpss.append(kpss)
+        
+        if not all_bboxes:
+            return np.zeros((0, 5), dtype=np.float32), None
+        
+        # Les visages sur la zone de chevauchement sont détectés deux fois
+        bboxes = np.concatenate(all_bboxes)
+        keep = nms(bboxes, iou_threshold=0.4)
+        kpss = np.concatenate(all_kpss)[keep] if len(all_kpss) == len(all_bboxes) else None
+        return bboxes[keep], kpss
+    
+    
+    def _detect_and_embed(self, img: np.ndarray, max_faces: int, min_size: int, purpose: str = "ingest"):
+        """Détection, filtrage puis reconnaissance des seuls visages gardés"""
+        Face = getattr(self.model, "face_class", None)
+        if Face is None:
+            from insightface.app.common import Face
+        
+        with span("detection"), FACE_INFERENCE_SECONDS.time("detection", purpose):
+            bboxes, kpss = self._detect(img, purpose)
+        kept, skipped = select_detections(
+            bboxes[:, 4], bboxes[:, 0:4],
+            min_confidence=settings.FACE_DETECTION_CONFIDENCE,
+            min_size=min_size,
+            max_faces=max_faces
+        )
+        
+        recognizer = self.model.models['recognition']
+        faces = []
+        with span("recognition"), FACE_INFERENCE_SECONDS.time("recognition", purpose):
+            for i in kept:
+                face = Face(
+                    bbox=bboxes[i, 0:4],
+                    kps=kpss[i] if kpss is not None else None,
+                    det_score=bboxes[i, 4]
+                )
+                recognizer.get(img, face)
+                faces.append(face)
+        FACES_EMBEDDED.inc(purpose, amount=len(faces))
+        return faces, skipped
+    
+    
+    def _extract_insightface(self, image_path: str) -> Tuple[List[Dict], Dict[str, int]]:
         """Extraction avec InsightFace (ArcFace)"""
-        img = cv2.imread(str(image_path))
+        with span("image_read"):
+            img = cv2.imread(str(image_path))
         if img is None:
-            return []
+            return [], {}
         
-        faces = self.model.get(img)
+        faces, skipped = self._detect_and_embed(
+            img,
+            max_faces=settings.MAX_FACES_PER_PHOTO,
+            min_size=settings.FACE_MIN_SIZE_PX
+        )
         result = []
         
         for face in faces:
@@ -147,22 +370,38 @@ class FaceRecognitionService:
                 'confidence': float(face.det_score)
             })
         
-        return result
+        return result, skipped
     
     
-    def _extract_deepface(self, image_path: str) -> List[Dict]:
-        """Extraction avec DeepFace (FaceNet512) - Fallback"""
+    def _extract_deepface(self, image_path: str) -> Tuple[List[Dict], Dict[str, int]]:
+        """Extraction avec DeepFace (FaceNet512) - Fallback
+        
+        DeepFace calcule les embeddings avant qu'on puisse filtrer : le filtrage
+        évite seulement de stocker (et de parcourir à la recherche) les petits visages.
+        """
         try:
-            representations = DeepFace.represent(
-                img_path=str(image_path),
-                model_name=self.model_name,
-                detector_backend="opencv",
-                enforce_detection=False,
-                align=True
+            # DeepFace enchaîne détection et reconnaissance en un appel
+            with span("detection_recognition"), FACE_INFERENCE_SECONDS.time("detection_recognition", "ingest"):
+                representations = DeepFace.represent(
+                    img_path=str(image_path),
+                    model_name=self.model_name,
+                    detector_backend="opencv",
+                    enforce_detection=False,
+                    align=True
+                )
+            
+            areas = [face_data['facial_area'] for face_data in representations]
+            kept, skipped = select_detections(
+                [face_data.get('face_confidence', 0.9) for face_data in representations],
+                [[a['x'], a['y'], a['x'] + a['w'], a['y'] + a['h']] for a in areas],
+                min_confidence=settings.FACE_DETECTION_CONFIDENCE,
+                min_size=settings.FACE_MIN_SIZE_PX,
+                max_faces=settings.MAX_FACES_PER_PHOTO
             )
             
             faces = []
-            for face_data in representations:
+            for i in kept:
+                face_data = representations[i]
                 bbox = face_data['facial_area']
                 # Normaliser l'embedding en L2
                 embedding = normalize_embedding(face_data['embedding'])
@@ -177,10 +416,10 @@ class FaceRecognitionService:
                     'confidence': face_data.get('face_confidence', 0.9)
                 })
             
-            return faces
+            return faces, skipped
         except Exception as e:
             print(f"⚠️ Erreur DeepFace: {e}")
-            return []
+            return [], {}
     
     
     def extract_face_from_base64(self, base64_image: str) -> Optional[List[float]]:
@@ -192,16 +431,18 @@ class FaceRecognitionService:
         """
         try:
             # Décoder base64
-            image_data = base64.b64decode(base64_image)
-            nparr = np.frombuffer(image_data, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            with span("decode"):
+                image_data = base64.b64decode(base64_image)
+                nparr = np.frombuffer(image_data, np.uint8)
+                image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
             
             if image is None:
                 return None
             
             if self.use_insightface:
-                # InsightFace directement en mémoire
-                faces = self.model.get(image)
+                # InsightFace directement en mémoire : seul le visage principal
+                # (meilleur score × surface) passe par la reconnaissance
+                faces, _ = self._detect_and_embed(image, max_faces=1, min_size=0, purpose="query")
                 if len(faces) == 0:
                     return None
                 # ✅ Normaliser l'embedding
@@ -215,13 +456,14 @@ class FaceRecognitionService:
                     tmp_path = tmp.name
                 
                 try:
-                    representations = DeepFace.represent(
-                        img_path=tmp_path,
-                        model_name=self.model_name,
-                        detector_backend="opencv",
-                        enforce_detection=False,
-                        align=True
-                    )
+                    with span("detection_recognition"), FACE_INFERENCE_SECONDS.time("detection_recognition", "query"):
+                        representations = DeepFace.represent(
+                            img_path=tmp_path,
+                            model_name=self.model_name,
+                            detector_backend="opencv",
+                            enforce_detection=False,
+                            align=True
+                        )
                     
                     if len(representations) == 0:
                         return None
@@ -239,6 +481,30 @@ class FaceRecognitionService:
             return None
     
     
+    def warmup(self) -> None:
+        """
+        Inférence factice pour initialiser les sessions ONNX / TensorFlow
+        
+        La première inférence réelle paie sinon l'allocation des buffers
+        et la compilation des kernels (plusieurs secondes sur CPU).
+        """
+        dummy = np.zeros((640, 640, 3), dtype=np.uint8)
+        if self.use_insightface:
+            # Détecteur à chaque taille d'entrée utilisée + reconnaisseur sur un crop aligné
+            for size in set(settings.FACE_QUERY_DET_SIZES) | {settings.FACE_INGEST_DET_SIZE}:
+                self.model.det_model.detect(dummy, input_size=(size, size), max_num=0, metric='default')
+            recognizer = self.model.models.get('recognition')
+            if recognizer is not None:
+                recognizer.get_feat(np.zeros((112, 112, 3), dtype=np.uint8))
+        else:
+            DeepFace.represent(
+                img_path=dummy,
+                model_name=self.model_name,
+                detector_backend="opencv",
+                enforce_detection=False
+            )
+    
+    
     def compare_faces(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
         """
         Comparer deux embeddings et retourner un score de similarité
@@ -318,19 +584,27 @@ class FaceRecognitionService:
 
 # Instance globale (singleton)
 _face_service = None
+# Le préchargement (thread de démarrage) et les requêtes peuvent arriver en même temps
+_face_service_lock = threading.Lock()
 
 def get_face_service() -> FaceRecognitionService:
     """Obtenir l'instance du service de reconnaissance faciale"""
     global _face_service
-    if _face_service is None:
-        # Charger les modèles lazy-loaded
-        _load_insightface()
-        _load_deepface()
-        
-        if INSIGHTFACE_AVAILABLE or DEEPFACE_AVAILABLE:
+    if _face_service is not None:
+        return _face_service
+    
+    with _face_service_lock:
+        if _face_service is None and settings.FACE_ENGINE == "fake":
             _face_service = FaceRecognitionService()
-        else:
-            raise ImportError("DeepFace requis. Installez: pip install deepface")
+        if _face_service is None:
+            # Charger les modèles lazy-loaded
+            _load_insightface()
+            _load_deepface()
+            
+            if INSIGHTFACE_AVAILABLE or DEEPFACE_AVAILABLE:
+                _face_service = FaceRecognitionService()
+            else:
+                raise ImportError("DeepFace requis. Installez: pip install deepface")
     return _face_service
 
 
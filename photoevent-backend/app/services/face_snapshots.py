@@ -0,0 +1,197 @@
+"""
+Snapshots disque des index de visages (un dossier versionné par événement)
+
+Un redémarrage ou un nouveau worker relit l'index en memory-map (np.load
+mmap_mode='r') au lieu de re-parcourir tous les documents `faces` de MongoDB :
+les workers uvicorn partagent alors les mêmes pages via le cache du système.
+
+Arborescence :
+    {FACE_INDEX_SNAPSHOT_DIR}/event_{id}/
+        CURRENT                 -> nom de la version courante (remplacé atomiquement)
+        v{horodatage_ns}/
+            header.json         -> format, dtype, nombre de visages, dimension
+            codes.npy           -> embeddings (compressés si float16/int8)
+            scales.npy          -> échelles int8 (optionnel)
+            embeddings.npy      -> embeddings float32 pour le re-scoring (si compressé)
+            photo_ids.npy, face_ids.npy, bboxes.npy, confidences.npy, face_ordinals.npy
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.face_index import EventFaceIndex, quantize_embeddings
+
+SNAPSHOT_FORMAT = 1
+CURRENT_FILE = "CURRENT"
+HEADER_FILE = "header.json"
+ARRAY_NAMES = ("codes", "photo_ids", "face_ids", "bboxes", "confidences", "face_ordinals")
+
+# Versions conservées par événement (la courante + la précédente encore
+# éventuellement mappée par un autre worker)
+KEEP_VERSIONS = 2
+
+# Reconstructions en cours / demandées par événement (ingestion)
+_rebuild_lock = threading.Lock()
+_rebuild_running: Dict[int, bool] = {}
+_rebuild_pending: Dict[int, bool] = {}
+
+
+def event_snapshot_dir(event_id: int) -> Path:
+    return Path(settings.FACE_INDEX_SNAPSHOT_DIR) / f"event_{event_id}"
+
+
+def current_snapshot_version(event_id: int) -> Optional[str]:
+    """Version courante du snapshot d'un événement (None si absent)"""
+    try:
+        return (event_snapshot_dir(event_id) / CURRENT_FILE).read_text().strip() or None
+    except OSError:
+        return None
+
+
+def write_event_snapshot(exact_index: EventFaceIndex, dtype: Optional[str] = None) -> str:
+    """
+    Écrire une nouvelle version du snapshot d'un événement
+
+    Args:
+        exact_index: index float32 (embeddings pleine précision)
+        dtype: représentation des codes (défaut FACE_INDEX_DTYPE)
+
+    Returns:
+        Nom de la version écrite
+    """
+    dtype = dtype or settings.FACE_INDEX_DTYPE
+    event_dir = event_snapshot_dir(exact_index.event_id)
+    event_dir.mkdir(parents=True, exist_ok=True)
+
+    version = f"v{time.time_ns()}"
+    tmp_dir = event_dir / f"{version}.tmp-{os.getpid()}"
+    tmp_dir.mkdir()
+
+    embeddings = exact_index.codes
+    codes, scales = quantize_embeddings(embeddings, dtype)
+    arrays = {
+        "codes": codes,
+        "photo_ids": exact_index.photo_ids,
+        "face_ids": exact_index.face_ids,
+        "bboxes": exact_index.bboxes,
+        "confidences": exact_index.confidences,
+        "face_ordinals": exact_index.face_ordinals
+    }
+    if scales is not None:
+        arrays["scales"] = scales
+    if dtype != "float32":
+        arrays["embeddings"] = embeddings
+    for name, array in arrays.items():
+        np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(array))
+
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "event_id": exact_index.event_id,
+        "version": version,
+        "dtype": dtype,
+        "faces": len(exact_index),
+        "dim": int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+        "created_at": datetime.now().isoformat()
+    }
+    (tmp_dir / HEADER_FILE).write_text(json.dumps(header, indent=2))
+
+    # Publication atomique : dossier complet renommé, puis pointeur CURRENT remplacé
+    tmp_dir.rename(event_dir / version)
+    tmp_current = event_dir / f"{CURRENT_FILE}.tmp-{os.getpid()}"
+    tmp_current.write_text(version)
+    os.replace(tmp_current, event_dir / CURRENT_FILE)
+
+    _remove_old_versions(event_dir, version)
+    return version
+
+
+def _remove_old_versions(event_dir: Path, current: str) -> None:
+    """Supprimer les anciennes versions (un fichier mappé reste lisible après suppression)"""
+    versions = sorted(
+        (p for p in event_dir.iterdir() if p.is_dir() and p.name.startswith("v") and ".tmp" not in p.name),
+        key=lambda p: p.name
+    )
+    for old_dir in versions[:-KEEP_VERSIONS]:
+        if old_dir.name != current:
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def load_event_snapshot(event_id: int) -> Optional[EventFaceIndex]:
+    """
+    Ouvrir le snapshot courant d'un événement en memory-map
+
+    Returns:
+        Index (matrices mappées, non copiées en mémoire) ou None si absent,
+        d'un autre format ou d'un autre dtype que FACE_INDEX_DTYPE
+    """
+    version = current_snapshot_version(event_id)
+    if version is None:
+        return None
+    version_dir = event_snapshot_dir(event_id) / version
+
+    try:
+        header = json.loads((version_dir / HEADER_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+    if header.get("format") != SNAPSHOT_FORMAT or header.get("dtype") != settings.FACE_INDEX_DTYPE:
+        return None
+
+    arrays = {name: np.load(version_dir / f"{name}.npy", mmap_mode='r') for name in ARRAY_NAMES}
+    scales_path = version_dir / "scales.npy"
+    scales = np.load(scales_path, mmap_mode='r') if scales_path.exists() else None
+
+    exact_loader = None
+    embeddings_path = version_dir / "embeddings.npy"
+    if embeddings_path.exists():
+        embeddings = np.load(embeddings_path, mmap_mode='r')
+        # Re-scoring : lecture des seules lignes candidates dans le fichier mappé
+        exact_loader = lambda positions: np.asarray(embeddings[positions])
+
+    index = EventFaceIndex(event_id=event_id, scales=scales, exact_loader=exact_loader, **arrays)
+    index.snapshot_version = version
+    index.snapshot_faces = header["faces"]
+    return index
+
+
+def rebuild_event_snapshot(event_id: int) -> None:
+    """
+    Reconstruire le snapshot d'un événement depuis MongoDB (appelé par l'ingestion)
+
+    Les demandes arrivant pendant une reconstruction sont regroupées en une
+    seule reconstruction supplémentaire.
+    """
+    from app.services.face_index import load_event_index_from_mongo
+
+    if not settings.FACE_INDEX_SNAPSHOTS:
+        return
+
+    with _rebuild_lock:
+        if _rebuild_running.get(event_id):
+            _rebuild_pending[event_id] = True
+            return
+        _rebuild_running[event_id] = True
+
+    while True:
+        with _rebuild_lock:
+            _rebuild_pending[event_id] = False
+        try:
+            exact_index = load_event_index_from_mongo(event_id, dtype="float32")
+            version = write_event_snapshot(exact_index)
+            print(f"💾 Snapshot index événement {event_id} écrit ({len(exact_index)} visages, {version})")
+        except Exception as e:
+            print(f"⚠️ Erreur écriture snapshot événement {event_id}: {e}")
+        # Fin décidée et signalée dans la même section critique : une demande
+        # arrivant ensuite démarre sa propre reconstruction
+        with _rebuild_lock:
+            if not _rebuild_pending.get(event_id):
+                _rebuild_running[event_id] = False
+                return
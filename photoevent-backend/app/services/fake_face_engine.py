@@ -0,0 +1,149 @@
+"""
+Moteur facial factice et déterministe (FACE_ENGINE=fake)
+
+Remplace InsightFace pour les tests de performance de bout en bout hors
+ligne (aucun modèle téléchargé). Même interface que insightface FaceAnalysis :
+`det_model.detect(img, input_size, max_num, metric)` et
+`models['recognition'].get(img, face)` / `.get_feat(img)` : le service suit
+exactement le chemin InsightFace (sélection des détections, tuiles,
+métriques, traces), seule l'inférence est simulée.
+
+- détection : l'image est découpée en grille FACE_FAKE_GRID x FACE_FAKE_GRID,
+  chaque case est un "visage" dont le score dépend de son contraste (les zones
+  unies ne contiennent donc aucun visage)
+- reconnaissance : projection aléatoire fixe des gradients de la case réduite
+  en 33x33 ; le même contenu donne le même embedding, et une recompression
+  JPEG ou un redimensionnement en donnent un très proche (similarité > 0.9)
+- latence simulée (time.sleep, qui libère le GIL comme onnxruntime) :
+  FACE_FAKE_DETECTION_MS par détection à 640 px (proportionnelle à la surface
+  d'entrée) et FACE_FAKE_RECOGNITION_MS par visage
+"""
+import threading
+import time
+import zlib
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+
+EMBEDDING_DIM = 512
+PATCH_SIZE = 33
+PROJECTION_SEED = 20240611
+
+_projection: Optional[np.ndarray] = None
+_projection_lock = threading.Lock()
+
+
+def _random_projection() -> np.ndarray:
+    """Matrice fixe gradients -> embedding (identique dans tous les processus)"""
+    global _projection
+    if _projection is None:
+        with _projection_lock:
+            if _projection is None:
+                n_features = 2 * PATCH_SIZE * (PATCH_SIZE - 1)
+                rng = np.random.default_rng(PROJECTION_SEED)
+                _projection = rng.standard_normal((EMBEDDING_DIM, n_features)).astype(np.float32)
+    return _projection
+
+
+def _grayscale(img: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+
+def region_embedding(region: np.ndarray) -> np.ndarray:
+    """Embedding L2-normalisé déterministe du contenu d'une région (BGR ou gris)"""
+    gray = _grayscale(region)
+    if gray.size == 0:
+        gray = np.zeros((PATCH_SIZE, PATCH_SIZE), dtype=np.uint8)
+    patch = cv2.resize(gray, (PATCH_SIZE, PATCH_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32)
+    # Gradients : deux régions sans rapport donnent des vecteurs ~orthogonaux
+    features = np.concatenate([np.diff(patch, axis=1).ravel(), np.diff(patch, axis=0).ravel()])
+    features -= features.mean()
+    norm = np.linalg.norm(features)
+    if norm < 1e-6:
+        # Région uniforme : vecteur tiré d'une graine issue du contenu
+        rng = np.random.default_rng(zlib.crc32(patch.astype(np.uint8).tobytes()))
+        embedding = rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+    else:
+        embedding = _random_projection() @ (features / norm)
+    return embedding / np.linalg.norm(embedding)
+
+
+class DetectedFace:
+    """Visage détecté (mêmes attributs que insightface.app.common.Face)"""
+
+    def __init__(self, bbox: np.ndarray, kps: Optional[np.ndarray] = None, det_score: float = 0.0):
+        self.bbox = bbox
+        self.kps = kps
+        self.det_score = det_score
+        self.embedding: Optional[np.ndarray] = None
+
+
+class FakeDetector:
+    def __init__(self, grid: int, latency_ms: float):
+        self.grid = grid
+        self.latency_ms = latency_ms
+
+    def detect(self, img: np.ndarray, input_size: Tuple[int, int] = (640, 640), max_num: int = 0,
+               metric: str = 'default') -> Tuple[np.ndarray, None]:
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000 * (input_size[0] * input_size[1]) / (640 * 640))
+
+        gray = _grayscale(img)
+        height, width = gray.shape[:2]
+        detections = []
+        for row in range(self.grid):
+            for col in range(self.grid):
+                y1, y2 = row * height // self.grid, (row + 1) * height // self.grid
+                x1, x2 = col * width // self.grid, (col + 1) * width // self.grid
+                # Visage = case réduite de 10 % de chaque côté
+                dx, dy = (x2 - x1) // 10, (y2 - y1) // 10
+                box = (x1 + dx, y1 + dy, x2 - dx, y2 - dy)
+                std = float(gray[box[1]:box[3], box[0]:box[2]].std()) if box[2] > box[0] and box[3] > box[1] else 0.0
+                detections.append((*box, std / (std + 25.0)))
+
+        bboxes = np.array(detections, dtype=np.float32).reshape(-1, 5)
+        if max_num > 0:
+            bboxes = bboxes[np.argsort(-bboxes[:, 4], kind='stable')[:max_num]]
+        return bboxes, None
+
+
+class FakeRecognizer:
+    def __init__(self, latency_ms: float):
+        self.latency_ms = latency_ms
+
+    def get_feat(self, img: np.ndarray) -> np.ndarray:
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000)
+        return region_embedding(img)
+
+    def get(self, img: np.ndarray, face) -> np.ndarray:
+        x1, y1, x2, y2 = [int(round(v)) for v in face.bbox[:4]]
+        height, width = img.shape[:2]
+        crop = img[max(0, y1):min(height, y2), max(0, x1):min(width, x2)]
+        face.embedding = self.get_feat(crop)
+        return face.embedding
+
+
+class FakeFaceAnalysis:
+    """Équivalent factice de insightface.app.FaceAnalysis (détection + reconnaissance)"""
+
+    face_class = DetectedFace
+
+    def __init__(
+        self,
+        grid: Optional[int] = None,
+        detection_ms: Optional[float] = None,
+        recognition_ms: Optional[float] = None
+    ):
+        self.det_model = FakeDetector(
+            grid=grid or settings.FACE_FAKE_GRID,
+            latency_ms=settings.FACE_FAKE_DETECTION_MS if detection_ms is None else detection_ms
+        )
+        self.models = {
+            'recognition': FakeRecognizer(
+                latency_ms=settings.FACE_FAKE_RECOGNITION_MS if recognition_ms is None else recognition_ms
+            )
+        }
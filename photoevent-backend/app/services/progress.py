@@ -0,0 +1,226 @@
+"""
+Progression du traitement des photos poussée aux clients (Server-Sent Events)
+
+L'ingestion (routes d'upload) publie chaque transition de photo :
+pending -> processing -> ready / error, avec le nombre de visages trouvés.
+Chaque upload forme un lot (batch_id, batch_index comme dans
+database_models.Photo) dont l'agrégat est tenu à jour : compteurs par statut,
+visages trouvés, débit (photos terminées / s) et temps restant estimé.
+
+Les abonnés (GET /photos/event/{event_id}/progress) reçoivent les
+événements de l'événement ou d'un seul lot, sans relire toutes les photos.
+Diffusion en mémoire du processus : un abonné reçoit en direct les photos
+traitées par son worker ; l'instantané périodique (une agrégation MongoDB
+par lot/événement) couvre les autres workers.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+PHOTO_STATUSES = ("pending", "processing", "ready", "error")
+DONE_STATUSES = ("ready", "error")
+
+
+@dataclass
+class BatchProgress:
+    event_id: int
+    batch_id: str
+    total: int
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    faces_found: int = 0
+    photos: Dict[str, str] = field(default_factory=dict)  # photo_id -> statut courant
+
+    def counts(self) -> Dict[str, int]:
+        counts = {status: 0 for status in PHOTO_STATUSES}
+        for status in self.photos.values():
+            counts[status] += 1
+        return counts
+
+    def to_dict(self) -> Dict:
+        counts = self.counts()
+        done = sum(counts[status] for status in DONE_STATUSES)
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        throughput = done / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.total - done)
+        return {
+            "batch_id": self.batch_id,
+            "event_id": self.event_id,
+            "total": self.total,
+            **counts,
+            "faces_found": self.faces_found,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+            "elapsed_seconds": round(elapsed, 2),
+            "photos_per_second": round(throughput, 3),
+            "eta_seconds": round(remaining / throughput, 1) if throughput > 0 and remaining else None,
+            "finished": self.finished_at is not None
+        }
+
+
+class Subscriber:
+    """File bornée d'un client SSE (les plus anciens événements sont perdus si le client traîne)"""
+
+    def __init__(self, event_id: int, batch_id: Optional[str], queue_size: int):
+        self.event_id = event_id
+        self.batch_id = batch_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def _put(self, event: Dict) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    def deliver(self, event: Dict) -> None:
+        """Appelable depuis n'importe quel thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # Boucle fermée : client parti
+
+    async def get(self, timeout: float) -> Optional[Dict]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class ProgressBroker:
+    def __init__(self, queue_size: Optional[int] = None, max_batches: Optional[int] = None):
+        self.queue_size = queue_size if queue_size is not None else settings.PROGRESS_QUEUE_SIZE
+        self.max_batches = max_batches if max_batches is not None else settings.PROGRESS_MAX_BATCHES
+        self._batches: "OrderedDict[str, BatchProgress]" = OrderedDict()
+        self._subscribers: Dict[Tuple[str, object], Set[Subscriber]] = {}
+        self._lock = threading.Lock()
+
+    def start_batch(self, event_id: int, batch_id: str, total: int) -> BatchProgress:
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                batch = BatchProgress(event_id=event_id, batch_id=batch_id, total=total)
+                self._batches[batch_id] = batch
+                # Seuls les lots récents restent en mémoire
+                while len(self._batches) > self.max_batches:
+                    self._batches.popitem(last=False)
+            else:
+                # Même batch_id réutilisé par plusieurs requêtes (upload découpé)
+                batch.total += total
+                batch.finished_at = None
+            summary = batch.to_dict()
+        self._broadcast(event_id, batch_id, {"type": "batch", "batch": summary})
+        return batch
+
+    def publish(
+        self,
+        event_id: int,
+        batch_id: str,
+        photo_id: str,
+        status: str,
+        batch_index: Optional[int] = None,
+        filename: Optional[str] = None,
+        faces_count: Optional[int] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """Transition d'une photo du lot"""
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                return
+            batch.photos[photo_id] = status
+            if faces_count:
+                batch.faces_found += faces_count
+            counts = batch.counts()
+            if sum(counts[s] for s in DONE_STATUSES) >= batch.total and batch.finished_at is None:
+                batch.finished_at = time.time()
+            summary = batch.to_dict()
+
+        event = {
+            "type": "photo",
+            "photo_id": photo_id,
+            "batch_id": batch_id,
+            "batch_index": batch_index,
+            "filename": filename,
+            "status": status,
+            "faces_count": faces_count,
+            "error": error,
+            "at": datetime.now().isoformat(),
+            "batch": summary
+        }
+        self._broadcast(event_id, batch_id, event)
+
+    def batches(self, event_id: int, batch_id: Optional[str] = None) -> List[Dict]:
+        with self._lock:
+            return [
+                batch.to_dict() for batch in self._batches.values()
+                if batch.event_id == event_id and (batch_id is None or batch.batch_id == batch_id)
+            ]
+
+    def _broadcast(self, event_id: int, batch_id: str, event: Dict) -> None:
+        with self._lock:
+            targets = list(self._subscribers.get(("event", event_id), ())) + \
+                list(self._subscribers.get(("batch", batch_id), ()))
+        for subscriber in targets:
+            subscriber.deliver(event)
+
+    @contextmanager
+    def subscribe(self, event_id: int, batch_id: Optional[str] = None) -> Iterator[Subscriber]:
+        """Abonnement (à ouvrir dans la boucle asyncio du client)"""
+        subscriber = Subscriber(event_id, batch_id, self.queue_size)
+        key = ("batch", batch_id) if batch_id else ("event", event_id)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(subscriber)
+        try:
+            yield subscriber
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(key)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._subscribers[key]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+
+def progress_snapshot(mongo_db, event_id: int, batch_id: Optional[str] = None) -> Dict:
+    """
+    État agrégé depuis MongoDB (une agrégation, pas de lecture par photo),
+    complété par les lots suivis par ce worker
+    """
+    match = {"event_id": event_id}
+    if batch_id:
+        match["batch_id"] = batch_id
+    counts = {status: 0 for status in PHOTO_STATUSES}
+    faces = 0
+    for row in mongo_db.photos.aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$status", "photos": {"$sum": 1}, "faces": {"$sum": {"$ifNull": ["$faces_count", 0]}}}}
+    ]):
+        if row["_id"] in counts:
+            counts[row["_id"]] = row["photos"]
+        faces += row["faces"]
+    return {
+        "type": "snapshot",
+        "event_id": event_id,
+        "batch_id": batch_id,
+        "photos": counts,
+        "total": sum(counts.values()),
+        "faces_found": faces,
+        "batches": progress_broker.batches(event_id, batch_id),
+        "at": datetime.now().isoformat()
+    }
+
+
+# Instance globale (alimentée par les routes d'upload)
+progress_broker = ProgressBroker()
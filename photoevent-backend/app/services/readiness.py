@@ -0,0 +1,85 @@
+"""
+Préchargement des modèles et état de disponibilité (readiness)
+Le modèle de reconnaissance et les index des événements configurés sont
+chargés en arrière-plan au démarrage ; /ready renvoie 503 tant que ce n'est pas fini
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+
+class ReadinessState:
+    """État des composants à charger avant d'accepter du trafic"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._components: Dict[str, Dict] = {}
+
+    def register(self, name: str) -> None:
+        """Déclarer un composant à attendre"""
+        with self._lock:
+            self._components[name] = {"status": "loading", "error": None, "seconds": None}
+
+    def mark_ready(self, name: str, seconds: Optional[float] = None) -> None:
+        with self._lock:
+            self._components[name] = {"status": "ready", "error": None, "seconds": seconds}
+
+    def mark_failed(self, name: str, error: str) -> None:
+        with self._lock:
+            self._components[name] = {"status": "failed", "error": error, "seconds": None}
+
+    @property
+    def is_ready(self) -> bool:
+        with self._lock:
+            return all(c["status"] == "ready" for c in self._components.values())
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: dict(state) for name, state in self._components.items()}
+
+
+readiness = ReadinessState()
+
+
+def register_preload(event_ids: List[int]) -> None:
+    """Déclarer les composants avant de lancer le préchargement
+    (appelé avant l'ouverture du port pour que /ready renvoie 503 dès le début)"""
+    readiness.register("face_model")
+    for event_id in event_ids:
+        readiness.register(f"event_index:{event_id}")
+
+
+def preload_face_stack(event_ids: List[int]) -> None:
+    """
+    Charger le modèle, faire l'inférence de chauffe puis charger les index
+
+    Bloquant : à exécuter dans un thread (asyncio.to_thread).
+    """
+    from app.services.face_recognition import get_face_service
+    from app.services.face_index import get_event_index
+
+    start = time.perf_counter()
+    try:
+        face_service = get_face_service()
+        if settings.FACE_MODEL_WARMUP:
+            face_service.warmup()
+        elapsed = time.perf_counter() - start
+        readiness.mark_ready("face_model", round(elapsed, 2))
+        print(f"✅ Modèle facial préchargé en {elapsed:.1f}s")
+    except Exception as e:
+        readiness.mark_failed("face_model", str(e))
+        print(f"⚠️ Erreur préchargement modèle facial: {e}")
+
+    for event_id in event_ids:
+        name = f"event_index:{event_id}"
+        start = time.perf_counter()
+        try:
+            index = get_event_index(event_id)
+            readiness.mark_ready(name, round(time.perf_counter() - start, 2))
+            print(f"✅ Index événement {event_id} chargé ({len(index)} visages)")
+        except Exception as e:
+            readiness.mark_failed(name, str(e))
+            print(f"⚠️ Erreur chargement index événement {event_id}: {e}")
@@ -0,0 +1,241 @@
+"""
+Recherche inverse : nouvelles photos -> sessions kiosque actives
+
+Un invité qui a fait sa recherche le matin ouvre une session kiosque
+(KioskSession) dont le `face_template` est l'embedding de son selfie. À la
+fin de l'extraction de chaque photo, ses nouveaux visages sont comparés en un
+seul produit matriciel (visages x sessions) aux templates des sessions
+actives de l'événement ; les photos retenues sont ajoutées à la liste de
+résultats de la session (collection `session_matches`). La galerie de
+l'invité se met à jour pour O(nouveaux visages x sessions) au lieu de
+recherches répétées sur tout l'événement.
+
+Les templates sont gardés en mémoire par événement (matrice L2-normalisée),
+rechargés depuis PostgreSQL toutes les KIOSK_SESSION_REFRESH_SECONDS et
+invalidés à la création / fermeture d'une session.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.services.face_index import normalize_rows
+
+# (id de session, embedding de référence)
+TemplateLoader = Callable[[int], List[Tuple[int, List[float]]]]
+
+
+@dataclass
+class EventTemplates:
+    session_ids: np.ndarray
+    matrix: np.ndarray  # (sessions, dim) float32, lignes L2-normalisées
+    loaded_at: float
+
+    def __len__(self) -> int:
+        return len(self.session_ids)
+
+
+def load_active_templates(event_id: int) -> List[Tuple[int, List[float]]]:
+    """
+    Sessions actives et récentes de l'événement ayant un template (PostgreSQL)
+
+    `event_id` est l'id `events` de l'ingestion ; les sessions référencent la
+    fiche `events_admin` du même code (app/db/event_links.py).
+    """
+    from app.database import SessionLocal
+    from app.db.models import Event
+    from app.models.database_models import Event as AdminEvent, KioskSession
+
+    since = datetime.now() - timedelta(hours=settings.KIOSK_SESSION_MAX_AGE_HOURS)
+    db = SessionLocal()
+    try:
+        rows = db.query(KioskSession.id, KioskSession.face_template).join(
+            AdminEvent, AdminEvent.id == KioskSession.event_id
+        ).join(
+            Event, Event.code == AdminEvent.code
+        ).filter(
+            Event.id == event_id,
+            KioskSession.is_active.is_(True),
+            KioskSession.face_template.isnot(None),
+            KioskSession.created_at >= since
+        ).all()
+    finally:
+        db.close()
+    return [(row.id, row.face_template) for row in rows if row.face_template]
+
+
+def update_session_counters(new_photos: Dict[int, int]) -> None:
+    """matched_photos += nouvelles photos, last_matched = maintenant"""
+    from app.database import SessionLocal
+    from app.models.database_models import KioskSession
+
+    db = SessionLocal()
+    try:
+        now = datetime.now()
+        for session_id, count in new_photos.items():
+            db.query(KioskSession).filter(KioskSession.id == session_id).update({
+                KioskSession.matched_photos: KioskSession.matched_photos + count,
+                KioskSession.last_matched: now
+            }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def store_session_matches(mongo_db, event_id: int, matches: Dict[int, Dict[str, Dict]], source: str) -> Dict[int, int]:
+    """
+    Ajouter les correspondances aux listes de résultats des sessions
+    (une photo n'apparaît qu'une fois par session ; index unique
+    idx_session_matches_photo en filet de sécurité)
+
+    Returns:
+        {session_id: nombre de photos nouvellement ajoutées}
+    """
+    pairs = {
+        (session_id, ObjectId(photo_id)): match
+        for session_id, photos in matches.items()
+        for photo_id, match in photos.items()
+    }
+    if not pairs:
+        return {}
+
+    existing = mongo_db.session_matches.find(
+        {
+            "session_id": {"$in": list(matches)},
+            "photo_id": {"$in": list({photo_id for _, photo_id in pairs})}
+        },
+        {"session_id": 1, "photo_id": 1}
+    )
+    for doc in existing:
+        pairs.pop((doc["session_id"], doc["photo_id"]), None)
+    if not pairs:
+        return {}
+
+    now = datetime.now()
+    docs = [
+        {
+            "session_id": session_id,
+            "photo_id": photo_id,
+            "event_id": event_id,
+            "similarity": match["similarity"],
+            "bbox": match["bbox"],
+            "source": source,
+            "matched_at": now
+        }
+        for (session_id, photo_id), match in pairs.items()
+    ]
+    inserted = list(range(len(docs)))
+    try:
+        mongo_db.session_matches.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # Doublons insérés entre-temps par un autre worker
+        failed = {error["index"] for error in e.details.get("writeErrors", []) if error.get("code") == 11000}
+        if len(failed) != len(e.details.get("writeErrors", [])):
+            raise
+        inserted = [i for i in inserted if i not in failed]
+
+    new_photos: Dict[int, int] = {}
+    for i in inserted:
+        new_photos[docs[i]["session_id"]] = new_photos.get(docs[i]["session_id"], 0) + 1
+    return new_photos
+
+
+class SessionMatcher:
+    def __init__(
+        self,
+        loader: TemplateLoader = load_active_templates,
+        refresh_seconds: Optional[float] = None,
+        threshold: Optional[float] = None
+    ):
+        self.loader = loader
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else settings.KIOSK_SESSION_REFRESH_SECONDS
+        self.threshold = threshold if threshold is not None else settings.KIOSK_SESSION_THRESHOLD
+        self._templates: Dict[int, EventTemplates] = {}
+        self._lock = threading.Lock()
+
+    def templates(self, event_id: int) -> EventTemplates:
+        with self._lock:
+            cached = self._templates.get(event_id)
+        if cached is not None and time.time() - cached.loaded_at < self.refresh_seconds:
+            return cached
+
+        rows = self.loader(event_id)
+        if rows:
+            matrix = normalize_rows(np.asarray([template for _, template in rows], dtype=np.float32))
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        templates = EventTemplates(
+            session_ids=np.asarray([session_id for session_id, _ in rows], dtype=np.int64),
+            matrix=matrix,
+            loaded_at=time.time()
+        )
+        with self._lock:
+            self._templates[event_id] = templates
+        return templates
+
+    def invalidate(self, event_id: int) -> None:
+        with self._lock:
+            self._templates.pop(event_id, None)
+
+    def match(self, event_id: int, face_docs: List[Dict]) -> Dict[int, Dict[str, Dict]]:
+        """
+        Scorer les visages d'une photo contre toutes les sessions actives
+
+        Returns:
+            {session_id: {photo_id: {"similarity", "bbox"}}} (meilleur visage par photo)
+        """
+        docs = [doc for doc in face_docs if doc.get("embedding")]
+        if not docs:
+            return {}
+        templates = self.templates(event_id)
+        if not len(templates):
+            return {}
+
+        embeddings = normalize_rows(np.asarray([doc["embedding"] for doc in docs], dtype=np.float32))
+        if embeddings.shape[1] != templates.matrix.shape[1]:
+            return {}
+        scores = embeddings @ templates.matrix.T  # (visages, sessions)
+
+        matches: Dict[int, Dict[str, Dict]] = {}
+        for face, column in zip(*np.nonzero(scores >= self.threshold)):
+            session_id = int(templates.session_ids[column])
+            photo_id = str(docs[face]["photo_id"])
+            similarity = float(scores[face, column])
+            current = matches.setdefault(session_id, {}).get(photo_id)
+            if current is None or similarity > current["similarity"]:
+                matches[session_id][photo_id] = {"similarity": similarity, "bbox": docs[face].get("bbox")}
+        return matches
+
+    def record(self, event_id: int, face_docs: List[Dict], mongo_db=None, on_new_photos=update_session_counters) -> Dict[int, int]:
+        """Scorer, enregistrer les correspondances et mettre à jour les compteurs des sessions"""
+        matches = self.match(event_id, face_docs)
+        if not matches:
+            return {}
+        if mongo_db is None:
+            from app.database import get_mongodb
+            mongo_db = get_mongodb()
+        new_photos = store_session_matches(mongo_db, event_id, matches, source="ingestion")
+        if new_photos and on_new_photos:
+            on_new_photos(new_photos)
+        return new_photos
+
+
+# Instance globale (templates partagés par les routes d'upload)
+session_matcher = SessionMatcher()
+
+
+def match_new_faces(event_id: int, face_docs: List[Dict]) -> None:
+    """Recherche inverse après ingestion ; n'interrompt jamais l'upload"""
+    try:
+        new_photos = session_matcher.record(event_id, face_docs)
+    except Exception as e:
+        print(f"⚠️ Recherche inverse des sessions kiosque échouée (événement {event_id}): {e}")
+        return
+    if new_photos:
+        print(f"🔁 Sessions kiosque mises à jour (événement {event_id}): {new_photos}")
@@ -0,0 +1,277 @@
+"""
+Intégrité du stockage des photos : base MongoDB <-> fichiers sur disque
+
+Un seul parcours du répertoire (os.scandir : noms seulement, pas de stat par
+fichier) comparé à un seul curseur projeté sur `photos`, au lieu d'un
+Path.exists() par photo. Trois écarts sont détectés :
+
+- photos manquantes : document sans fichier ;
+- visages orphelins : documents `faces` d'une photo qui n'existe plus
+  (laissés par les anciens nettoyages) ou manquante ;
+- fichiers orphelins : fichier sans document (analyse globale seulement),
+  plus ancien que STORAGE_ORPHAN_MIN_AGE_SECONDS pour épargner les uploads
+  en cours (le fichier est écrit avant le document).
+
+En mode réparation, photos et visages sont supprimés par delete_many par
+paquets, les index de recherche invalidés et les compteurs event_stats des
+événements analysés recomptés (corrige aussi leur dérive éventuelle) ; les
+fichiers orphelins sont signalés ou déplacés en quarantaine (jamais supprimés).
+Les analyses longues tournent en tâche de fond (IntegrityJobs) avec leur
+progression.
+"""
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from app.core.config import settings
+from app.services.event_stats import rebuild_event_stats
+from app.services.face_index import invalidate_event_index
+
+ORPHAN_ACTIONS = ("report", "quarantine")
+SAMPLE_SIZE = 1000  # Écarts détaillés dans le rapport (les compteurs restent exacts)
+
+
+@dataclass
+class IntegrityReport:
+    job_id: str
+    event_id: Optional[int] = None
+    repair: bool = False
+    orphans_action: str = "report"
+    status: str = "pending"  # pending -> scanning_files -> checking_photos -> reconciling -> done / error
+    files_scanned: int = 0
+    photos_total: int = 0
+    photos_checked: int = 0
+    missing_photos: int = 0
+    orphan_faces: int = 0
+    orphan_files: int = 0
+    orphan_bytes: int = 0
+    deleted_photos: int = 0
+    deleted_faces: int = 0
+    quarantined_files: int = 0
+    stats_rebuilt: int = 0
+    missing: List[Dict] = field(default_factory=list)
+    orphans: List[str] = field(default_factory=list)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+    @property
+    def progress(self) -> float:
+        if self.status in ("done", "error"):
+            return 1.0
+        if self.status == "checking_photos" and self.photos_total:
+            # Le parcours des photos domine ; le scan de fichiers compte pour 10 %
+            return round(0.1 + 0.8 * min(1.0, self.photos_checked / self.photos_total), 3)
+        return {"pending": 0.0, "scanning_files": 0.05, "reconciling": 0.9}.get(self.status, 0.0)
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), "progress": self.progress}
+
+
+def scan_storage(directory: Path) -> Set[str]:
+    """Noms des fichiers du répertoire (type lu dans l'entrée, sans stat)"""
+    try:
+        with os.scandir(directory) as entries:
+            return {entry.name for entry in entries if entry.is_file(follow_symlinks=False)}
+    except FileNotFoundError:
+        return set()
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def check_storage_integrity(
+    mongo_db,
+    upload_dir: Path,
+    event_id: Optional[int] = None,
+    repair: bool = False,
+    orphans_action: str = "report",
+    quarantine_dir: Optional[Path] = None,
+    min_orphan_age_seconds: Optional[int] = None,
+    batch_size: int = 1000,
+    report: Optional[IntegrityReport] = None
+) -> IntegrityReport:
+    """
+    Analyser (et réparer si repair=True) le stockage d'un événement ou de tout le répertoire
+
+    `report` est mis à jour au fil de l'eau (progression lisible par un autre thread).
+    """
+    if orphans_action not in ORPHAN_ACTIONS:
+        raise ValueError(f"orphans_action doit être parmi {ORPHAN_ACTIONS}")
+    if min_orphan_age_seconds is None:
+        min_orphan_age_seconds = settings.STORAGE_ORPHAN_MIN_AGE_SECONDS
+    report = report or IntegrityReport(job_id=uuid.uuid4().hex)
+    report.event_id, report.repair, report.orphans_action = event_id, repair, orphans_action
+    report.started_at = report.started_at or datetime.now()
+
+    # 1. Un seul parcours du répertoire
+    report.status = "scanning_files"
+    upload_dir_abs = os.path.abspath(upload_dir)
+    stored = scan_storage(Path(upload_dir_abs))
+    report.files_scanned = len(stored)
+
+    # 2. Un seul curseur projeté sur les photos
+    report.status = "checking_photos"
+    query = {"event_id": event_id} if event_id is not None else {}
+    report.photos_total = mongo_db.photos.count_documents(query)
+    referenced: Set[str] = set()
+    photo_ids = set()
+    missing_by_event: Dict[int, List] = {}
+    cursor = mongo_db.photos.find(query, {"file_path": 1, "filename": 1, "event_id": 1}).batch_size(5000)
+    for photo in cursor:
+        report.photos_checked += 1
+        photo_ids.add(photo["_id"])
+        file_path = os.path.abspath(photo.get("file_path") or "")
+        name = os.path.basename(file_path)
+        if os.path.dirname(file_path) == upload_dir_abs:
+            referenced.add(name)
+            # Absent du parcours : fichier écrit depuis (upload en cours) ou vraiment manquant
+            present = name in stored or os.path.isfile(file_path)
+        else:
+            # Chemin hors du répertoire analysé (ancien chemin absolu) : vérification unitaire
+            present = os.path.isfile(file_path)
+        if present:
+            continue
+        report.missing_photos += 1
+        missing_by_event.setdefault(photo.get("event_id"), []).append(photo["_id"])
+        if len(report.missing) < SAMPLE_SIZE:
+            report.missing.append({
+                "id": str(photo["_id"]),
+                "event_id": photo.get("event_id"),
+                "filename": photo.get("filename", ""),
+                "expected_path": file_path
+            })
+
+    # Visages dont la photo n'existe plus (hors photos manquantes, comptées avec elles)
+    face_groups = mongo_db.faces.aggregate([
+        {"$match": query},
+        {"$group": {"_id": "$photo_id", "event_id": {"$first": "$event_id"}, "count": {"$sum": 1}}}
+    ], allowDiskUse=True)
+    candidates = [group for group in face_groups if group["_id"] not in photo_ids]
+    # Photos insérées après la lecture du curseur : leurs visages ne sont pas
+    # orphelins. Un visage étant toujours écrit après sa photo, les photos
+    # absentes à cette relecture n'existent plus.
+    orphan_faces_by_event: Dict[int, List] = {}
+    for chunk in _chunks(candidates, batch_size):
+        existing = {
+            doc["_id"] for doc in
+            mongo_db.photos.find({"_id": {"$in": [group["_id"] for group in chunk]}}, {"_id": 1})
+        }
+        for group in chunk:
+            if group["_id"] in existing:
+                continue
+            report.orphan_faces += group["count"]
+            orphan_faces_by_event.setdefault(group.get("event_id"), []).append(group["_id"])
+
+    # Fichiers sans document : seulement quand tous les documents ont été vus
+    orphan_names: List[str] = []
+    if event_id is None:
+        now = time.time()
+        for name in sorted(stored - referenced):
+            try:
+                stat = os.stat(os.path.join(upload_dir_abs, name))
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime < min_orphan_age_seconds:
+                continue
+            orphan_names.append(name)
+            report.orphan_bytes += stat.st_size
+        report.orphan_files = len(orphan_names)
+        report.orphans = orphan_names[:SAMPLE_SIZE]
+
+    # 3. Réconciliation par paquets
+    if repair:
+        report.status = "reconciling"
+        touched = set(missing_by_event) | set(orphan_faces_by_event)
+        for event in touched:
+            photos_removed = faces_removed = 0
+            for chunk in _chunks(missing_by_event.get(event, []), batch_size):
+                photos_removed += mongo_db.photos.delete_many({"_id": {"$in": chunk}}).deleted_count
+                faces_removed += mongo_db.faces.delete_many({"photo_id": {"$in": chunk}}).deleted_count
+            for chunk in _chunks(orphan_faces_by_event.get(event, []), batch_size):
+                faces_removed += mongo_db.faces.delete_many({"photo_id": {"$in": chunk}}).deleted_count
+            report.deleted_photos += photos_removed
+            report.deleted_faces += faces_removed
+            if event is not None:
+                invalidate_event_index(event)
+
+        # Compteurs event_stats recomptés après réparation (événements analysés)
+        events = {event_id} if event_id is not None else \
+            set(mongo_db.photos.distinct("event_id")) | set(mongo_db.event_stats.distinct("_id"))
+        for event in sorted(e for e in events if e is not None):
+            rebuild_event_stats(mongo_db, event)
+            report.stats_rebuilt += 1
+
+    if orphans_action == "quarantine" and orphan_names:
+        report.status = "reconciling"
+        target = Path(quarantine_dir or settings.STORAGE_QUARANTINE_DIR) / datetime.now().strftime("%Y%m%d_%H%M%S")
+        target.mkdir(parents=True, exist_ok=True)
+        for name in orphan_names:
+            try:
+                shutil.move(os.path.join(upload_dir_abs, name), target / name)
+                report.quarantined_files += 1
+            except OSError as e:
+                print(f"⚠️ Quarantaine impossible pour {name}: {e}")
+
+    report.status = "done"
+    report.finished_at = datetime.now()
+    return report
+
+
+class IntegrityJobs:
+    """Analyses en tâche de fond (une seule à la fois), rapports récents gardés en mémoire"""
+
+    def __init__(self, max_reports: int = 20):
+        self.max_reports = max_reports
+        self._reports: "OrderedDict[str, IntegrityReport]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def running(self) -> Optional[IntegrityReport]:
+        with self._lock:
+            for report in self._reports.values():
+                if report.status not in ("done", "error"):
+                    return report
+        return None
+
+    def start(self, mongo_db, upload_dir: Path, **options) -> IntegrityReport:
+        """Lancer une analyse ; RuntimeError si une autre est en cours"""
+        report = IntegrityReport(job_id=uuid.uuid4().hex, started_at=datetime.now())
+        with self._lock:
+            if any(r.status not in ("done", "error") for r in self._reports.values()):
+                raise RuntimeError("Une analyse d'intégrité est déjà en cours")
+            self._reports[report.job_id] = report
+            while len(self._reports) > self.max_reports:
+                self._reports.popitem(last=False)
+
+        def run():
+            try:
+                check_storage_integrity(mongo_db, upload_dir, report=report, **options)
+                print(f"🧹 Intégrité du stockage : {report.missing_photos} photos manquantes, "
+                      f"{report.orphan_faces} visages orphelins, {report.orphan_files} fichiers orphelins")
+            except Exception as e:
+                report.status, report.error, report.finished_at = "error", str(e), datetime.now()
+                print(f"⚠️ Analyse d'intégrité échouée: {e}")
+
+        threading.Thread(target=run, name=f"integrity-{report.job_id[:8]}", daemon=True).start()
+        return report
+
+    def get(self, job_id: str) -> Optional[IntegrityReport]:
+        with self._lock:
+            return self._reports.get(job_id)
+
+    def list(self) -> List[IntegrityReport]:
+        with self._lock:
+            return list(reversed(self._reports.values()))
+
+
+# Instance globale (routes d'administration et analyse périodique)
+integrity_jobs = IntegrityJobs()
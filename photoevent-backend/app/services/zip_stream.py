@@ -0,0 +1,172 @@
+"""
+Archive ZIP "stored" (sans recompression) générée à la volée
+
+Les photos sont déjà en JPEG : les recompresser ne gagne rien et coûte du
+CPU. Chaque entrée utilise un descripteur de données (bit 3) : le CRC-32 est
+écrit après le contenu, calculé pendant la lecture du fichier, et l'archive
+est produite par blocs en mémoire constante.
+
+La taille totale ne dépend que des noms et des tailles de fichiers : elle est
+connue avant le premier octet (Content-Length) et n'importe quelle plage
+d'octets peut être régénérée à l'identique (Range, reprise de téléchargement).
+Un CRC déjà connu (mis en cache par l'appelant via on_crc) évite de relire les
+fichiers situés avant la plage demandée.
+
+Limite : pas de ZIP64, l'archive et chaque fichier restent sous 4 Go.
+"""
+import struct
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 64 * 1024
+ZIP32_LIMIT = 0xFFFFFFFF
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+DATA_DESCRIPTOR = struct.Struct("<IIII")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<IHHHHIIH")
+
+# Bit 3 : CRC et tailles dans le descripteur ; bit 11 : noms en UTF-8
+FLAGS = 0x0008 | 0x0800
+VERSION = 20
+
+
+class ArchiveTooLarge(Exception):
+    """L'archive dépasserait les limites du format ZIP sans ZIP64"""
+
+
+@dataclass
+class ZipEntry:
+    name: str
+    path: Path
+    size: int
+    modified: datetime
+    crc32: Optional[int] = None
+    key: Optional[str] = None  # Identifiant de l'appelant (ex: _id de la photo)
+
+    @property
+    def encoded_name(self) -> bytes:
+        return self.name.encode("utf-8")
+
+    @property
+    def dos_time(self) -> Tuple[int, int]:
+        moment = max(self.modified, datetime(1980, 1, 1))
+        time = (moment.hour << 11) | (moment.minute << 5) | (moment.second // 2)
+        date = ((moment.year - 1980) << 9) | (moment.month << 5) | moment.day
+        return time, date
+
+
+class StoredZipStream:
+    def __init__(self, entries: List[ZipEntry], on_crc: Optional[Callable[[ZipEntry], None]] = None):
+        self.entries = entries
+        self.on_crc = on_crc
+        # Segments contigus : (début, longueur, type, index de l'entrée)
+        self.segments: List[Tuple[int, int, str, int]] = []
+        self.header_offsets: List[int] = []
+
+        offset = 0
+        for index, entry in enumerate(entries):
+            if entry.size > ZIP32_LIMIT:
+                raise ArchiveTooLarge(f"{entry.name} dépasse 4 Go")
+            self.header_offsets.append(offset)
+            for kind, length in (
+                ("local_header", LOCAL_HEADER.size + len(entry.encoded_name)),
+                ("data", entry.size),
+                ("descriptor", DATA_DESCRIPTOR.size)
+            ):
+                self.segments.append((offset, length, kind, index))
+                offset += length
+        self.central_directory_offset = offset
+        central_size = sum(CENTRAL_HEADER.size + len(e.encoded_name) for e in entries)
+        self.segments.append((offset, central_size + END_OF_CENTRAL_DIRECTORY.size, "central_directory", -1))
+        self.size = offset + central_size + END_OF_CENTRAL_DIRECTORY.size
+        if self.central_directory_offset > ZIP32_LIMIT or len(entries) > 0xFFFF:
+            raise ArchiveTooLarge("Archive supérieure à 4 Go ou 65535 fichiers")
+
+    # ------------------------------------------------------------------
+    # Blocs de métadonnées
+    # ------------------------------------------------------------------
+
+    def _local_header(self, entry: ZipEntry) -> bytes:
+        time, date = entry.dos_time
+        # CRC et tailles à 0 : ils suivent dans le descripteur
+        return LOCAL_HEADER.pack(
+            0x04034B50, VERSION, FLAGS, 0, time, date, 0, 0, 0, len(entry.encoded_name), 0
+        ) + entry.encoded_name
+
+    def _descriptor(self, entry: ZipEntry) -> bytes:
+        return DATA_DESCRIPTOR.pack(0x08074B50, self._crc(entry), entry.size, entry.size)
+
+    def _central_directory(self) -> bytes:
+        parts = []
+        for entry, header_offset in zip(self.entries, self.header_offsets):
+            time, date = entry.dos_time
+            parts.append(CENTRAL_HEADER.pack(
+                0x02014B50, VERSION, VERSION, FLAGS, 0, time, date, self._crc(entry),
+                entry.size, entry.size, len(entry.encoded_name), 0, 0, 0, 0, 0, header_offset
+            ) + entry.encoded_name)
+        central = b"".join(parts)
+        parts.append(END_OF_CENTRAL_DIRECTORY.pack(
+            0x06054B50, 0, 0, len(self.entries), len(self.entries), len(central), self.central_directory_offset, 0
+        ))
+        return b"".join(parts)
+
+    def _crc(self, entry: ZipEntry) -> int:
+        if entry.crc32 is None:
+            crc = 0
+            with open(entry.path, "rb") as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    crc = zlib.crc32(chunk, crc)
+            self._set_crc(entry, crc)
+        return entry.crc32
+
+    def _set_crc(self, entry: ZipEntry, crc: int) -> None:
+        entry.crc32 = crc
+        if self.on_crc:
+            self.on_crc(entry)
+
+    # ------------------------------------------------------------------
+    # Flux
+    # ------------------------------------------------------------------
+
+    def _file_range(self, entry: ZipEntry, start: int, stop: int) -> Iterator[bytes]:
+        # Lecture complète depuis le début : le CRC est calculé au passage
+        compute_crc = entry.crc32 is None and start == 0 and stop == entry.size
+        crc = 0
+        with open(entry.path, "rb") as f:
+            f.seek(start)
+            remaining = stop - start
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f"{entry.path} a été tronqué pendant l'envoi")
+                if compute_crc:
+                    crc = zlib.crc32(chunk, crc)
+                remaining -= len(chunk)
+                yield chunk
+        if compute_crc:
+            self._set_crc(entry, crc)
+
+    def iter_range(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Octets [start, end] (bornes incluses, comme l'en-tête Range)"""
+        end = self.size - 1 if end is None else min(end, self.size - 1)
+        for seg_start, length, kind, index in self.segments:
+            seg_end = seg_start + length
+            if seg_end <= start or length == 0:
+                continue
+            if seg_start > end:
+                break
+            lo, hi = max(start, seg_start) - seg_start, min(end + 1, seg_end) - seg_start
+            if kind == "data":
+                yield from self._file_range(self.entries[index], lo, hi)
+                continue
+            if kind == "local_header":
+                block = self._local_header(self.entries[index])
+            elif kind == "descriptor":
+                block = self._descriptor(self.entries[index])
+            else:
+                block = self._central_directory()
+            yield block[lo:hi]
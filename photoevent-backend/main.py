@@ -2,14 +2,25 @@
 Application principale FastAPI - PhotoEvent Backend
 Point d'entrée de l'API avec sécurité avancée
 Les modèles de reconnaissance faciale sont lazy-loaded
+(ou préchargés en arrière-plan si FACE_MODEL_PRELOAD=True)
 """
 
+from contextlib import asynccontextmanager
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
-from app.middleware.rate_limiter import rate_limit_middleware
+from app.core.metrics import registry as metrics_registry
+from app.middleware.metrics import install_threadpool_metrics, metrics_middleware
+from app.middleware.rate_limiter import rate_limit_middleware, rate_limiter
+from app.middleware.profiling import profiling_middleware
+from app.middleware.tracing import tracing_middleware
+from app.services.readiness import readiness, register_preload, preload_face_stack
+from app.services.face_index import index_registry, refresh_pinned_events
+from app.db.mongo_indexes import ensure_indexes, missing_indexes
 from pathlib import Path
 import sys
 
@@ -17,6 +28,81 @@ import sys
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
+
+async def refresh_pinned_events_periodically():
+    """Épingler en mémoire les index des événements ACTIVE (rafraîchi périodiquement)"""
+    while True:
+        try:
+            await asyncio.to_thread(refresh_pinned_events)
+        except Exception as e:
+            print(f"⚠️ Erreur rafraîchissement des événements épinglés: {e}")
+        await asyncio.sleep(settings.FACE_INDEX_PIN_REFRESH_SECONDS)
+
+
+async def compact_face_indexes_periodically():
+    """Compaction de fond des segments d'index (l'ingestion ne bloque jamais la recherche)"""
+    while True:
+        await asyncio.sleep(settings.FACE_INDEX_COMPACTION_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(index_registry.compact_all)
+        except Exception as e:
+            print(f"⚠️ Erreur compaction des index: {e}")
+
+
+async def check_storage_periodically():
+    """Analyse d'intégrité du stockage sans réparation (rapport consultable via /photos/integrity/jobs)"""
+    from app.database import get_mongodb
+    from app.services.storage_integrity import integrity_jobs
+
+    while True:
+        await asyncio.sleep(settings.STORAGE_INTEGRITY_INTERVAL_HOURS * 3600)
+        try:
+            integrity_jobs.start(get_mongodb(), UPLOAD_DIR)
+        except Exception as e:
+            print(f"⚠️ Analyse d'intégrité du stockage non lancée: {e}")
+
+
+async def ensure_mongo_indexes():
+    """Appliquer le registre d'index MongoDB puis vérifier qu'il est complet"""
+    from app.database import get_mongodb
+
+    try:
+        mongo_db = get_mongodb()
+        report = await asyncio.to_thread(ensure_indexes, mongo_db)
+        missing = await asyncio.to_thread(missing_indexes, mongo_db)
+    except Exception as e:
+        print(f"⚠️ Index MongoDB non appliqués: {e}")
+        return
+    if report.changed:
+        print(f"🔧 Index MongoDB : {len(report.created)} créés, {len(report.replaced)} remplacés,"
+              f" {len(report.dropped)} obsolètes supprimés")
+    if missing:
+        print(f"⚠️ Index MongoDB manquants: {', '.join(missing)}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Démarrage : préchargement optionnel du modèle sans bloquer l'ouverture du port"""
+    background_tasks = []
+    install_threadpool_metrics(asyncio.get_running_loop())
+    if settings.FACE_MODEL_PRELOAD:
+        register_preload(settings.PRELOAD_EVENT_IDS)
+        background_tasks.append(asyncio.create_task(
+            asyncio.to_thread(preload_face_stack, settings.PRELOAD_EVENT_IDS)
+        ))
+    if settings.MONGO_ENSURE_INDEXES:
+        background_tasks.append(asyncio.create_task(ensure_mongo_indexes()))
+    background_tasks.append(asyncio.create_task(refresh_pinned_events_periodically()))
+    background_tasks.append(asyncio.create_task(compact_face_indexes_periodically()))
+    background_tasks.append(asyncio.create_task(rate_limiter.cleanup_old_ips()))
+    if settings.STORAGE_INTEGRITY_INTERVAL_HOURS > 0:
+        background_tasks.append(asyncio.create_task(check_storage_periodically()))
+    yield
+    for task in background_tasks:
+        if not task.done():
+            task.cancel()
+
+
 # Créer l'application
 app = FastAPI(
     title=settings.APP_NAME,
@@ -24,6 +110,7 @@ app = FastAPI(
     description="API Backend pour PhotoEvent Kiosk - Reconnaissance faciale événements",
     docs_url=f"{settings.API_PREFIX}/docs",
     redoc_url=f"{settings.API_PREFIX}/redoc",
+    lifespan=lifespan,
 )
 
 # Configuration CORS - hardcoded for reliable cross-origin requests
@@ -41,9 +128,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Profilage à la demande (enregistré en premier = au plus près du handler)
+app.middleware("http")(profiling_middleware)
+
 # Ajouter le middleware de rate limiting
 app.middleware("http")(rate_limit_middleware)
 
+# Traces par étape + en-tête Server-Timing
+app.middleware("http")(tracing_middleware)
+
+# Métriques HTTP (enregistré en dernier = exécuté en premier : compte aussi les 429)
+app.middleware("http")(metrics_middleware)
+
 
 @app.get("/")
 async def root():
@@ -65,6 +161,28 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Disponibilité : 503 tant que le modèle et les index préchargés ne sont pas prêts"""
+    body = {
+        "ready": readiness.is_ready,
+        "components": readiness.snapshot()
+    }
+    if not body["ready"]:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Métriques au format Prometheus (latences, inférence, bases, cache, backlog)
+    Fonction synchrone : les collecteurs (count_documents du backlog) tournent
+    dans le pool de threads, pas sur la boucle
+    """
+    return PlainTextResponse(metrics_registry.expose(), media_type="text/plain; version=0.0.4")
+
+
 @app.get(f"{settings.API_PREFIX}/")
 async def api_root():
     """Racine API v1"""
@@ -81,13 +199,14 @@ async def api_root():
 
 
 # Import des routers
-from app.api import events, photos, search, orders, auth, shares
+from app.api import events, photos, search, orders, auth, shares, diagnostics
 app.include_router(auth.router, prefix=f"{settings.API_PREFIX}/auth", tags=["auth"])
 app.include_router(events.router, prefix=f"{settings.API_PREFIX}/events", tags=["events"])
 app.include_router(photos.router, prefix=f"{settings.API_PREFIX}/photos", tags=["photos"])
 app.include_router(shares.router, prefix=f"{settings.API_PREFIX}/shares", tags=["shares"])
 app.include_router(search.router, prefix=f"{settings.API_PREFIX}/search", tags=["search"])
 app.include_router(orders.router, prefix=f"{settings.API_PREFIX}/orders", tags=["orders"])
+app.include_router(diagnostics.router, prefix=f"{settings.API_PREFIX}/diagnostics", tags=["admin"])
 
 # Servir les fichiers statiques (photos uploadées)
 UPLOAD_DIR = Path("uploads/photos")
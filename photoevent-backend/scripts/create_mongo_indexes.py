@@ -1,47 +1,51 @@
 """
-Script pour créer les indexes MongoDB
-Améliore les performances de recherche
+Script pour créer / vérifier les indexes MongoDB
+Applique le registre app/db/mongo_indexes.py (le même qu'au démarrage)
+
+Usage (depuis photoevent-backend/) :
+    python scripts/create_mongo_indexes.py           # créer / mettre à jour
+    python scripts/create_mongo_indexes.py --check   # code 1 si un index manque
 """
-from pymongo import MongoClient
-from app.core.config import settings
-
-def create_indexes():
-    """Créer les indexes MongoDB optimisés"""
-    client = MongoClient(settings.MONGODB_URL)
-    db = client[settings.MONGODB_DATABASE]
-    
-    print("🔧 Création des indexes MongoDB...")
-    
-    # Index sur event_id pour les recherches par événement
-    faces_collection = db["faces"]
-    faces_collection.create_index([("event_id", 1)], 
-                                   name="idx_event_id")
-    print("✅ Index créé: event_id")
-    
-    # Index composé event_id + similarity pour les recherches paginées
-    faces_collection.create_index([("event_id", 1), ("similarity", -1)], 
-                                   name="idx_event_similarity")
-    print("✅ Index créé: event_id + similarity")
-    
-    # Index TTL sur photos (optionnel, expire après 90 jours)
-    photos_collection = db["photos"]
-    photos_collection.create_index([("created_at", 1)], 
-                                    expireAfterSeconds=7776000,  # 90 jours
-                                    name="idx_expiry_photos")
-    print("✅ Index TTL créé: photos (expire après 90 jours)")
-    
-    # Index sur photo_id pour recherches rapides
-    faces_collection.create_index([("photo_id", 1)], 
-                                   name="idx_photo_id")
-    print("✅ Index créé: photo_id")
-    
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import get_mongodb
+from app.db.mongo_indexes import MONGO_INDEXES, ensure_indexes, missing_indexes
+
+
+def create_indexes(check_only: bool = False) -> int:
+    """Créer les indexes MongoDB du registre"""
+    db = get_mongodb()
+
+    if not check_only:
+        print("🔧 Création des indexes MongoDB...")
+        report = ensure_indexes(db)
+        for label in report.created:
+            print(f"✅ Index créé: {label}")
+        for label in report.replaced:
+            print(f"♻️  Index remplacé: {label}")
+        for label in report.dropped:
+            print(f"🗑️  Index obsolète supprimé: {label}")
+        print(f"   {len(report.existing)} index déjà en place")
+
     # Afficher tous les indexes
-    print("\n📊 Indexes MongoDB créés:")
-    for idx in faces_collection.list_indexes():
-        print(f"  - {idx['name']}: {idx['key']}")
-    
-    client.close()
+    print("\n📊 Indexes MongoDB:")
+    for collection in sorted({spec.collection for spec in MONGO_INDEXES}):
+        for name, info in db[collection].index_information().items():
+            print(f"  - {collection}.{name}: {info['key']}")
+
+    missing = missing_indexes(db)
+    if missing:
+        print(f"\n❌ Indexes manquants: {', '.join(missing)}")
+        return 1
     print("\n✅ Indexation complète!")
+    return 0
+
 
 if __name__ == "__main__":
-    create_indexes()
+    parser = argparse.ArgumentParser(description="Indexes MongoDB du registre")
+    parser.add_argument("--check", action="store_true", help="Vérifier sans rien modifier")
+    sys.exit(create_indexes(parser.parse_args().check))
@@ -0,0 +1,404 @@
+"""
+Générateur de données d'événement synthétiques (PostgreSQL + MongoDB + fichiers)
+
+Peuple les bases pour mesurer get_event_photos, get_admin_stats, list_events
+et la recherche à une échelle réaliste :
+- N événements (table events) et leurs commandes (table orders)
+- M photos par événement (collection photos, même schéma que l'upload) et
+  une petite image JPEG par photo dans uploads/photos/
+- visages (collection faces) : nombre par photo tiré d'une distribution
+  d'événement (décor sans visage, portraits, photos de groupe plafonnées à
+  MAX_FACES_PER_PHOTO), embeddings tirés d'identités regroupées
+  (tests/synthetic.py) pour que la recherche trouve de vraies correspondances
+- partages (collection shares) : photos d'une même identité
+
+Toutes les écritures sont en lots (insert_many / insert multi-lignes) : 1M de
+visages se chargent en quelques minutes sur un serveur local.
+
+Cibles : les vrais services (variables POSTGRES_* / MONGO_* comme
+app/database.py) ou des substituts locaux (--postgres-url sqlite:///... et
+--mongomock). Après un chargement, supprimer les instantanés d'index
+(FACE_INDEX_SNAPSHOT_DIR) des événements régénérés.
+
+Usage (depuis photoevent-backend/) :
+    python scripts/generate_synthetic_data.py --events 10 --photos-per-event 2000
+    python scripts/generate_synthetic_data.py --events 100 --photos-per-event 4000 --no-files
+    python scripts/generate_synthetic_data.py --postgres-url sqlite:///synthetic.db --mongomock --events 2
+"""
+import argparse
+import io
+import secrets
+import string
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from bson import ObjectId
+from PIL import Image
+from sqlalchemy import create_engine, insert, select
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings
+from app.db.models import Base, Event, Order
+from tests.synthetic import _normalize, sample_identity_faces
+
+JPEG_VARIANTS = 64
+CODE_CHARS = string.ascii_uppercase + string.digits
+
+
+@dataclass
+class GenerationStats:
+    events: int = 0
+    photos: int = 0
+    faces: int = 0
+    shares: int = 0
+    orders: int = 0
+    files_bytes: int = 0
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+
+def default_postgres_url() -> str:
+    """Même URL que app/database.py (variables POSTGRES_*)"""
+    from app.database import SQLALCHEMY_DATABASE_URL
+    return SQLALCHEMY_DATABASE_URL
+
+
+def default_mongo_url() -> str:
+    from app.database import MONGO_HOST, MONGO_PORT
+    return f"mongodb://{MONGO_HOST}:{MONGO_PORT}/"
+
+
+def default_mongo_db() -> str:
+    from app.database import MONGO_DB
+    return MONGO_DB
+
+
+def open_mongo(url: str, use_mongomock: bool):
+    if use_mongomock:
+        try:
+            import mongomock
+        except ImportError:
+            raise SystemExit("❌ mongomock n'est pas installé (pip install mongomock)")
+        return mongomock.MongoClient()
+    from pymongo import MongoClient
+    return MongoClient(url)
+
+
+def face_count_distribution(rng: np.random.Generator, n_photos: int) -> np.ndarray:
+    """
+    Visages détectés par photo (avant plafonnement) :
+    - 15 % décor / ambiance, sans visage
+    - 70 % portraits et petits groupes : 1 + Poisson(1.2)
+    - 15 % photos de groupe : 5 + géométrique (moyenne ~8 visages de plus)
+    """
+    kind = rng.random(n_photos)
+    counts = 1 + rng.poisson(1.2, n_photos)
+    groups = kind >= 0.85
+    counts[groups] = 5 + rng.geometric(1 / 8, int(groups.sum()))
+    counts[kind < 0.15] = 0
+    return counts
+
+
+def jpeg_variants(rng: np.random.Generator, count: int = JPEG_VARIANTS) -> List[bytes]:
+    """Petites images JPEG (96x64, dégradés de couleurs) réutilisées pour les fichiers"""
+    variants = []
+    ys, xs = np.mgrid[0:64, 0:96]
+    for _ in range(count):
+        base = rng.integers(0, 256, 3)
+        slope = rng.uniform(-1.5, 1.5, (2, 3))
+        pixels = base + xs[..., None] * slope[0] + ys[..., None] * slope[1]
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=80)
+        variants.append(buffer.getvalue())
+    return variants
+
+
+def unique_codes(rng: np.random.Generator, count: int, existing: set) -> List[str]:
+    codes = []
+    while len(codes) < count:
+        code = "".join(CODE_CHARS[i] for i in rng.integers(0, len(CODE_CHARS), 8))
+        if code not in existing:
+            existing.add(code)
+            codes.append(code)
+    return codes
+
+
+def random_bboxes(rng: np.random.Generator, n: int) -> np.ndarray:
+    """bbox [x, y, w, h] dans une photo 3000x2000 après compression (2048 px max)"""
+    sizes = rng.integers(60, 400, n)
+    xs = rng.integers(0, 2048 - 400, n)
+    ys = rng.integers(0, 1365 - 400, n)
+    return np.stack([xs, ys, sizes, (sizes * 1.2).astype(int)], axis=1)
+
+
+class SyntheticDataGenerator:
+    def __init__(
+        self,
+        postgres_url: str,
+        mongo_db,
+        uploads_dir: Optional[Path],
+        photos_per_event: int,
+        identities_per_event: int = 0,
+        shares_per_event: int = 5,
+        orders_per_event: int = 5,
+        batch_size: int = 5000,
+        max_faces: Optional[int] = None,
+        seed: int = 0
+    ):
+        self.engine = create_engine(postgres_url)
+        self.mongo_db = mongo_db
+        self.uploads_dir = uploads_dir
+        self.photos_per_event = photos_per_event
+        # ~1 identité pour 8 photos : chaque invité apparaît sur une dizaine de photos
+        self.identities_per_event = identities_per_event or max(1, photos_per_event // 8)
+        self.shares_per_event = shares_per_event
+        self.orders_per_event = orders_per_event
+        self.batch_size = batch_size
+        self.max_faces = max_faces or settings.MAX_FACES_PER_PHOTO
+        self.rng = np.random.default_rng(seed)
+        self.jpegs = jpeg_variants(self.rng) if uploads_dir else []
+        self.stats = GenerationStats()
+
+    def run(self, n_events: int) -> GenerationStats:
+        Base.metadata.create_all(self.engine, tables=[Event.__table__, Order.__table__])
+        if self.uploads_dir:
+            self.uploads_dir.mkdir(parents=True, exist_ok=True)
+
+        events = self._insert_events(n_events)
+        for index, (event_id, code) in enumerate(events, 1):
+            photo_ids, face_ids, face_identities, face_photos = self._insert_photos_and_faces(event_id, code)
+            self._insert_shares(event_id, photo_ids, face_ids, face_identities, face_photos)
+            self._insert_orders(event_id, photo_ids)
+            elapsed = sum(self.stats.timings.values())
+            print(f"  📸 Événement {index}/{len(events)} ({code}) : {len(photo_ids)} photos, {len(face_ids)} visages"
+                  f" | total {self.stats.faces} visages en {elapsed:.1f} s")
+        return self.stats
+
+    def _insert_events(self, n_events: int) -> List[tuple]:
+        start = time.perf_counter()
+        with self.engine.begin() as conn:
+            existing = set(conn.execute(select(Event.code)).scalars())
+            codes = unique_codes(self.rng, n_events, existing)
+            today = date.today()
+            now = datetime.now()
+            rows = [
+                {
+                    "code": code,
+                    "name": f"Événement synthétique {code}",
+                    "date": today - timedelta(days=int(self.rng.integers(0, 730))),
+                    "photographer_id": int(self.rng.integers(1, 20)),
+                    "created_at": now,
+                    "updated_at": now
+                }
+                for code in codes
+            ]
+            conn.execute(insert(Event), rows)
+            ids = dict(conn.execute(select(Event.code, Event.id).where(Event.code.in_(codes))).all())
+        self.stats.events += n_events
+        self.stats.add_time("events", time.perf_counter() - start)
+        return [(ids[code], code) for code in codes]
+
+    def _insert_photos_and_faces(self, event_id: int, code: str):
+        n_photos = self.photos_per_event
+        raw_counts = face_count_distribution(self.rng, n_photos)
+        counts = np.minimum(raw_counts, self.max_faces)
+        centers = _normalize(self.rng.standard_normal((self.identities_per_event, 512), dtype=np.float32))
+        uploaded_at = datetime.now() - timedelta(days=int(self.rng.integers(0, 365)))
+
+        photo_ids = [ObjectId() for _ in range(n_photos)]
+        face_ids: List[ObjectId] = []
+        face_identities: List[np.ndarray] = []
+        face_photos: List[np.ndarray] = []
+
+        for batch_start in range(0, n_photos, self.batch_size):
+            batch_stop = min(batch_start + self.batch_size, n_photos)
+            photo_docs = self._photo_docs(event_id, code, photo_ids, raw_counts, counts, batch_start, batch_stop, uploaded_at)
+            start = time.perf_counter()
+            self.mongo_db.photos.insert_many(photo_docs, ordered=False)
+            self.stats.add_time("photos", time.perf_counter() - start)
+            self.stats.photos += len(photo_docs)
+
+            # Visages du lot, insérés par blocs de batch_size documents
+            photo_index = np.repeat(np.arange(batch_start, batch_stop), counts[batch_start:batch_stop])
+            if len(photo_index) == 0:
+                continue
+            start = time.perf_counter()
+            identities = self.rng.integers(0, len(centers), len(photo_index))
+            embeddings = sample_identity_faces(self.rng, centers, identities, 0.6, 0.95)
+            bboxes = random_bboxes(self.rng, len(photo_index))
+            confidences = self.rng.uniform(0.5, 0.99, len(photo_index))
+            self.stats.add_time("embeddings", time.perf_counter() - start)
+
+            for face_start in range(0, len(photo_index), self.batch_size):
+                face_stop = min(face_start + self.batch_size, len(photo_index))
+                start = time.perf_counter()
+                ids = [ObjectId() for _ in range(face_stop - face_start)]
+                face_docs = [
+                    {
+                        "_id": face_id,
+                        "photo_id": photo_ids[photo],
+                        "event_id": event_id,
+                        "embedding": embedding,
+                        "bbox": bbox,
+                        "confidence": round(confidence, 4),
+                        "created_at": uploaded_at
+                    }
+                    for face_id, photo, embedding, bbox, confidence in zip(
+                        ids,
+                        photo_index[face_start:face_stop].tolist(),
+                        embeddings[face_start:face_stop].tolist(),
+                        bboxes[face_start:face_stop].tolist(),
+                        confidences[face_start:face_stop].tolist()
+                    )
+                ]
+                self.mongo_db.faces.insert_many(face_docs, ordered=False)
+                self.stats.add_time("faces", time.perf_counter() - start)
+                self.stats.faces += len(face_docs)
+                face_ids.extend(ids)
+            face_identities.append(identities)
+            face_photos.append(photo_index)
+
+        return (
+            photo_ids,
+            face_ids,
+            np.concatenate(face_identities) if face_identities else np.empty(0, dtype=int),
+            np.concatenate(face_photos) if face_photos else np.empty(0, dtype=int)
+        )
+
+    def _photo_docs(self, event_id, code, photo_ids, raw_counts, counts, batch_start, batch_stop, uploaded_at) -> List[Dict]:
+        docs = []
+        start = time.perf_counter()
+        for i in range(batch_start, batch_stop):
+            filename = f"{code}_{uploaded_at:%Y%m%d_%H%M%S}_{i:07d}.jpg"
+            # Taille de l'upload d'origine : JPEG appareil photo de 2 à 8 Mo
+            original_size = int(self.rng.lognormal(np.log(4 * 1024 * 1024), 0.35))
+            if self.jpegs:
+                content = self.jpegs[i % len(self.jpegs)]
+                (self.uploads_dir / filename).write_bytes(content)
+                file_size = len(content)
+                self.stats.files_bytes += file_size
+            else:
+                # Sans fichiers : taille typique après compression (qualité 85, 2048 px)
+                file_size = int(original_size * self.rng.uniform(0.08, 0.2))
+            docs.append({
+                "_id": photo_ids[i],
+                "event_id": event_id,
+                "filename": filename,
+                "original_filename": f"IMG_{i:05d}.jpg",
+                "file_path": "uploads/photos/" + filename,
+                "status": "ready",
+                "uploaded_at": uploaded_at + timedelta(seconds=i),
+                "file_size": file_size,
+                "original_size": original_size,
+                "compression_ratio": round(file_size / original_size, 2),
+                "storage_saved_mb": round((original_size - file_size) / (1024 * 1024), 2),
+                "faces_count": int(counts[i]),
+                "faces_skipped": int(raw_counts[i] - counts[i])
+            })
+        self.stats.add_time("files" if self.jpegs else "photo_docs", time.perf_counter() - start)
+        return docs
+
+    def _insert_shares(self, event_id, photo_ids, face_ids, face_identities, face_photos) -> None:
+        if not face_ids or not self.shares_per_event:
+            return
+        start = time.perf_counter()
+        now = datetime.utcnow()
+        shares = []
+        for face in self.rng.integers(0, len(face_ids), self.shares_per_event):
+            # Photos de la même identité, comme après une recherche au kiosque
+            photos = np.unique(face_photos[face_identities == face_identities[face]])
+            photos = np.union1d(photos[:49], [face_photos[face]])
+            created_at = now - timedelta(hours=float(self.rng.uniform(0, 96)))
+            expires_at = created_at + timedelta(hours=48)
+            shares.append({
+                "share_code": secrets.token_hex(4).upper(),
+                "event_id": event_id,
+                "face_id": str(face_ids[face]),
+                "selected_photo_ids": [photo_ids[p] for p in photos.tolist()],
+                "created_at": created_at,
+                "expires_at": expires_at,
+                "downloads_count": int(self.rng.poisson(2)),
+                "is_expired": expires_at < now
+            })
+        self.mongo_db.shares.insert_many(shares, ordered=False)
+        self.stats.shares += len(shares)
+        self.stats.add_time("shares", time.perf_counter() - start)
+
+    def _insert_orders(self, event_id: int, photo_ids: List[ObjectId]) -> None:
+        if not photo_ids or not self.orders_per_event:
+            return
+        start = time.perf_counter()
+        now = datetime.now()
+        rows = []
+        for _ in range(self.orders_per_event):
+            selected = self.rng.choice(len(photo_ids), size=min(len(photo_ids), int(self.rng.integers(1, 15))), replace=False)
+            rows.append({
+                "event_id": event_id,
+                "download_token": secrets.token_urlsafe(32),
+                "photo_ids": [str(photo_ids[p]) for p in selected.tolist()],
+                "method": "print" if self.rng.random() < 0.3 else "qr",
+                "expires_at": now + timedelta(days=7),
+                "created_at": now
+            })
+        with self.engine.begin() as conn:
+            conn.execute(insert(Order), rows)
+        self.stats.orders += len(rows)
+        self.stats.add_time("orders", time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère des événements, photos, visages, partages et commandes synthétiques")
+    parser.add_argument("--events", type=int, default=5)
+    parser.add_argument("--photos-per-event", type=int, default=1000)
+    parser.add_argument("--identities-per-event", type=int, default=0, help="0 = une identité pour 8 photos")
+    parser.add_argument("--shares-per-event", type=int, default=5)
+    parser.add_argument("--orders-per-event", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=5000, help="Documents par insert_many")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--postgres-url", default=None, help="URL SQLAlchemy (défaut: POSTGRES_*), ex: sqlite:///synthetic.db")
+    parser.add_argument("--mongo-url", default=None, help="Défaut: MONGO_HOST / MONGO_PORT")
+    parser.add_argument("--mongo-db", default=None, help="Défaut: MONGO_DB")
+    parser.add_argument("--mongomock", action="store_true", help="MongoDB en mémoire (mongomock), pour essai")
+    parser.add_argument("--uploads-dir", type=Path, default=Path("uploads/photos"))
+    parser.add_argument("--no-files", action="store_true", help="Ne pas écrire les fichiers JPEG")
+    args = parser.parse_args()
+
+    client = open_mongo(args.mongo_url or default_mongo_url(), args.mongomock)
+    generator = SyntheticDataGenerator(
+        postgres_url=args.postgres_url or default_postgres_url(),
+        mongo_db=client[args.mongo_db or default_mongo_db()],
+        uploads_dir=None if args.no_files else args.uploads_dir,
+        photos_per_event=args.photos_per_event,
+        identities_per_event=args.identities_per_event,
+        shares_per_event=args.shares_per_event,
+        orders_per_event=args.orders_per_event,
+        batch_size=args.batch_size,
+        seed=args.seed
+    )
+
+    print(f"\n🚀 Génération : {args.events} événements x {args.photos_per_event} photos"
+          f" ({generator.identities_per_event} identités / événement)")
+    start = time.perf_counter()
+    stats = generator.run(args.events)
+    wall = time.perf_counter() - start
+
+    print(f"\n✅ {stats.events} événements, {stats.photos} photos, {stats.faces} visages,"
+          f" {stats.shares} partages, {stats.orders} commandes en {wall:.1f} s")
+    print(f"   {stats.faces / max(wall, 1e-9):.0f} visages/s, {stats.photos / max(wall, 1e-9):.0f} photos/s"
+          f", fichiers {stats.files_bytes / (1024 * 1024):.1f} Mo")
+    for stage, seconds in sorted(stats.timings.items(), key=lambda item: -item[1]):
+        print(f"   ⏱️  {stage:12s} {seconds:8.2f} s")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Quantification INT8 du modèle de reconnaissance ArcFace (buffalo_l)
+et validation contre le modèle FP32 d'origine
+
+Usage (depuis photoevent-backend/) :
+    # Quantification statique calibrée sur de vraies photos (recommandée pour ResNet)
+    python scripts/quantize_recognition_model.py quantize --mode static --photos ../poc-test/photos-toutes
+
+    # Quantification dynamique (poids seulement, sans calibration)
+    python scripts/quantize_recognition_model.py quantize --mode dynamic
+
+    # Comparer FP32 et INT8 : accélération, dérive cosinus, décisions de match inversées
+    python scripts/quantize_recognition_model.py validate --photos ../poc-test/photos-toutes
+
+Activer ensuite FACE_RECOGNITION_PRECISION=int8 dans le .env
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings
+
+DEFAULT_FP32_MODEL = Path.home() / ".insightface" / "models" / "buffalo_l" / "w600k_r50.onnx"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Prétraitement ArcFace de buffalo_l (identique à insightface.model_zoo.ArcFaceONNX)
+INPUT_SIZE = (112, 112)
+INPUT_MEAN = 127.5
+INPUT_STD = 127.5
+
+
+def collect_aligned_faces(photos_dir: Path, limit: int = 500) -> List[Tuple[str, np.ndarray]]:
+    """Détecter et aligner (112x112) les visages des photos d'un dossier"""
+    import insightface
+    from insightface.utils import face_align
+
+    detector = insightface.app.FaceAnalysis(
+        name='buffalo_l',
+        allowed_modules=['detection'],
+        providers=['CPUExecutionProvider']
+    )
+    detector.prepare(ctx_id=-1, det_size=(640, 640))
+
+    crops = []
+    for image_path in sorted(photos_dir.iterdir()):
+        if not image_path.name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        img = cv2.imread(str(image_path))
+        if img is None:
+            continue
+        for face in detector.get(img):
+            crop = face_align.norm_crop(img, landmark=face.kps, image_size=INPUT_SIZE[0])
+            crops.append((image_path.name, crop))
+        if len(crops) >= limit:
+            crops = crops[:limit]
+            break
+
+    print(f"📷 {len(crops)} visages alignés depuis {photos_dir}")
+    return crops
+
+
+def to_blob(crops: List[np.ndarray]) -> np.ndarray:
+    return cv2.dnn.blobFromImages(
+        crops, 1.0 / INPUT_STD, INPUT_SIZE,
+        (INPUT_MEAN, INPUT_MEAN, INPUT_MEAN), swapRB=True
+    )
+
+
+def quantize_dynamic_model(src: Path, dst: Path) -> None:
+    """Quantification dynamique : poids INT8, activations quantifiées à la volée"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantize_dynamic(str(src), str(dst), weight_type=QuantType.QInt8)
+
+
+def quantize_static_model(src: Path, dst: Path, crops: List[np.ndarray]) -> None:
+    """Quantification statique QDQ calibrée sur des visages réels"""
+    import onnxruntime
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    )
+
+    input_name = onnxruntime.InferenceSession(
+        str(src), providers=['CPUExecutionProvider']
+    ).get_inputs()[0].name
+
+    class FaceCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self._batches = iter(
+                {input_name: to_blob(crops[i:i + 16])}
+                for i in range(0, len(crops), 16)
+            )
+
+        def get_next(self):
+            return next(self._batches, None)
+
+    quantize_static(
+        str(src), str(dst), FaceCalibrationReader(),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8
+    )
+
+
+def embed(model_path: Path, crops: List[np.ndarray], batch_size: int = 32) -> Tuple[np.ndarray, float]:
+    """Embeddings L2-normalisés + temps d'inférence total (s)"""
+    import onnxruntime
+
+    session = onnxruntime.InferenceSession(str(model_path), providers=['CPUExecutionProvider'])
+    input_name = session.get_inputs()[0].name
+    output_name = session.get_outputs()[0].name
+
+    # Chauffe (allocation des buffers hors mesure)
+    session.run([output_name], {input_name: to_blob(crops[:1])})
+
+    outputs = []
+    start = time.perf_counter()
+    for i in range(0, len(crops), batch_size):
+        outputs.append(session.run([output_name], {input_name: to_blob(crops[i:i + batch_size])})[0])
+    elapsed = time.perf_counter() - start
+
+    embeddings = np.concatenate(outputs).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings, elapsed
+
+
+def compare_models(fp32_path: Path, int8_path: Path, crops: List[np.ndarray], threshold: float) -> Dict:
+    """Comparer les deux modèles sur les mêmes visages alignés"""
+    emb_fp32, time_fp32 = embed(fp32_path, crops)
+    emb_int8, time_int8 = embed(int8_path, crops)
+
+    # Dérive : 1 - cos(embedding FP32, embedding INT8) pour chaque visage
+    drift = 1.0 - np.sum(emb_fp32 * emb_int8, axis=1)
+
+    # Décisions de match sur toutes les paires de visages
+    upper = np.triu_indices(len(crops), k=1)
+    match_fp32 = (emb_fp32 @ emb_fp32.T)[upper] >= threshold
+    match_int8 = (emb_int8 @ emb_int8.T)[upper] >= threshold
+    flipped = match_fp32 != match_int8
+
+    return {
+        "faces": len(crops),
+        "threshold": threshold,
+        "fp32_ms_per_face": round(time_fp32 * 1000 / len(crops), 3),
+        "int8_ms_per_face": round(time_int8 * 1000 / len(crops), 3),
+        "speedup": round(time_fp32 / time_int8, 2) if time_int8 > 0 else None,
+        "cosine_drift": {
+            "mean": round(float(drift.mean()), 5),
+            "p99": round(float(np.percentile(drift, 99)), 5),
+            "max": round(float(drift.max()), 5)
+        },
+        "pairs": int(flipped.size),
+        "matches_fp32": int(match_fp32.sum()),
+        "matches_int8": int(match_int8.sum()),
+        "flipped_decisions": int(flipped.sum()),
+        "lost_matches": int((match_fp32 & ~match_int8).sum()),
+        "new_matches": int((~match_fp32 & match_int8).sum())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantification INT8 du modèle ArcFace")
+    parser.add_argument("command", choices=["quantize", "validate"])
+    parser.add_argument("--mode", choices=["static", "dynamic"], default="static")
+    parser.add_argument("--fp32", type=Path, default=DEFAULT_FP32_MODEL, help="Modèle ArcFace FP32")
+    parser.add_argument("--int8", type=Path, default=Path(settings.FACE_RECOGNITION_INT8_MODEL), help="Modèle INT8")
+    parser.add_argument("--photos", type=Path, default=Path("../poc-test/photos-toutes"))
+    parser.add_argument("--max-faces", type=int, default=500)
+    parser.add_argument("--threshold", type=float, default=0.55)
+    parser.add_argument("--report", type=Path, default=None, help="Fichier JSON du rapport")
+    args = parser.parse_args()
+
+    if not args.fp32.exists():
+        print(f"❌ Modèle FP32 introuvable: {args.fp32} (lancer une première fois InsightFace)")
+        sys.exit(1)
+
+    if args.command == "quantize":
+        args.int8.parent.mkdir(parents=True, exist_ok=True)
+        print(f"🔧 Quantification {args.mode} de {args.fp32.name}...")
+        if args.mode == "dynamic":
+            quantize_dynamic_model(args.fp32, args.int8)
+        else:
+            crops = [crop for _, crop in collect_aligned_faces(args.photos, args.max_faces)]
+            if not crops:
+                print("❌ Aucun visage pour la calibration")
+                sys.exit(1)
+            quantize_static_model(args.fp32, args.int8, crops)
+        print(f"✅ Modèle INT8 écrit: {args.int8}")
+        return
+
+    if not args.int8.exists():
+        print(f"❌ Modèle INT8 introuvable: {args.int8} (lancer d'abord 'quantize')")
+        sys.exit(1)
+
+    crops = [crop for _, crop in collect_aligned_faces(args.photos, args.max_faces)]
+    if len(crops) < 2:
+        print("❌ Pas assez de visages pour la validation")
+        sys.exit(1)
+
+    report = compare_models(args.fp32, args.int8, crops, args.threshold)
+
+    print("\n" + "=" * 70)
+    print("📊 VALIDATION ArcFace FP32 vs INT8")
+    print("=" * 70)
+    print(f"   - Visages: {report['faces']}")
+    print(f"   - FP32: {report['fp32_ms_per_face']} ms/visage")
+    print(f"   - INT8: {report['int8_ms_per_face']} ms/visage")
+    print(f"   - Accélération: x{report['speedup']}")
+    print(f"   - Dérive cosinus: moy={report['cosine_drift']['mean']} p99={report['cosine_drift']['p99']} max={report['cosine_drift']['max']}")
+    print(f"   - Décisions inversées @ {args.threshold}: {report['flipped_decisions']}/{report['pairs']} paires "
+          f"(perdues: {report['lost_matches']}, nouvelles: {report['new_matches']})")
+
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2))
+        print(f"\n✅ Rapport sauvegardé dans {args.report}")
+
+
+if __name__ == "__main__":
+    main()
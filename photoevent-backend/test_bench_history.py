@@ -0,0 +1,68 @@
+"""Test de l'historique des benchmarks et de la détection de régressions (tests/bench_history.py)"""
+import random
+import tempfile
+
+from tests.bench_history import ResultStore, compare_runs, extract_metrics, main, permutation_p_value
+
+
+def search_report(p95_ms: float, qps: float) -> dict:
+    return {
+        "benchmark": "search",
+        "results": [
+            {"name": "search/index_float32/faces=10000/threshold=0.55", "p50_ms": p95_ms / 2,
+             "p95_ms": p95_ms, "p99_ms": p95_ms * 1.2, "mean_ms": p95_ms / 2, "qps": qps, "peak_alloc_mb": 4.0},
+            {"name": "search/legacy/faces=1000000", "skipped": True}
+        ]
+    }
+
+
+def test_metriques_des_trois_benchmarks():
+    search = extract_metrics(search_report(10.0, 200.0))
+    assert search["search/index_float32/faces=10000/threshold=0.55:qps"] == (200.0, "higher")
+    assert not any(name.startswith("search/legacy") for name in search)
+
+    pipeline = extract_metrics({"benchmark": "image_pipeline", "results": [{
+        "processes": 2, "images_per_sec": 40.0, "peak_rss_mb_per_process": 120.0,
+        "stages": {"thumbnail": {"mean_ms": 5.0, "p95_ms": 9.0, "bytes_out_mean": 1000}}
+    }]})
+    assert pipeline["processes=2/thumbnail:p95_ms"] == (9.0, "lower")
+
+    # Ancien rapport de load_test.py, sans champ "benchmark"
+    load = extract_metrics({
+        "overall": {"wall_seconds": 10, "sent": 100, "dropped_client_saturated": 5},
+        "scenarios": {"kiosk_search": {"count": 50, "p99_ms": 800.0, "status_codes": {"200": 45, "503": 5}}}
+    })
+    assert load["kiosk_search:throughput_per_sec"] == (5.0, "higher")
+    assert load["kiosk_search:error_rate"] == (0.1, "lower")
+    assert load["overall:dropped_rate"] == (0.05, "lower")
+
+
+def test_permutation_separe_bruit_et_regression():
+    assert permutation_p_value([10.0, 10.2, 9.9, 10.1], [12.0, 12.3, 11.8, 12.1]) < 0.05
+    assert permutation_p_value([10.0, 10.4, 9.7, 10.1, 10.3], [10.2, 9.9, 10.3, 10.0, 10.1]) > 0.2
+
+
+def test_compare_code_de_sortie():
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = ResultStore(store_dir)
+        for _ in range(5):
+            store.record(search_report(10 * rng.uniform(0.97, 1.03), 200 * rng.uniform(0.97, 1.03)), commit="base")
+            store.record(search_report(10 * rng.uniform(0.97, 1.03), 200 * rng.uniform(0.97, 1.03)), commit="same")
+            store.record(search_report(13 * rng.uniform(0.97, 1.03), 150 * rng.uniform(0.97, 1.03)), commit="slow")
+
+        changes = compare_runs(store.runs_for("search", "base"), store.runs_for("search", "slow"))
+        regressions = {c.name.split(":")[1] for c in changes if c.regression}
+        assert {"p95_ms", "qps"} <= regressions and "peak_alloc_mb" not in regressions
+
+        args = ["--store", store_dir, "compare", "--benchmark", "search", "--baseline", "base"]
+        assert main(args + ["--candidate", "same"]) == 0
+        assert main(args + ["--candidate", "slow"]) == 1
+        assert main(args + ["--candidate", "inconnu"]) == 2
+
+
+if __name__ == "__main__":
+    test_metriques_des_trois_benchmarks()
+    test_permutation_separe_bruit_et_regression()
+    test_compare_code_de_sortie()
+    print('\n✅ Historique des benchmarks FONCTIONNEL')
@@ -0,0 +1,83 @@
+"""Test de la correspondance events <-> events_admin (app/db/event_links.py)"""
+from datetime import date, datetime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import Column, Integer, Table, create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api import search
+from app.database import Base as AdminBase, get_db
+from app.db.event_links import admin_event_id, event_id_for_admin, event_ids_with_status
+from app.db.models import Base, Event
+from app.models.database_models import Event as AdminEvent, EventStatus, KioskSession
+
+
+def make_session():
+    # Une seule connexion partagée : la base mémoire reste visible depuis le thread des routes
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    if "admin_users" not in AdminBase.metadata.tables:
+        # Table référencée par events_admin mais sans modèle dans ce dépôt
+        Table("admin_users", AdminBase.metadata, Column("id", Integer, primary_key=True))
+    Base.metadata.create_all(engine, tables=[Event.__table__])
+    AdminBase.metadata.create_all(
+        engine, tables=[AdminBase.metadata.tables["admin_users"], AdminEvent.__table__, KioskSession.__table__]
+    )
+    return sessionmaker(bind=engine)()
+
+
+def admin_event(id, code, event_status):
+    return AdminEvent(id=id, admin_id=1, code=code, pin_code="123456", qr_secret=f"secret-{id}",
+                      name=code, date=datetime(2024, 6, 1), status=event_status)
+
+
+def test_correspondance_par_code():
+    db = make_session()
+    # Ids volontairement différents entre les deux tables
+    db.add_all([
+        Event(id=1, code="EVT-A", name="A", date=date(2024, 6, 1)),
+        Event(id=2, code="EVT-B", name="B", date=date(2024, 6, 1)),
+        Event(id=3, code="EVT-C", name="C", date=date(2024, 6, 1)),
+        admin_event(10, "EVT-A", EventStatus.ACTIVE),
+        admin_event(11, "EVT-B", EventStatus.ARCHIVED),
+        admin_event(1, "EVT-Z", EventStatus.ACTIVE),  # fiche sans événement `events`
+    ])
+    db.commit()
+
+    assert event_ids_with_status(db, EventStatus.ACTIVE) == [1]
+    assert admin_event_id(db, 1) == 10 and admin_event_id(db, 3) is None
+    assert event_id_for_admin(db, 11) == 2 and event_id_for_admin(db, 1) is None
+
+
+class StubFaceService:
+    def extract_face_from_base64(self, image):
+        return [0.1, 0.2, 0.3]
+
+
+def test_code_de_session_kiosque_sature():
+    db = make_session()
+    db.add_all([Event(id=1, code="EVT-A", name="A", date=date(2024, 6, 1)), admin_event(10, "EVT-A", EventStatus.ACTIVE)])
+    db.add(KioskSession(event_id=10, session_code="PRISCODE", created_at=datetime.now()))
+    db.commit()
+
+    app = FastAPI()
+    app.include_router(search.router, prefix="/search")
+    app.dependency_overrides[get_db] = lambda: db
+    original = (search.get_face_service, search.generate_session_code)
+    search.get_face_service = StubFaceService
+    search.generate_session_code = lambda: "PRISCODE"
+    try:
+        response = TestClient(app).post("/search/sessions", json={"event_id": 1, "face_image": "x"})
+    finally:
+        search.get_face_service, search.generate_session_code = original
+
+    # Tirages bornés : 503 au lieu d'une boucle sans fin
+    assert response.status_code == 503
+    assert db.query(KioskSession).count() == 1
+
+
+if __name__ == "__main__":
+    test_correspondance_par_code()
+    test_code_de_session_kiosque_sature()
+    print('\n✅ Correspondance des tables d\'événements FONCTIONNELLE')
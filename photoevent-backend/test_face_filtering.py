@@ -0,0 +1,53 @@
+"""Test du filtrage des détections avant reconnaissance"""
+import numpy as np
+from app.services.face_recognition import select_detections, tile_origins, nms
+
+
+def test_filtre_confiance_taille_et_limite():
+    # [x1, y1, x2, y2]
+    boxes = np.array([
+        [0, 0, 100, 100],    # grand, confiant
+        [0, 0, 20, 20],      # trop petit
+        [0, 0, 200, 200],    # peu confiant
+        [0, 0, 80, 80],      # moyen
+        [0, 0, 60, 60],      # moyen, au-delà de la limite
+    ])
+    scores = np.array([0.9, 0.95, 0.3, 0.8, 0.99])
+
+    kept, skipped = select_detections(scores, boxes, min_confidence=0.5, min_size=40, max_faces=2)
+
+    # Classement score × surface : 0 (9000) > 3 (5120) > 4 (3564)
+    assert list(kept) == [0, 3]
+    assert skipped == {"low_confidence": 1, "too_small": 1, "over_limit": 1}
+
+
+def test_aucune_detection():
+    kept, skipped = select_detections(np.zeros(0), np.zeros((0, 4)), 0.5, 40, 20)
+    assert len(kept) == 0
+    assert sum(skipped.values()) == 0
+
+
+
+def test_tuiles_couvrent_toute_l_image():
+    assert tile_origins(1000, 1280, 0.2) == [0]
+    origins = tile_origins(3000, 1280, 0.2)
+    assert origins[0] == 0 and origins[-1] == 3000 - 1280
+    # Chevauchement entre tuiles consécutives
+    assert all(b - a < 1280 for a, b in zip(origins, origins[1:]))
+
+
+def test_nms_fusionne_les_doublons_des_tuiles():
+    dets = np.array([
+        [100, 100, 200, 200, 0.9],
+        [102, 101, 201, 199, 0.8],   # même visage vu par la tuile voisine
+        [500, 500, 560, 560, 0.7],
+    ], dtype=np.float32)
+    assert nms(dets, iou_threshold=0.4) == [0, 2]
+
+
+if __name__ == "__main__":
+    test_filtre_confiance_taille_et_limite()
+    test_aucune_detection()
+    test_tuiles_couvrent_toute_l_image()
+    test_nms_fusionne_les_doublons_des_tuiles()
+    print('\n✅ Filtrage des détections FONCTIONNEL')
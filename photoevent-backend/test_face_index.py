@@ -0,0 +1,275 @@
+"""Test de l'index mémoire des visages (exact et compressé)"""
+import tempfile
+import threading
+import time
+import numpy as np
+from app.core.config import settings
+from app.services.face_index import EventFaceIndex, FaceIndexRegistry, SegmentedEventIndex, quantize_embeddings
+from app.services.face_recognition import FaceRecognitionService
+from app.services.face_snapshots import current_snapshot_version, load_event_snapshot, write_event_snapshot
+from tests.synthetic import clustered_embeddings, query_embeddings
+
+
+def make_docs(embeddings):
+    return [
+        {
+            "_id": f"{i:024x}",
+            "photo_id": f"{i // 3:024x}",
+            "embedding": embedding.tolist(),
+            "bbox": [i, i, 50, 50],
+            "confidence": 0.9
+        }
+        for i, embedding in enumerate(embeddings)
+    ]
+
+
+def test_index_identique_a_la_boucle_python():
+    embeddings, _, centers = clustered_embeddings(300, 20)
+    query = query_embeddings(centers, 1)[0][0]
+    docs = make_docs(embeddings)
+
+    # Ancienne recherche : boucle Python groupée par photo
+    service = object.__new__(FaceRecognitionService)
+    service.use_insightface = True
+    by_photo = {}
+    for doc in docs:
+        by_photo.setdefault(doc["photo_id"], []).append(doc)
+    expected = service.search_faces_in_event(query, list(by_photo.items()), threshold=0.55)
+
+    matches = EventFaceIndex.from_documents(1, docs, dtype="float32").search(query, 0.55)
+
+    assert [(m["photo_id"], m["face_index"]) for m in matches] == \
+        [(m["photo_id"], m["face_index"]) for m in expected]
+    assert np.allclose([m["similarity"] for m in matches], [m["similarity"] for m in expected], atol=1e-5)
+
+
+def test_int8_deux_passes_scores_exacts():
+    embeddings, _, centers = clustered_embeddings(2000, 50)
+    queries, _ = query_embeddings(centers, 10)
+    docs = make_docs(embeddings)
+
+    exact_index = EventFaceIndex.from_documents(1, docs, dtype="float32")
+    for dtype in ("float16", "int8"):
+        index = EventFaceIndex.from_documents(
+            1, docs, dtype=dtype, exact_loader=lambda positions: embeddings[positions]
+        )
+        assert index.nbytes < exact_index.nbytes
+        for query in queries:
+            expected = exact_index.search(query, 0.55)
+            matches = index.search(query, 0.55)
+            # Le re-scoring renvoie les scores pleine précision
+            assert [m["photo_id"] for m in matches] == [m["photo_id"] for m in expected]
+            assert np.allclose([m["similarity"] for m in matches], [m["similarity"] for m in expected], atol=1e-5)
+
+
+def test_quantification_int8_proche():
+    embeddings, _, _ = clustered_embeddings(500, 10)
+    codes, scales = quantize_embeddings(embeddings, "int8")
+    restored = codes.astype(np.float32) * scales[:, None]
+    cosine = np.sum(restored * embeddings, axis=1) / np.linalg.norm(restored, axis=1)
+    assert codes.dtype == np.int8
+    assert cosine.min() > 0.999
+
+
+def test_registre_lru_et_epinglage():
+    embeddings, _, _ = clustered_embeddings(100, 5)
+    docs = make_docs(embeddings)
+    index_bytes = EventFaceIndex.from_documents(0, docs, dtype="float32").nbytes
+    registry = FaceIndexRegistry(
+        budget_bytes=2 * index_bytes,
+        loader=lambda event_id: EventFaceIndex.from_documents(event_id, docs, dtype="float32")
+    )
+    registry.set_pinned([1])
+
+    registry.get(1)
+    registry.get(2)
+    registry.get(3)  # dépasse le budget : 2 est évincé, 1 est épinglé
+    registry.get(1)
+    registry.get(2)  # rechargé : 3 est évincé
+
+    stats = registry.stats()
+    assert [e["event_id"] for e in stats["events"]] == [2, 1]
+    assert stats["resident_mb"] <= stats["budget_mb"]
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["reloads"]) == (1, 4, 2, 1)
+
+
+def test_ajout_pendant_un_chargement_non_mis_en_cache():
+    embeddings, _, _ = clustered_embeddings(30, 3)
+    docs = make_docs(embeddings)
+    stored = docs[:27]  # Visages en base au moment de la lecture
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_loader(event_id):
+        snapshot = list(stored)
+        loading.set()
+        release.wait(5)
+        return EventFaceIndex.from_documents(event_id, snapshot, dtype="float32")
+
+    registry = FaceIndexRegistry(budget_bytes=1 << 30, loader=slow_loader)
+    first = []
+    thread = threading.Thread(target=lambda: first.append(registry.get(1)))
+    thread.start()
+    assert loading.wait(5)
+    # Ingestion pendant le chargement : la lecture en cours ne voit pas ces visages
+    stored.extend(docs[27:])
+    registry.add_faces(1, docs[27:])
+    release.set()
+    thread.join(5)
+
+    assert len(first[0]) == 27
+    # Le chargement périmé n'a pas été mis en cache : relu avec les nouveaux visages
+    assert len(registry.get(1)) == 30
+
+
+def test_visages_ingeres_par_un_autre_worker():
+    embeddings, _, _ = clustered_embeddings(30, 3)
+    docs = make_docs(embeddings)
+    stored = docs[:24]  # Collection faces, partagée par tous les workers
+    registry = FaceIndexRegistry(
+        budget_bytes=1 << 30,
+        loader=lambda event_id: EventFaceIndex.from_documents(event_id, list(stored), dtype="float32"),
+        version_check_seconds=0.1,
+        faces_count_of=lambda event_id: len(stored)  # event_stats
+    )
+    assert len(registry.get(1)) == 24
+
+    # Ajout par ce worker : compteur et index avancent ensemble, pas de rechargement
+    stored.extend(docs[24:27])
+    registry.add_faces(1, docs[24:27])
+    time.sleep(0.15)
+    assert len(registry.get(1)) == 27 and registry.stats()["misses"] == 1
+
+    # Ajout par un autre worker : visible après le délai de vérification
+    stored.extend(docs[27:])
+    assert len(registry.get(1)) == 27
+    time.sleep(0.15)
+    assert len(registry.get(1)) == 30 and registry.stats()["misses"] == 2
+
+
+class ReleaseHookLock:
+    """Verrou appelant `hook` après sa n-ième libération (pour rejouer une course)"""
+
+    def __init__(self, n, hook):
+        self._lock, self._n, self._hook, self.releases = threading.Lock(), n, hook, 0
+
+    def __enter__(self):
+        self._lock.acquire()
+
+    def __exit__(self, *exc):
+        self._lock.release()
+        self.releases += 1
+        if self.releases == self._n:
+            self._hook()
+
+
+def test_demande_de_snapshot_juste_apres_la_fin_non_perdue():
+    from app.services import face_index, face_snapshots
+
+    writes = []
+    # Demande d'un autre thread juste après la décision de fin (3e libération du verrou)
+    def concurrent_request():
+        thread = threading.Thread(target=face_snapshots.rebuild_event_snapshot, args=(5,))
+        thread.start()
+        thread.join(5)
+
+    original = (face_snapshots._rebuild_lock, face_snapshots.write_event_snapshot,
+                face_index.load_event_index_from_mongo, settings.FACE_INDEX_SNAPSHOTS)
+    face_snapshots._rebuild_lock = ReleaseHookLock(3, concurrent_request)
+    face_snapshots.write_event_snapshot = lambda index: writes.append(index) or "v"
+    face_index.load_event_index_from_mongo = lambda event_id, dtype=None: \
+        EventFaceIndex.from_documents(event_id, [], dtype="float32")
+    settings.FACE_INDEX_SNAPSHOTS = True
+    try:
+        face_snapshots.rebuild_event_snapshot(5)
+    finally:
+        (face_snapshots._rebuild_lock, face_snapshots.write_event_snapshot,
+         face_index.load_event_index_from_mongo, settings.FACE_INDEX_SNAPSHOTS) = original
+
+    assert len(writes) == 2 and not face_snapshots._rebuild_running[5]
+
+
+def test_snapshot_memory_map():
+    embeddings, _, centers = clustered_embeddings(1000, 20)
+    queries, _ = query_embeddings(centers, 5)
+    exact_index = EventFaceIndex.from_documents(7, make_docs(embeddings), dtype="float32")
+
+    snapshot_dir, dtype = settings.FACE_INDEX_SNAPSHOT_DIR, settings.FACE_INDEX_DTYPE
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.FACE_INDEX_SNAPSHOT_DIR, settings.FACE_INDEX_DTYPE = tmp, "int8"
+        try:
+            version = write_event_snapshot(exact_index)
+            snapshot = load_event_snapshot(7)
+            assert current_snapshot_version(7) == version == snapshot.snapshot_version
+            assert isinstance(snapshot.codes, np.memmap) and snapshot.dtype == "int8"
+            for query in queries:
+                expected = exact_index.search(query, 0.55)
+                matches = snapshot.search(query, 0.55)
+                assert [m["photo_id"] for m in matches] == [m["photo_id"] for m in expected]
+                assert np.allclose([m["similarity"] for m in matches], [m["similarity"] for m in expected], atol=1e-5)
+
+            # Une nouvelle version publiée (autre worker) force le rechargement,
+            # détectée à la relecture suivante du pointeur CURRENT (pas à chaque get)
+            version_reads = []
+
+            def version_of(event_id):
+                version_reads.append(event_id)
+                return current_snapshot_version(event_id)
+
+            registry = FaceIndexRegistry(
+                budget_bytes=1 << 30, loader=load_event_snapshot, version_of=version_of, version_check_seconds=0.2
+            )
+            assert registry.get(7).snapshot_version == version
+            new_version = write_event_snapshot(exact_index)
+            for _ in range(50):
+                assert registry.get(7).snapshot_version == version
+            assert version_reads == []
+            time.sleep(0.25)
+            assert registry.get(7).snapshot_version == new_version
+            assert version_reads == [7]
+        finally:
+            settings.FACE_INDEX_SNAPSHOT_DIR, settings.FACE_INDEX_DTYPE = snapshot_dir, dtype
+
+
+def test_segments_ajouts_suppressions_compaction():
+    embeddings, _, centers = clustered_embeddings(900, 30)
+    queries, _ = query_embeddings(centers, 5)
+    docs = make_docs(embeddings)
+    deleted_photo = docs[0]["photo_id"]
+    remaining = [doc for doc in docs if doc["photo_id"] != deleted_photo]
+    expected_index = EventFaceIndex.from_documents(1, remaining, dtype="float32")
+
+    index = SegmentedEventIndex(
+        1, EventFaceIndex.from_documents(1, docs[:600], dtype="float32"), publish=lambda merged: merged
+    )
+    # Ingestion photo par photo (3 visages par photo)
+    for start in range(600, 900, 3):
+        index.add_faces(docs[start:start + 3])
+    index.delete_photo(deleted_photo)
+    assert index.segment_count > 1 and index.needs_compaction()
+
+    def check():
+        for query in queries:
+            expected = expected_index.search(query, 0.55)
+            matches = index.search(query, 0.55)
+            assert sorted((m["photo_id"], m["face_index"]) for m in matches) == \
+                sorted((m["photo_id"], m["face_index"]) for m in expected)
+            assert np.allclose([m["similarity"] for m in matches], [m["similarity"] for m in expected], atol=1e-5)
+
+    check()
+    index.compact()
+    assert (index.segment_count, index.tombstone_count, len(index)) == (1, 0, len(remaining))
+    assert not index.needs_compaction()
+    check()
+
+
+if __name__ == "__main__":
+    test_index_identique_a_la_boucle_python()
+    test_int8_deux_passes_scores_exacts()
+    test_quantification_int8_proche()
+    test_registre_lru_et_epinglage()
+    test_ajout_pendant_un_chargement_non_mis_en_cache()
+    test_visages_ingeres_par_un_autre_worker()
+    test_demande_de_snapshot_juste_apres_la_fin_non_perdue()
+    test_snapshot_memory_map()
+    test_segments_ajouts_suppressions_compaction()
+    print('\n✅ Index des visages FONCTIONNEL')
@@ -0,0 +1,88 @@
+"""Test du moteur facial factice (FACE_ENGINE=fake) : déterminisme et chemin InsightFace complet"""
+import base64
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app.api.photos import compress_image
+from app.core.config import settings
+from app.services import face_recognition
+from app.services.face_recognition import FaceRecognitionService
+
+PHOTOS_DIR = Path(__file__).resolve().parent.parent / "poc-test" / "photos-toutes"
+
+
+def fake_service() -> FaceRecognitionService:
+    original = (settings.FACE_ENGINE, settings.FACE_FAKE_DETECTION_MS, settings.FACE_FAKE_RECOGNITION_MS)
+    settings.FACE_ENGINE = "fake"
+    settings.FACE_FAKE_DETECTION_MS = 0
+    settings.FACE_FAKE_RECOGNITION_MS = 0
+    try:
+        return FaceRecognitionService()
+    finally:
+        settings.FACE_ENGINE, settings.FACE_FAKE_DETECTION_MS, settings.FACE_FAKE_RECOGNITION_MS = original
+
+
+def photo_bytes(index: int) -> bytes:
+    return sorted(PHOTOS_DIR.glob("*.jpeg"))[index].read_bytes()
+
+
+def extract(service: FaceRecognitionService, content: bytes):
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp:
+        tmp.write(content)
+    try:
+        return service.extract_faces_with_stats(tmp.name)
+    finally:
+        Path(tmp.name).unlink()
+
+
+def test_embeddings_deterministes_et_robustes():
+    service = fake_service()
+    original = photo_bytes(0)
+    faces, _ = extract(service, original)
+    assert faces and len(faces) <= settings.MAX_FACES_PER_PHOTO
+    assert all(abs(np.linalg.norm(f['embedding']) - 1.0) < 1e-4 for f in faces)
+
+    # Un autre processus / service donne exactement les mêmes visages
+    again, _ = extract(fake_service(), original)
+    assert [f['bbox'] for f in again] == [f['bbox'] for f in faces]
+    assert np.allclose([f['embedding'] for f in again], [f['embedding'] for f in faces])
+
+    # Selfie kiosque = même photo recompressée à l'upload : correspondance forte
+    query = service.extract_face_from_base64(base64.b64encode(compress_image(original)).decode())
+    stored = np.array([f['embedding'] for f in faces])
+    assert (stored @ np.array(query)).max() > 0.9
+
+    # Photo sans rapport : aucune correspondance au seuil par défaut
+    other, _ = extract(service, photo_bytes(5))
+    assert (np.array([f['embedding'] for f in other]) @ np.array(query)).max() < settings.FACE_MATCH_THRESHOLD
+
+
+def test_image_unie_sans_visage():
+    service = fake_service()
+    blank = np.full((300, 300, 3), 200, dtype=np.uint8)
+    _, encoded = cv2.imencode(".jpg", blank)
+    assert service.extract_face_from_base64(base64.b64encode(encoded.tobytes()).decode()) is None
+
+
+def test_get_face_service_sans_modele():
+    previous = face_recognition._face_service
+    original = settings.FACE_ENGINE
+    face_recognition._face_service = None
+    settings.FACE_ENGINE = "fake"
+    try:
+        service = face_recognition.get_face_service()
+        assert type(service.model).__name__ == "FakeFaceAnalysis"
+        service.warmup()
+    finally:
+        settings.FACE_ENGINE = original
+        face_recognition._face_service = previous
+
+
+if __name__ == "__main__":
+    test_embeddings_deterministes_et_robustes()
+    test_image_unie_sans_visage()
+    test_get_face_service_sans_modele()
+    print('\n✅ Moteur facial factice FONCTIONNEL')
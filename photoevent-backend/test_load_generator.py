@@ -0,0 +1,76 @@
+"""Test du générateur de charge en boucle ouverte (tests/load_test.py)"""
+import asyncio
+import random
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+from tests.load_test import ArrivalProfile, LatencyHistogram, OpenLoopLoadGenerator, load_images
+
+
+def test_histogramme_precision_relative():
+    histogram = LatencyHistogram()
+    values = [random.Random(0).uniform(0.0001, 5.0) for _ in range(20000)]
+    for value in values:
+        histogram.record(value)
+    values.sort()
+    for percent in (50, 95, 99, 99.9):
+        exact_ms = values[int(len(values) * percent / 100) - 1] * 1000
+        assert abs(histogram.percentile(percent) - exact_ms) / exact_ms < 0.01
+    assert histogram.to_dict()["count"] == 20000
+
+
+def test_profils_de_debit():
+    ramp = ArrivalProfile("ramp", rate=50, start_rate=10, ramp_seconds=100)
+    assert ramp.rate_at(0) == 10 and ramp.rate_at(50) == 30 and ramp.rate_at(500) == 50
+    step = ArrivalProfile("step", rate=40, start_rate=10, ramp_seconds=40, steps=4)
+    assert [step.rate_at(t) for t in (0, 15, 25, 35, 100)] == [10, 20, 30, 40, 40]
+    spike = ArrivalProfile("spike", rate=10, spike_at=5, spike_seconds=2, spike_factor=3)
+    assert spike.rate_at(4) == 10 and spike.rate_at(6) == 30
+
+
+def test_boucle_ouverte_ne_attend_pas_le_serveur():
+    app = FastAPI()
+    calls = {"search": 0, "thumbnail": 0}
+
+    @app.post("/api/v1/search/face")
+    async def search(body: dict):
+        assert isinstance(body["event_id"], int)
+        calls["search"] += 1
+        # Serveur lent : une boucle fermée plafonnerait bien en dessous du débit visé
+        await asyncio.sleep(0.3)
+        return {"matches": []}
+
+    @app.get("/api/v1/photos/{photo_id}/thumbnail")
+    async def thumbnail(photo_id: str):
+        calls["thumbnail"] += 1
+        return Response(b"jpeg", media_type="image/jpeg")
+
+    generator = OpenLoopLoadGenerator(
+        base_url="http://test",
+        event_id=1,
+        profile=ArrivalProfile("constant", rate=100),
+        duration=1.0,
+        mix={"kiosk_search": 0.5, "gallery_thumbnails": 0.5},
+        selfies=load_images(None, limit=1),
+        uploads=[],
+        photo_ids=[f"{i:024x}" for i in range(30)],
+        gallery_page=4,
+        transport=httpx.ASGITransport(app=app),
+        seed=1
+    )
+    report = asyncio.run(generator.run())
+
+    assert 60 <= report["overall"]["sent"] <= 140
+    search = report["scenarios"]["kiosk_search"]
+    assert search["status_codes"] == {"200": calls["search"]}
+    assert search["p50_ms"] >= 300
+    assert calls["thumbnail"] == 4 * report["scenarios"]["gallery_thumbnails"]["count"]
+
+
+if __name__ == "__main__":
+    test_histogramme_precision_relative()
+    test_profils_de_debit()
+    test_boucle_ouverte_ne_attend_pas_le_serveur()
+    print('\n✅ Générateur de charge FONCTIONNEL')
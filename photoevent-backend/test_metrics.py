@@ -0,0 +1,92 @@
+"""Test des métriques Prometheus (/metrics)"""
+import asyncio
+import threading
+import time
+from app.core.metrics import MetricsRegistry, TrackedThreadPoolExecutor
+
+
+def test_histogramme_et_compteur_multi_threads():
+    registry = MetricsRegistry()
+    latency = registry.histogram("test_latency_seconds", "Latence", ("route",), buckets=(0.1, 1.0))
+    requests = registry.counter("test_requests_total", "Requêtes", ("route",))
+
+    def work():
+        for value in (0.05, 0.5, 5.0):
+            latency.observe(value, "/search")
+            requests.inc("/search")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    text = registry.expose()
+    assert '# TYPE test_latency_seconds histogram' in text
+    assert 'test_latency_seconds_bucket{route="/search",le="0.1"} 4' in text
+    assert 'test_latency_seconds_bucket{route="/search",le="1.0"} 8' in text
+    assert 'test_latency_seconds_bucket{route="/search",le="+Inf"} 12' in text
+    assert 'test_latency_seconds_count{route="/search"} 12' in text
+    assert 'test_requests_total{route="/search"} 12.0' in text
+
+
+def test_collecteur_en_erreur_ignore():
+    registry = MetricsRegistry()
+
+    def broken():
+        raise ConnectionError("MongoDB indisponible")
+
+    registry.gauge("test_backlog", "Backlog", ("status",), broken)
+    registry.gauge("test_ok", "OK", (), lambda: [((), 1)])
+    text = registry.expose()
+    assert "test_backlog" not in text
+    assert "test_ok 1" in text
+
+
+def test_executor_compte_file_et_taches_en_cours():
+    release = threading.Event()
+    executor = TrackedThreadPoolExecutor(max_workers=1)
+    try:
+        futures = [executor.submit(release.wait) for _ in range(3)]
+        deadline = time.time() + 5
+        while executor.running != 1 and time.time() < deadline:
+            time.sleep(0.01)
+        assert (executor.queued, executor.running) == (2, 1)
+        release.set()
+        assert all(f.result(timeout=5) for f in futures)
+        assert (executor.queued, executor.running) == (0, 0)
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_pool_anyio_jetons_empruntes():
+    import anyio
+    from app.middleware import metrics as metrics_middleware
+
+    async def main():
+        metrics_middleware.install_threadpool_metrics(asyncio.get_running_loop())
+        release = threading.Event()
+        async with anyio.create_task_group() as tasks:
+            tasks.start_soon(anyio.to_thread.run_sync, release.wait)
+            while metrics_middleware._threadpool_limiter.borrowed_tokens != 1:
+                await anyio.sleep(0.01)
+            # Lecture depuis un thread du pool, comme la route sync /metrics
+            tokens = dict(await anyio.to_thread.run_sync(metrics_middleware._threadpool_tokens))
+            release.set()
+        return tokens
+
+    original = (metrics_middleware._default_executor, metrics_middleware._threadpool_limiter)
+    try:
+        tokens = asyncio.run(main())
+    finally:
+        metrics_middleware._default_executor, metrics_middleware._threadpool_limiter = original
+    assert tokens[("borrowed",)] == 2 and tokens[("waiting",)] == 0 and tokens[("total",)] > 2
+
+
+if __name__ == "__main__":
+    test_histogramme_et_compteur_multi_threads()
+    test_collecteur_en_erreur_ignore()
+    test_executor_compte_file_et_taches_en_cours()
+    test_pool_anyio_jetons_empruntes()
+    print('\n✅ Métriques FONCTIONNELLES')
@@ -0,0 +1,76 @@
+"""Test du registre d'index MongoDB (app/db/mongo_indexes.py)"""
+import os
+import uuid
+from datetime import datetime
+
+import mongomock
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from app.db.mongo_indexes import (
+    MONGO_INDEXES, QUERY_PATTERNS, collection_scans, ensure_indexes, explain_pattern, missing_indexes
+)
+
+
+def test_registre_idempotent_et_nettoyage():
+    db = mongomock.MongoClient()["test"]
+    # Index de l'ancien script, dont un sur le même champ qu'un index du registre
+    db.faces.create_index([("event_id", 1), ("similarity", -1)], name="idx_event_similarity")
+    db.faces.create_index([("photo_id", 1)], name="idx_photo_id")
+    db.photos.create_index([("created_at", 1)], name="idx_expiry_photos", expireAfterSeconds=7776000)
+    db.shares.create_index([("share_code", 1)], name="idx_shares_code")  # non unique
+
+    first = ensure_indexes(db)
+    assert set(first.dropped) == {"faces.idx_event_similarity", "faces.idx_photo_id", "photos.idx_expiry_photos"}
+    assert first.replaced == ["shares.idx_shares_code"]
+    assert missing_indexes(db) == []
+
+    second = ensure_indexes(db)
+    assert not second.changed and len(second.existing) == len(MONGO_INDEXES)
+
+
+def test_detection_collscan():
+    plan = {"stage": "PROJECTION_SIMPLE", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}
+    assert collection_scans(plan) == []
+    assert collection_scans({"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}) == ["COLLSCAN"]
+    assert collection_scans({"stage": "OR", "inputStages": [{"stage": "IXSCAN"}, {"stage": "COLLSCAN"}]}) == ["COLLSCAN"]
+
+
+def test_requetes_chaudes_sans_collscan():
+    client = MongoClient(os.getenv("MONGODB_TEST_URL", "mongodb://localhost:27017"), serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip("MongoDB indisponible (MONGODB_TEST_URL)")
+
+    db = client[f"test_indexes_{uuid.uuid4().hex[:8]}"]
+    try:
+        photo_id = ObjectId()
+        db.photos.insert_many([
+            {"_id": photo_id, "event_id": 1, "status": "ready", "uploaded_at": datetime.now(), "file_size": 10},
+            {"event_id": 2, "status": "pending", "uploaded_at": datetime.now(), "file_size": 10}
+        ])
+        db.faces.insert_one({"photo_id": photo_id, "event_id": 1, "embedding": [0.0] * 4})
+        db.shares.insert_one({"share_code": "ABCD1234", "event_id": 1, "created_at": datetime.now(), "downloads_count": 0})
+        ensure_indexes(db)
+
+        scans = {
+            pattern.source: collection_scans(explain_pattern(db, pattern))
+            for pattern in QUERY_PATTERNS
+        }
+        assert {source: stages for source, stages in scans.items() if stages} == {}
+    finally:
+        client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    test_registre_idempotent_et_nettoyage()
+    test_detection_collscan()
+    try:
+        test_requetes_chaudes_sans_collscan()
+    except pytest.skip.Exception as e:
+        print(f"⏭️  {e}")
+    print('\n✅ Registre d\'index MongoDB FONCTIONNEL')
@@ -0,0 +1,129 @@
+"""Test de la liste paginée par curseur des photos d'un événement et des compteurs event_stats"""
+from datetime import date, datetime, timedelta
+
+import mongomock
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api import photos
+from app.database import get_db
+from app.db.models import Base, Event
+from app.services.event_stats import get_event_stats, record_faces_added, record_photo_added, record_photos_removed
+
+
+def make_client(mongo_db):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[Event.__table__])
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add(Event(id=1, code="EVT001", name="Mariage", date=date(2024, 6, 1)))
+        db.commit()
+
+    def override_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    photos.get_mongodb = lambda: mongo_db
+    app = FastAPI()
+    app.include_router(photos.router, prefix="/photos")
+    app.dependency_overrides[get_db] = override_db
+    return TestClient(app)
+
+
+def test_pagination_par_curseur():
+    mongo_db = mongomock.MongoClient()["test"]
+    start = datetime(2024, 6, 1, 14, 0)
+    # 25 photos dont des ex aequo sur uploaded_at (uploads du même lot)
+    mongo_db.photos.insert_many([
+        {"_id": ObjectId(), "event_id": 1, "filename": f"p{i}.jpg", "status": "ready",
+         "uploaded_at": start + timedelta(seconds=i // 3), "faces_count": i % 4, "file_size": 100,
+         "file_path": "uploads/photos/absent.jpg"}
+        for i in range(25)
+    ] + [{"event_id": 2, "filename": "autre.jpg", "uploaded_at": start}])
+    mongo_db.faces.insert_many([{"event_id": 1, "photo_id": ObjectId()} for _ in range(7)])
+
+    previous = photos.get_mongodb
+    try:
+        client = make_client(mongo_db)
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+            page = client.get("/photos/event/1/list", params=params).json()
+            seen.extend(page["photos"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        assert len(seen) == 25 and len({p["id"] for p in seen}) == 25
+        keys = [(p["uploaded_at"], p["id"]) for p in seen]
+        assert keys == sorted(keys, reverse=True)
+        # Champs projetés : pas de file_path ni file_exists
+        assert set(seen[0]) == {"id", "filename", "original_filename", "status", "uploaded_at",
+                                "faces_count", "file_size", "batch_id"}
+        assert page["total"] == 25 and page["total_faces"] == 7
+
+        assert client.get("/photos/event/1/list", params={"cursor": "pas-un-curseur"}).status_code == 400
+        assert client.get("/photos/event/99/list").status_code == 404
+    finally:
+        photos.get_mongodb = previous
+
+
+def test_pagination_photos_sans_date():
+    mongo_db = mongomock.MongoClient()["test"]
+    start = datetime(2024, 6, 1, 14, 0)
+    dated = [{"_id": ObjectId(), "event_id": 1, "uploaded_at": start + timedelta(seconds=i)} for i in range(5)]
+    # Anciens documents : uploaded_at absent, nul ou en chaîne
+    undated = [{"_id": ObjectId(), "event_id": 1}, {"_id": ObjectId(), "event_id": 1, "uploaded_at": None}]
+    undated += [{"_id": ObjectId(), "event_id": 1, "uploaded_at": "2024-06-01"} for _ in range(2)]
+    mongo_db.photos.insert_many(dated + undated)
+
+    previous = photos.get_mongodb
+    try:
+        client = make_client(mongo_db)
+        seen, cursor = [], None
+        while True:
+            response = client.get("/photos/event/1/list", params={"limit": 3, **({"cursor": cursor} if cursor else {})})
+            assert response.status_code == 200
+            seen.extend(p["id"] for p in response.json()["photos"])
+            cursor = response.json()["next_cursor"]
+            if cursor is None:
+                break
+
+        # Photos datées d'abord (plus récentes en tête), puis les autres par _id décroissant
+        assert seen == [str(p["_id"]) for p in reversed(dated)] + sorted((str(p["_id"]) for p in undated), reverse=True)
+    finally:
+        photos.get_mongodb = previous
+
+
+def test_compteurs_event_stats():
+    mongo_db = mongomock.MongoClient()["test"]
+    mongo_db.photos.insert_many([{"event_id": 1}, {"event_id": 1}])
+    mongo_db.faces.insert_one({"event_id": 1})
+
+    # Pas de compteur : l'incrément crée un document non compté, remplacé par le comptage à la lecture
+    record_photo_added(mongo_db, 1)
+    assert mongo_db.event_stats.find_one({"_id": 1})["counted"] is False
+    assert get_event_stats(mongo_db, 1) == {"photos": 2, "faces": 1}
+
+    record_photo_added(mongo_db, 1)
+    record_faces_added(mongo_db, 1, 4)
+    record_photos_removed(mongo_db, 1, 1, faces=2)
+    assert get_event_stats(mongo_db, 1) == {"photos": 2, "faces": 3}
+
+    # Compteurs écrits avant ce changement (sans champ counted) : lus tels quels
+    mongo_db.event_stats.insert_one({"_id": 2, "photos": 5, "faces": 9})
+    assert get_event_stats(mongo_db, 2) == {"photos": 5, "faces": 9}
+
+
+if __name__ == "__main__":
+    test_pagination_par_curseur()
+    test_pagination_photos_sans_date()
+    test_compteurs_event_stats()
+    print('\n✅ Liste paginée des photos FONCTIONNELLE')
@@ -0,0 +1,95 @@
+"""Test du profilage à la demande (middleware, échantillonneur, répertoire borné)"""
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import diagnostics
+from app.auth.jwt_manager import create_access_token
+from app.core import profiling
+from app.core.profiling import ProfileStore, RequestProfiler
+from app.middleware.profiling import profiling_middleware
+
+
+def busy_handler_work(seconds: float):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(200))
+    return total
+
+
+def make_app():
+    app = FastAPI()
+    app.middleware("http")(profiling_middleware)
+    app.include_router(diagnostics.router, prefix="/diagnostics")
+
+    @app.get("/search")
+    def search():
+        busy_handler_work(0.1)
+        return {"ok": True}
+
+    return app
+
+
+def test_profil_admin_telechargeable():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ProfileStore(Path(tmp), max_files=10, max_bytes=1024 * 1024)
+        original = profiling.request_profiler.store
+        profiling.request_profiler.store = store
+        diagnostics.profile_store = store
+        try:
+            client = TestClient(make_app())
+            admin = {"Authorization": f"Bearer {create_access_token({'sub': 'photographer'})}"}
+            other = {"Authorization": f"Bearer {create_access_token({'sub': 'visiteur'})}"}
+
+            # Drapeau sans JWT admin : pas de profil
+            assert "X-Profile-Id" not in client.get("/search?profile=1").headers
+            assert "X-Profile-Id" not in client.get("/search", headers={"X-Profile": "1", **other}).headers
+
+            response = client.get("/search", headers={"X-Profile": "1", **admin})
+            name = response.headers["X-Profile-Id"]
+
+            assert client.get("/diagnostics/profiles").status_code == 401
+            assert client.get("/diagnostics/traces/slowest").status_code == 401
+            assert client.get("/diagnostics/traces/slowest", headers=admin).status_code == 200
+            listing = client.get("/diagnostics/profiles", headers=admin).json()["profiles"]
+            assert [p["name"] for p in listing] == [name]
+
+            folded = client.get(f"/diagnostics/profiles/{name}", headers=admin).text
+            # Format collapsed : "thread;cadre;...;cadre N", la fonction du handler est visible
+            assert "busy_handler_work" in folded
+            stack, count = folded.splitlines()[0].rsplit(" ", 1)
+            assert ";" in stack and int(count) > 0
+
+            assert client.get("/diagnostics/profiles/..%2F..%2Fetc%2Fpasswd", headers=admin).status_code == 404
+        finally:
+            profiling.request_profiler.store = original
+            diagnostics.profile_store = original
+
+
+def test_repertoire_borne():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ProfileStore(Path(tmp), max_files=3, max_bytes=1024 * 1024)
+        names = [store.save("GET /search", 10, f"MainThread;f {i}\n") for i in range(5)]
+        assert [p["name"] for p in store.list()] == names[::-1][:3]
+
+
+def test_un_seul_profil_a_la_fois():
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = RequestProfiler(ProfileStore(Path(tmp), 10, 1024 * 1024), interval_seconds=0.001)
+        sampler = profiler.try_start()
+        assert sampler is not None
+        assert profiler.try_start() is None
+        busy_handler_work(0.02)
+        profiler.finish(sampler, "GET /search", time.perf_counter())
+        assert profiler.try_start() is not None
+
+
+if __name__ == "__main__":
+    test_profil_admin_telechargeable()
+    test_repertoire_borne()
+    test_un_seul_profil_a_la_fois()
+    print('\n✅ Profilage FONCTIONNEL')
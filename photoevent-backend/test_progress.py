@@ -0,0 +1,165 @@
+"""Test de la progression du traitement poussée en SSE (app/services/progress.py)"""
+import asyncio
+import io
+import tempfile
+import threading
+from datetime import date
+from pathlib import Path
+
+import httpx
+import mongomock
+from fastapi import FastAPI
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api import photos
+from app.database import get_db
+from app.db.models import Base, Event
+from app.services.progress import ProgressBroker, progress_broker, progress_snapshot
+
+
+def test_diffusion_par_evenement_et_par_lot():
+    broker = ProgressBroker(queue_size=5, max_batches=2)
+
+    async def scenario():
+        with broker.subscribe(1) as event_sub, broker.subscribe(1, "lot-a") as batch_sub:
+            broker.start_batch(1, "lot-a", total=2)
+            broker.start_batch(1, "lot-b", total=1)
+
+            # Publication depuis un autre thread (comme le traitement des visages)
+            def ingest():
+                for photo_id, faces in (("p1", 2), ("p2", 0)):
+                    broker.publish(1, "lot-a", photo_id, "processing", filename=f"{photo_id}.jpg")
+                    broker.publish(1, "lot-a", photo_id, "ready", faces_count=faces)
+            worker = threading.Thread(target=ingest)
+            worker.start()
+            worker.join()
+
+            batch_events = []
+            while (message := await batch_sub.get(timeout=0.5)) is not None:
+                batch_events.append(message)
+            event_events = []
+            while (message := await event_sub.get(timeout=0.1)) is not None:
+                event_events.append(message)
+            return batch_events, event_events, event_sub.dropped
+
+    batch_events, event_events, dropped = asyncio.run(scenario())
+
+    # Abonné du lot : début du lot + 4 transitions, rien du lot b
+    assert [m["type"] for m in batch_events] == ["batch", "photo", "photo", "photo", "photo"]
+    assert all(m["batch"]["batch_id"] == "lot-a" for m in batch_events)
+    last = batch_events[-1]["batch"]
+    assert last["ready"] == 2 and last["faces_found"] == 2 and last["finished"]
+    assert last["eta_seconds"] is None
+
+    # Abonné de l'événement : 6 événements (2 lots), file bornée à 5, le plus ancien est perdu
+    assert len(event_events) == 5 and dropped == 1
+    assert event_events[0]["type"] == "batch" and event_events[0]["batch"]["batch_id"] == "lot-b"
+    assert event_events[-1]["status"] == "ready" and event_events[-1]["photo_id"] == "p2"
+
+    # Abonnements fermés, seuls les 2 lots les plus récents restent suivis
+    assert broker.subscriber_count() == 0
+    broker.start_batch(1, "lot-c", total=1)
+    assert [b["batch_id"] for b in broker.batches(1)] == ["lot-b", "lot-c"]
+
+
+def test_instantane_agrege_depuis_mongo():
+    db = mongomock.MongoClient()["test"]
+    db.photos.insert_many([
+        {"event_id": 1, "batch_id": "a", "status": "ready", "faces_count": 3},
+        {"event_id": 1, "batch_id": "a", "status": "ready", "faces_count": 1},
+        {"event_id": 1, "batch_id": "a", "status": "pending"},
+        {"event_id": 1, "batch_id": "b", "status": "error"},
+        {"event_id": 2, "batch_id": "c", "status": "ready", "faces_count": 9},
+    ])
+
+    snapshot = progress_snapshot(db, 1)
+    assert snapshot["photos"] == {"pending": 1, "processing": 0, "ready": 2, "error": 1}
+    assert snapshot["total"] == 4 and snapshot["faces_found"] == 4
+
+    batch = progress_snapshot(db, 1, "a")
+    assert batch["total"] == 3 and batch["photos"]["error"] == 0
+
+
+class BlockingFaceService:
+    """Extraction qui dure tant que le test ne l'a pas libérée"""
+
+    def __init__(self):
+        self.started, self.release, self.finished = threading.Event(), threading.Event(), threading.Event()
+
+    def extract_faces_with_stats(self, path):
+        self.started.set()
+        self.release.wait(3)
+        self.finished.set()
+        return [], 0
+
+
+def test_progression_diffusee_pendant_l_upload():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[Event.__table__])
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add(Event(id=1, code="EVT001", name="Mariage", date=date(2024, 6, 1)))
+        db.commit()
+    app = FastAPI()
+    app.include_router(photos.router, prefix="/photos")
+
+    def override_db():
+        with Session() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_db
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "white").save(buffer, format="JPEG")
+    face_service = BlockingFaceService()
+
+    async def scenario():
+        with progress_broker.subscribe(1, "lot-sse") as subscriber:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                upload = asyncio.create_task(client.post(
+                    "/photos/upload-fast", data={"event_id": "1", "batch_id": "lot-sse"},
+                    files=[("files", ("a.jpg", buffer.getvalue(), "image/jpeg"))]
+                ))
+                statuses, during_extraction = [], None
+                while (message := await subscriber.get(timeout=2)) is not None:
+                    if message["type"] == "photo":
+                        statuses.append(message["status"])
+                        if message["status"] == "processing":
+                            # Reçu pendant l'extraction : la boucle n'est pas bloquée
+                            await asyncio.to_thread(face_service.started.wait, 2)
+                            during_extraction = not face_service.finished.is_set()
+                            face_service.release.set()
+                        if message["status"] in ("ready", "error"):
+                            break
+                response = await upload
+        return statuses, during_extraction, response
+
+    previous = (photos.get_mongodb, photos.get_face_service, photos.UPLOAD_DIR,
+                photos.add_event_faces, photos.match_new_faces)
+    with tempfile.TemporaryDirectory() as tmp:
+        mongo_db = mongomock.MongoClient()["test"]
+        photos.get_mongodb = lambda: mongo_db
+        photos.get_face_service = lambda: face_service
+        photos.UPLOAD_DIR = Path(tmp)
+        photos.add_event_faces = photos.match_new_faces = lambda event_id, face_docs: None
+        try:
+            statuses, during_extraction, response = asyncio.run(scenario())
+        finally:
+            (photos.get_mongodb, photos.get_face_service, photos.UPLOAD_DIR,
+             photos.add_event_faces, photos.match_new_faces) = previous
+
+    assert response.status_code == 200
+    assert statuses == ["pending", "processing", "ready"]
+    assert during_extraction is True
+    assert mongo_db.photos.find_one()["status"] == "ready"
+
+
+if __name__ == "__main__":
+    test_diffusion_par_evenement_et_par_lot()
+    test_instantane_agrege_depuis_mongo()
+    test_progression_diffusee_pendant_l_upload()
+    print('\n✅ Progression du traitement en SSE FONCTIONNELLE')
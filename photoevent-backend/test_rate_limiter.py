@@ -1,6 +1,11 @@
 """Test rate limiting"""
 import asyncio
-from app.middleware.rate_limiter import rate_limiter
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import app.middleware.rate_limiter as rate_limiter_module
+from app.middleware.rate_limiter import (
+    MemoryRateLimitBackend, RateLimiter, RedisRateLimitBackend, rate_limit_middleware, rate_limiter
+)
 
 async def test_rate_limiting():
     print('\n🧪 TEST 3: Rate Limiting (10 req/min per IP)')
@@ -23,5 +28,122 @@ async def test_rate_limiting():
     
     print('\n✅ Rate Limiting FONCTIONNEL')
 
+
+def test_gcra_rafale_puis_recharge():
+    limiter = RateLimiter(max_requests=10, window_seconds=10)
+    results = [limiter.acquire("1.2.3.4", now=100.0) for _ in range(11)]
+    assert all(r.allowed for r in results[:10])
+    assert [r.remaining for r in results[:3]] == [9, 8, 7]
+    assert not results[10].allowed and results[10].reset_in == 1
+    # Une unité se recharge par seconde
+    assert limiter.acquire("1.2.3.4", now=101.0).allowed
+    assert not limiter.acquire("1.2.3.4", now=101.0).allowed
+    # Les autres IPs ont leur propre seau
+    assert limiter.acquire("5.6.7.8", now=101.0).allowed
+
+
+def test_cout_par_route():
+    limiter = RateLimiter(
+        max_requests=100, window_seconds=60, default_cost=5,
+        route_costs={"/uploads/": 0, "/health": 1, "/api/v1/search/face": 20}
+    )
+    assert limiter.cost_for("/api/v1/search/face") == 20
+    assert limiter.cost_for("/health") == 1
+    assert limiter.cost_for("/uploads/photos/a.jpg") == 0
+    assert limiter.cost_for("/api/v1/events/") == 5
+    assert [limiter.acquire("ip", cost=20, now=0.0).allowed for _ in range(6)] == [True] * 5 + [False]
+    assert limiter.acquire("ip", cost=1, now=0.6).allowed
+
+
+def test_purge_ips_inactives():
+    backend = MemoryRateLimitBackend(shards=4)
+    limiter = RateLimiter(max_requests=10, window_seconds=10, backend=backend)
+    for i in range(100):
+        limiter.acquire(f"10.0.0.{i}", cost=3, now=0.0)
+    assert len(backend) == 100
+    assert backend.evict_idle(now=2.0) == 0
+    assert backend.evict_idle(now=3.0) == 100 and len(backend) == 0
+
+
+def test_refus_avant_le_handler():
+    calls = []
+    app = FastAPI()
+    app.middleware("http")(rate_limit_middleware)
+
+    @app.get("/api/v1/search/face")
+    async def search():
+        calls.append(1)
+        return {"ok": True}
+
+    original = rate_limiter_module.rate_limiter
+    rate_limiter_module.rate_limiter = RateLimiter(
+        max_requests=30, window_seconds=60, route_costs={"/api/v1/search/face": 10}
+    )
+    try:
+        client = TestClient(app)
+        statuses = [client.get("/api/v1/search/face").status_code for _ in range(4)]
+        rejected = client.get("/api/v1/search/face")
+    finally:
+        rate_limiter_module.rate_limiter = original
+
+    assert statuses == [200, 200, 200, 429]
+    assert len(calls) == 3
+    assert int(rejected.headers["Retry-After"]) >= 1
+    assert rejected.headers["X-RateLimit-Cost"] == "10"
+
+
+def test_redis_budget_partage_entre_workers():
+    import fakeredis
+
+    async def scenario():
+        server = fakeredis.FakeServer()
+        # Deux workers : deux clients et deux limiteurs, un seul serveur Redis
+        workers = [
+            RateLimiter(max_requests=10, window_seconds=10,
+                        backend=RedisRateLimitBackend(fakeredis.FakeAsyncRedis(server=server)))
+            for _ in range(2)
+        ]
+        results = [await workers[i % 2].consume("1.2.3.4", cost=2) for i in range(6)]
+        ttl = await fakeredis.FakeAsyncRedis(server=server).pttl("ratelimit:1.2.3.4")
+        return results, ttl
+
+    results, ttl = asyncio.run(scenario())
+    assert [r.allowed for r in results] == [True] * 5 + [False]
+    assert [r.remaining for r in results[:5]] == [8, 6, 4, 2, 0]
+    # La clé expire quand le seau est de nouveau plein (purge par Redis)
+    assert 9000 < ttl <= 10000
+
+
+def test_redis_indisponible_repli_memoire():
+    import fakeredis
+
+    async def scenario():
+        server = fakeredis.FakeServer()
+        server.connected = False
+        backend = RedisRateLimitBackend(fakeredis.FakeAsyncRedis(server=server), retry_seconds=60)
+        limiter = RateLimiter(max_requests=3, window_seconds=60, backend=backend)
+        results = [await limiter.consume("1.2.3.4") for _ in range(4)]
+        return results, backend
+
+    results, backend = asyncio.run(scenario())
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert not backend.available and len(backend.fallback) == 1
+
+
+def test_redis_appel_synchrone():
+    import fakeredis
+
+    server = fakeredis.FakeServer()
+    backend = RedisRateLimitBackend(fakeredis.FakeAsyncRedis(server=server),
+                                    sync_client=fakeredis.FakeRedis(server=server))
+    limiter = RateLimiter(max_requests=3, window_seconds=60, backend=backend)
+    # Même état Redis que le middleware (client asynchrone)
+    results = [limiter.acquire("1.2.3.4") for _ in range(2)]
+    results.append(asyncio.run(limiter.consume("1.2.3.4")))
+    results.append(limiter.acquire("1.2.3.4"))
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert len(backend.fallback) == 0 and fakeredis.FakeRedis(server=server).exists("ratelimit:1.2.3.4")
+
+
 # Exécuter le test
 asyncio.run(test_rate_limiting())
@@ -0,0 +1,77 @@
+"""Test de la recherche inverse des nouvelles photos vers les sessions kiosque"""
+import mongomock
+import numpy as np
+from bson import ObjectId
+
+from app.services.session_matcher import SessionMatcher
+from tests.synthetic import clustered_embeddings, query_embeddings
+
+
+def make_matcher(centers, loads):
+    def loader(event_id):
+        loads.append(event_id)
+        # Sessions 10, 11, 12 : selfies des identités 0, 1, 2
+        return [(10 + i, query_embeddings(centers[i:i + 1], 1, seed=i)[0][0].tolist()) for i in range(3)]
+    return SessionMatcher(loader=loader, refresh_seconds=3600, threshold=0.5)
+
+
+def face_docs(embeddings, photo_ids):
+    return [
+        {"_id": ObjectId(), "photo_id": photo_id, "event_id": 1, "embedding": embedding.tolist(), "bbox": [0, 0, 50, 60]}
+        for embedding, photo_id in zip(embeddings, photo_ids)
+    ]
+
+
+def test_scoring_groupe_par_session_et_photo():
+    embeddings, identities, centers = clustered_embeddings(200, 20, seed=3, min_similarity=0.8, max_similarity=0.95)
+    loads = []
+    matcher = make_matcher(centers, loads)
+
+    photo_a, photo_b = ObjectId(), ObjectId()
+    # Photo A : deux visages de l'identité 0 et un de l'identité 5 ; photo B : identité 2
+    face_0 = np.flatnonzero(identities == 0)[:2]
+    face_2 = np.flatnonzero(identities == 2)[:1]
+    face_5 = np.flatnonzero(identities == 5)[:1]
+    docs = face_docs(embeddings[np.concatenate([face_0, face_5])], [photo_a] * 3) \
+        + face_docs(embeddings[face_2], [photo_b])
+
+    matches = matcher.match(1, docs)
+    assert set(matches) == {10, 12}
+    assert set(matches[10]) == {str(photo_a)} and set(matches[12]) == {str(photo_b)}
+    # Meilleur des deux visages de l'identité 0 sur la photo A
+    template = np.asarray(matcher.templates(1).matrix[0])
+    best = max(float(np.dot(embeddings[i], template)) for i in face_0)
+    assert abs(matches[10][str(photo_a)]["similarity"] - best) < 1e-5
+
+    # Templates mis en cache par événement, rechargés après invalidation
+    matcher.match(1, docs)
+    assert loads == [1]
+    matcher.invalidate(1)
+    matcher.match(1, docs)
+    assert loads == [1, 1]
+    assert matcher.match(1, face_docs(embeddings[face_5], [ObjectId()])) == {}
+
+
+def test_enregistrement_idempotent_et_compteurs():
+    embeddings, identities, centers = clustered_embeddings(100, 10, seed=4, min_similarity=0.8, max_similarity=0.95)
+    matcher = make_matcher(centers, [])
+    mongo_db = mongomock.MongoClient()["test"]
+    counters = []
+
+    photo_ids = [ObjectId() for _ in range(3)]
+    faces = np.flatnonzero(identities == 1)[:3]
+    docs = face_docs(embeddings[faces], photo_ids)
+
+    assert matcher.record(1, docs, mongo_db=mongo_db, on_new_photos=counters.append) == {11: 3}
+    # Même photo retraitée : pas de doublon, compteur inchangé
+    assert matcher.record(1, docs[:1], mongo_db=mongo_db, on_new_photos=counters.append) == {}
+    assert counters == [{11: 3}]
+    stored = list(mongo_db.session_matches.find({"session_id": 11}))
+    assert sorted(m["photo_id"] for m in stored) == sorted(photo_ids)
+    assert all(m["source"] == "ingestion" and m["event_id"] == 1 for m in stored)
+
+
+if __name__ == "__main__":
+    test_scoring_groupe_par_session_et_photo()
+    test_enregistrement_idempotent_et_compteurs()
+    print('\n✅ Recherche inverse des sessions kiosque FONCTIONNELLE')
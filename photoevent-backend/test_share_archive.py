@@ -0,0 +1,109 @@
+"""Test de l'archive ZIP d'un partage (stockée, générée à la volée, reprise par Range)"""
+import io
+import os
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import mongomock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import shares
+from app.services.zip_stream import StoredZipStream, ZipEntry
+
+
+def write_photos(directory: Path, sizes) -> list:
+    paths = []
+    for i, size in enumerate(sizes):
+        path = directory / f"photo_{i}.jpg"
+        path.write_bytes(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def entries_for(paths) -> list:
+    return [ZipEntry(name=p.name, path=p, size=p.stat().st_size, modified=datetime(2024, 6, 1, 14, 30)) for p in paths]
+
+
+def test_archive_valide_et_plages_identiques():
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_photos(Path(tmp), [0, 1, 70_000, 200_000])
+        stream = StoredZipStream(entries_for(paths))
+        full = b"".join(stream.iter_range())
+        assert len(full) == stream.size
+
+        with zipfile.ZipFile(io.BytesIO(full)) as archive:
+            assert archive.testzip() is None
+            assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+            assert [archive.read(p.name) for p in paths] == [p.read_bytes() for p in paths]
+
+        # Nouvelle instance sans CRC connu : une plage est régénérée à l'identique
+        for start, end in [(0, 10), (50, 80_000), (stream.size - 100, stream.size - 1), (12_345, 150_000)]:
+            resumed = StoredZipStream(entries_for(paths))
+            assert b"".join(resumed.iter_range(start, end)) == full[start:end + 1]
+
+
+def make_client(tmp: Path):
+    db = mongomock.MongoClient()["test"]
+    paths = write_photos(tmp, [30_000, 45_000, 10_000])
+    photo_ids = db.photos.insert_many([
+        {"event_id": 1, "filename": p.name, "file_path": str(p), "uploaded_at": datetime(2024, 6, 1)} for p in paths
+    ]).inserted_ids
+    db.shares.insert_one({
+        "share_code": "ABCD1234", "event_id": 1, "face_id": "f", "selected_photo_ids": photo_ids,
+        "created_at": datetime.utcnow(), "expires_at": datetime.utcnow() + timedelta(hours=48),
+        "downloads_count": 0, "is_expired": False
+    })
+    shares.get_mongodb = lambda: db
+    app = FastAPI()
+    app.include_router(shares.router, prefix="/shares")
+    return TestClient(app), db, paths
+
+
+def test_endpoint_reprise_et_comptage():
+    previous = shares.get_mongodb
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            client, db, paths = make_client(Path(tmp))
+            head = client.head("/shares/ABCD1234/archive")
+            size = int(head.headers["content-length"])
+            etag = head.headers["etag"]
+
+            full = client.get("/shares/ABCD1234/archive")
+            assert full.status_code == 200 and len(full.content) == size
+            assert full.headers["content-type"] == "application/zip"
+            with zipfile.ZipFile(io.BytesIO(full.content)) as archive:
+                assert archive.namelist() == [p.name for p in paths]
+            # CRC mis en cache dans les photos après le premier envoi
+            assert db.photos.count_documents({"crc32": {"$exists": True}}) == 3
+
+            # Reprise : même octets, pas de nouveau téléchargement comptabilisé
+            resumed = client.get("/shares/ABCD1234/archive", headers={"Range": "bytes=40000-", "If-Range": etag})
+            assert resumed.status_code == 206
+            assert resumed.headers["content-range"] == f"bytes 40000-{size - 1}/{size}"
+            assert resumed.content == full.content[40000:]
+            assert db.shares.find_one()["downloads_count"] == 1
+
+            # ETag périmé : archive complète
+            assert client.get("/shares/ABCD1234/archive", headers={"Range": "bytes=10-", "If-Range": '"old"'}).status_code == 200
+            assert client.get("/shares/ABCD1234/archive", headers={"Range": f"bytes={size}-"}).status_code == 416
+            assert client.get("/shares/INCONNU/archive").status_code == 404
+
+            # Fichier réécrit à taille égale : le CRC en cache n'est plus utilisé
+            paths[0].write_bytes(os.urandom(paths[0].stat().st_size))
+            stat = paths[0].stat()
+            os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            rewritten = client.get("/shares/ABCD1234/archive")
+            with zipfile.ZipFile(io.BytesIO(rewritten.content)) as archive:
+                assert archive.testzip() is None
+                assert archive.read(paths[0].name) == paths[0].read_bytes()
+        finally:
+            shares.get_mongodb = previous
+
+
+if __name__ == "__main__":
+    test_archive_valide_et_plages_identiques()
+    test_endpoint_reprise_et_comptage()
+    print('\n✅ Archive ZIP des partages FONCTIONNELLE')
@@ -0,0 +1,137 @@
+"""Test de l'analyse d'intégrité du stockage (app/services/storage_integrity.py)"""
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import mongomock
+from bson import ObjectId
+
+from app.services.event_stats import get_event_stats
+from app.services.storage_integrity import IntegrityJobs, check_storage_integrity
+
+
+def make_store(tmp: Path):
+    upload_dir = tmp / "photos"
+    upload_dir.mkdir()
+    db = mongomock.MongoClient()["test"]
+
+    photos = []
+    for i in range(6):
+        event_id = 1 if i < 4 else 2
+        photo = {"_id": ObjectId(), "event_id": event_id, "filename": f"p{i}.jpg", "file_path": str(upload_dir / f"p{i}.jpg")}
+        photos.append(photo)
+        if i not in (1, 4):  # p1 (événement 1) et p4 (événement 2) manquent sur disque
+            (upload_dir / f"p{i}.jpg").write_bytes(b"x" * 100)
+    db.photos.insert_many(photos)
+    db.faces.insert_many(
+        [{"event_id": p["event_id"], "photo_id": p["_id"]} for p in photos for _ in range(2)]
+        # Visages d'une photo supprimée par un ancien nettoyage
+        + [{"event_id": 1, "photo_id": ObjectId()} for _ in range(3)]
+    )
+    get_event_stats(db, 1)
+
+    # Fichier sans document, ancien ; un autre récent (upload en cours)
+    old = upload_dir / "orphelin.jpg"
+    old.write_bytes(b"y" * 500)
+    os.utime(old, (time.time() - 7200, time.time() - 7200))
+    (upload_dir / "en_cours.jpg").write_bytes(b"z" * 10)
+    return db, upload_dir, photos
+
+
+def test_analyse_puis_reparation_par_evenement():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, upload_dir, photos = make_store(Path(tmp))
+
+        report = check_storage_integrity(db, upload_dir, event_id=1, min_orphan_age_seconds=3600)
+        assert (report.photos_checked, report.missing_photos, report.orphan_faces) == (4, 1, 3)
+        assert [m["filename"] for m in report.missing] == ["p1.jpg"]
+        # Analyse limitée à un événement : fichiers orphelins non évalués, rien de supprimé
+        assert report.orphan_files == 0 and db.photos.count_documents({}) == 6
+
+        # Compteur ayant dérivé : recompté par la réparation
+        db.event_stats.update_one({"_id": 1}, {"$inc": {"photos": 7}})
+        repaired = check_storage_integrity(db, upload_dir, event_id=1, repair=True)
+        assert (repaired.deleted_photos, repaired.deleted_faces, repaired.stats_rebuilt) == (1, 5, 1)
+        assert db.photos.count_documents({"event_id": 1}) == 3
+        assert db.faces.count_documents({"event_id": 1}) == 6
+        assert db.photos.count_documents({"event_id": 2}) == 2
+        assert get_event_stats(db, 1) == {"photos": 3, "faces": 6}
+
+
+class UploadDuringScan:
+    """Base dont une photo (fichier + document + visages) arrive juste après la lecture du curseur"""
+
+    def __init__(self, db, upload_dir):
+        self._db, self._upload_dir, self.late_id = db, upload_dir, None
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    @property
+    def photos(self):
+        return self
+
+    def count_documents(self, *args, **kwargs):
+        return self._db.photos.count_documents(*args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        return self._db.photos.delete_many(*args, **kwargs)
+
+    def find(self, query, projection=None):
+        if self.late_id is not None or "$in" in str(query):
+            return self._db.photos.find(query, projection)
+        seen = list(self._db.photos.find(query, projection))
+        self.late_id = ObjectId()
+        (self._upload_dir / "tardive.jpg").write_bytes(b"t" * 10)
+        self._db.photos.insert_one({"_id": self.late_id, "event_id": 1, "filename": "tardive.jpg",
+                                    "file_path": str(self._upload_dir / "tardive.jpg")})
+        self._db.faces.insert_many([{"event_id": 1, "photo_id": self.late_id} for _ in range(2)])
+        return _Cursor(seen)
+
+
+class _Cursor(list):
+    def batch_size(self, size):
+        return self
+
+
+def test_upload_pendant_l_analyse_preserve():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, upload_dir, photos = make_store(Path(tmp))
+        racing = UploadDuringScan(db, upload_dir)
+
+        report = check_storage_integrity(racing, upload_dir, event_id=1, repair=True)
+        # Seuls les 3 visages de l'ancienne photo supprimée sont orphelins
+        assert report.orphan_faces == 3 and report.missing_photos == 1
+        assert db.faces.count_documents({"photo_id": racing.late_id}) == 2
+        assert db.photos.count_documents({"_id": racing.late_id}) == 1
+
+
+def test_tache_de_fond_globale_avec_quarantaine():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, upload_dir, photos = make_store(Path(tmp))
+        quarantine = Path(tmp) / "quarantine"
+        jobs = IntegrityJobs()
+
+        report = jobs.start(db, upload_dir, repair=True, orphans_action="quarantine",
+                            quarantine_dir=quarantine, min_orphan_age_seconds=3600)
+        deadline = time.time() + 10
+        while report.status not in ("done", "error") and time.time() < deadline:
+            time.sleep(0.01)
+
+        assert report.status == "done" and report.progress == 1.0, report.error
+        assert (report.files_scanned, report.photos_checked, report.missing_photos) == (6, 6, 2)
+        assert report.orphans == ["orphelin.jpg"] and report.orphan_bytes == 500
+        assert report.quarantined_files == 1
+        assert not (upload_dir / "orphelin.jpg").exists() and (upload_dir / "en_cours.jpg").exists()
+        assert [p.name for p in quarantine.rglob("*.jpg")] == ["orphelin.jpg"]
+        assert db.photos.count_documents({}) == 4 and db.faces.count_documents({}) == 8
+        assert get_event_stats(db, 1) == {"photos": 3, "faces": 6} and get_event_stats(db, 2) == {"photos": 1, "faces": 2}
+        assert jobs.get(report.job_id) is report and jobs.running() is None
+
+
+if __name__ == "__main__":
+    test_analyse_puis_reparation_par_evenement()
+    test_upload_pendant_l_analyse_preserve()
+    test_tache_de_fond_globale_avec_quarantaine()
+    print('\n✅ Intégrité du stockage FONCTIONNELLE')
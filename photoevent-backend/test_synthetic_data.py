@@ -0,0 +1,68 @@
+"""Test du générateur de données synthétiques (SQLite + mongomock)"""
+import tempfile
+from pathlib import Path
+
+import mongomock
+import numpy as np
+from bson import ObjectId
+from sqlalchemy import create_engine, func, select
+
+from app.core.config import settings
+from app.db.models import Event, Order
+from scripts.generate_synthetic_data import SyntheticDataGenerator, face_count_distribution
+
+
+def test_distribution_des_visages():
+    counts = face_count_distribution(np.random.default_rng(0), 20000)
+    assert 0.13 < (counts == 0).mean() < 0.17
+    assert 2.0 < counts.mean() < 4.0
+    assert (counts > settings.MAX_FACES_PER_PHOTO).any()
+
+
+def test_generation_sqlite_mongomock():
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'synthetic.db'}"
+        mongo_db = mongomock.MongoClient()["synthetic"]
+        generator = SyntheticDataGenerator(
+            postgres_url=url,
+            mongo_db=mongo_db,
+            uploads_dir=Path(tmp) / "photos",
+            photos_per_event=200,
+            shares_per_event=3,
+            orders_per_event=2,
+            batch_size=64,
+            seed=1
+        )
+        stats = generator.run(2)
+
+        engine = create_engine(url)
+        with engine.connect() as conn:
+            event_ids = set(conn.execute(select(Event.id)).scalars())
+            assert len(event_ids) == 2
+            assert conn.execute(select(func.count(Order.id))).scalar() == 4
+            order_photos = conn.execute(select(Order.photo_ids)).scalars().first()
+        engine.dispose()
+
+        assert mongo_db.photos.count_documents({}) == stats.photos == 400
+        assert mongo_db.faces.count_documents({}) == stats.faces
+        assert len(list((Path(tmp) / "photos").iterdir())) == 400
+        assert mongo_db.photos.count_documents({"_id": {"$in": [ObjectId(p) for p in order_photos]}}) == len(order_photos)
+
+        for photo in mongo_db.photos.find({"event_id": {"$in": list(event_ids)}}).limit(50):
+            assert mongo_db.faces.count_documents({"photo_id": photo["_id"]}) == photo["faces_count"]
+            assert photo["faces_count"] <= settings.MAX_FACES_PER_PHOTO
+            assert (Path(tmp) / "photos" / photo["filename"]).stat().st_size == photo["file_size"]
+
+        face = mongo_db.faces.find_one()
+        assert len(face["embedding"]) == 512 and abs(np.linalg.norm(face["embedding"]) - 1) < 1e-4
+
+        # Un partage regroupe les photos de l'identité du visage choisi
+        share = mongo_db.shares.find_one()
+        shared_face = mongo_db.faces.find_one({"_id": ObjectId(share["face_id"])})
+        assert shared_face["photo_id"] in share["selected_photo_ids"]
+
+
+if __name__ == "__main__":
+    test_distribution_des_visages()
+    test_generation_sqlite_mongomock()
+    print('\n✅ Générateur de données synthétiques FONCTIONNEL')
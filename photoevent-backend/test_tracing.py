@@ -0,0 +1,71 @@
+"""Test du traçage par étapes (Server-Timing, traces les plus lentes)"""
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import tracing
+from app.core.tracing import Trace, TraceRecorder, span
+from app.middleware.tracing import tracing_middleware
+
+
+def test_server_timing_par_etape():
+    app = FastAPI()
+    app.middleware("http")(tracing_middleware)
+
+    @app.get("/search/{event_id}")
+    def search(event_id: int):
+        with span("decode"):
+            time.sleep(0.002)
+        for _ in range(2):
+            with span("scoring"):
+                time.sleep(0.001)
+        return {"event_id": event_id}
+
+    with TestClient(app) as client:
+        response = client.get("/search/7")
+
+    assert response.status_code == 200
+    header = response.headers["Server-Timing"]
+    assert "decode;dur=" in header and "scoring;dur=" in header and "total;dur=" in header
+    # Les deux étapes "scoring" sont cumulées en une entrée
+    assert header.count("scoring;dur=") == 1
+    trace_id = response.headers["X-Trace-Id"]
+    recent = tracing.trace_recorder.slowest(route="GET /search/{event_id}")
+    assert any(t["trace_id"] == trace_id and len(t["spans"]) == 3 for t in recent)
+
+
+def test_span_sans_trace_active():
+    # Hors requête (script, tâche de fond) span ne fait rien
+    with span("detection"):
+        pass
+    assert tracing.current_trace() is None
+
+
+def test_traces_lentes_ecrites_et_triees():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "traces.jsonl"
+        recorder = TraceRecorder(path, sample_rate=0.0, slow_ms=50, recent_max=10, max_file_bytes=1024 * 1024)
+        for name, duration in (("GET /a", 10), ("GET /b", 80), ("GET /a", 30)):
+            trace = Trace(name)
+            trace.finish(name, 200)
+            trace.duration_ms = duration
+            recorder.record(trace)
+
+        assert [t["duration_ms"] for t in recorder.slowest()] == [80, 30, 10]
+        assert [t["duration_ms"] for t in recorder.slowest(route="GET /a")] == [30, 10]
+        # Seule la trace lente (>= 50 ms) est écrite sur disque (échantillonnage à 0),
+        # par le thread d'écriture
+        assert recorder.flush()
+        lines = path.read_text().splitlines()
+        assert len(lines) == 1 and json.loads(lines[0])["route"] == "GET /b"
+
+
+if __name__ == "__main__":
+    test_server_timing_par_etape()
+    test_span_sans_trace_active()
+    test_traces_lentes_ecrites_et_triees()
+    print('\n✅ Traçage FONCTIONNEL')
@@ -0,0 +1,114 @@
+"""
+Benchmark de la taille d'entrée du détecteur (RetinaFace buffalo_l)
+Compare, sur un dossier de photos, le temps de détection et le nombre de
+visages gardés pour chaque taille fixe, la détection par tuiles et la
+politique configurée (escalade kiosque / ingestion)
+
+Usage (depuis photoevent-backend/) :
+    python tests/bench_detector_sizes.py --photos ../poc-test/photos-toutes
+    python tests/bench_detector_sizes.py --photos selfies/ --sizes 160 320 640
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings
+from app.services.face_recognition import get_face_service, select_detections
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def load_images(photos_dir: Path, limit: int) -> List[np.ndarray]:
+    images = []
+    for image_path in sorted(photos_dir.iterdir()):
+        if image_path.name.lower().endswith(IMAGE_EXTENSIONS):
+            img = cv2.imread(str(image_path))
+            if img is not None:
+                images.append(img)
+        if len(images) >= limit:
+            break
+    return images
+
+
+def run_policy(name: str, detect: Callable, images: List[np.ndarray]) -> Dict:
+    """Mesurer une politique de détection sur toutes les images"""
+    timings_ms = []
+    kept_faces = 0
+    raw_faces = 0
+
+    detect(images[0])  # chauffe de la session ONNX pour cette taille
+    for img in images:
+        start = time.perf_counter()
+        bboxes, _ = detect(img)
+        timings_ms.append((time.perf_counter() - start) * 1000)
+
+        kept, _ = select_detections(
+            bboxes[:, 4], bboxes[:, 0:4],
+            min_confidence=settings.FACE_DETECTION_CONFIDENCE,
+            min_size=settings.FACE_MIN_SIZE_PX,
+            max_faces=settings.MAX_FACES_PER_PHOTO
+        )
+        raw_faces += int(bboxes.shape[0])
+        kept_faces += len(kept)
+
+    return {
+        "policy": name,
+        "images": len(images),
+        "mean_ms": round(statistics.mean(timings_ms), 2),
+        "p95_ms": round(float(np.percentile(timings_ms, 95)), 2),
+        "faces_detected": raw_faces,
+        "faces_kept": kept_faces
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark taille d'entrée du détecteur")
+    parser.add_argument("--photos", type=Path, default=Path("../poc-test/photos-toutes"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[320, 480, 640, 800, 1024, 1280])
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--output", type=Path, default=None, help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    images = load_images(args.photos, args.limit)
+    if not images:
+        print(f"❌ Aucune image dans {args.photos}")
+        sys.exit(1)
+
+    face_service = get_face_service()
+    if not face_service.use_insightface:
+        print("❌ Benchmark réservé à InsightFace (taille d'entrée non réglable avec DeepFace)")
+        sys.exit(1)
+    detector = face_service.model.det_model
+
+    policies = [
+        (f"fixed_{size}", lambda img, s=size: detector.detect(img, input_size=(s, s), max_num=0, metric='default'))
+        for size in args.sizes
+    ]
+    policies.append((f"tiled_{settings.FACE_INGEST_TILE_SIZE}", lambda img: face_service._detect_tiled(img, settings.FACE_INGEST_DET_SIZE)))
+    policies.append(("configured_query", lambda img: face_service._detect(img, "query")))
+    policies.append(("configured_ingest", lambda img: face_service._detect(img, "ingest")))
+
+    print(f"\n🚀 Benchmark détecteur sur {len(images)} images\n")
+    results = []
+    for name, detect in policies:
+        result = run_policy(name, detect, images)
+        results.append(result)
+        print(f"  {name:20s} | moy {result['mean_ms']:8.2f} ms | p95 {result['p95_ms']:8.2f} ms"
+              f" | visages {result['faces_detected']:4d} (gardés {result['faces_kept']:4d})")
+
+    if args.output:
+        args.output.write_text(json.dumps({"photos": str(args.photos), "results": results}, indent=2))
+        print(f"\n✅ Résultats sauvegardés dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+Historique des résultats de benchmark et détection de régressions
+
+Les rapports JSON de tests/bench_search.py ("search"),
+tests/bench_image_pipeline.py ("image_pipeline") et tests/load_test.py
+("http_load") sont archivés par commit git et par empreinte machine :
+
+    bench_history/<benchmark>/<empreinte>/<commit>_<horodatage>.json
+
+`compare` rapproche les exécutions d'un commit de référence et d'un commit
+candidat (même machine par défaut) métrique par métrique : latences (p50,
+p95, p99...), débits et mémoire. Une régression est signalée quand :
+- la moyenne se dégrade de plus de --tolerance (5 % par défaut), et
+- avec au moins deux exécutions de chaque côté, un test de permutation
+  unilatéral sur les moyennes la juge significative (p < --alpha) ;
+  enregistrer 4 à 5 exécutions par commit (à 3 contre 3, p ne descend pas
+  sous 0.05) pour que le bruit de mesure ne déclenche rien
+
+Code de sortie 1 en cas de régression (utilisable comme gate en CI).
+
+Usage (depuis photoevent-backend/) :
+    python tests/bench_search.py --sizes 10000 --output search.json
+    python tests/bench_history.py record search.json
+    python tests/bench_history.py list --benchmark search
+    python tests/bench_history.py compare --benchmark search --baseline main
+    python tests/bench_history.py compare --benchmark http_load --baseline a1b2c3d --candidate HEAD --tolerance 0.1
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_STORE = Path("bench_history")
+BENCHMARKS = ("search", "image_pipeline", "http_load")
+LOWER_IS_BETTER = "lower"
+HIGHER_IS_BETTER = "higher"
+# Au-delà, le test de permutation est estimé par tirage aléatoire
+EXACT_PERMUTATIONS_MAX = 20_000
+RANDOM_PERMUTATIONS = 10_000
+
+
+@dataclass
+class MetricChange:
+    name: str
+    direction: str
+    baseline: List[float]
+    candidate: List[float]
+    relative_change: float  # > 0 : dégradation
+    p_value: Optional[float]
+    regression: bool
+    improvement: bool
+
+
+# ============================================================================
+# EXTRACTION DES MÉTRIQUES
+# ============================================================================
+
+def benchmark_name(report: Dict) -> str:
+    name = report.get("benchmark")
+    if name:
+        return name
+    # Rapports de load_test.py antérieurs au champ "benchmark"
+    if "scenarios" in report and "overall" in report:
+        return "http_load"
+    raise ValueError("Type de benchmark inconnu (champ 'benchmark' absent)")
+
+
+def _put(metrics: Dict, case: str, values: Dict, names: Tuple[str, ...], direction: str) -> None:
+    for name in names:
+        value = values.get(name)
+        if isinstance(value, (int, float)):
+            metrics[f"{case}:{name}"] = (float(value), direction)
+
+
+def extract_metrics(report: Dict) -> Dict[str, Tuple[float, str]]:
+    """{"cas:métrique": (valeur, sens)} pour les trois formats de rapport"""
+    metrics: Dict[str, Tuple[float, str]] = {}
+    benchmark = benchmark_name(report)
+
+    if benchmark == "search":
+        for result in report["results"]:
+            if result.get("skipped"):
+                continue
+            _put(metrics, result["name"], result, ("p50_ms", "p95_ms", "p99_ms", "mean_ms", "peak_alloc_mb"), LOWER_IS_BETTER)
+            _put(metrics, result["name"], result, ("qps",), HIGHER_IS_BETTER)
+
+    elif benchmark == "image_pipeline":
+        for run in report["results"]:
+            case = f"processes={run['processes']}"
+            _put(metrics, case, run, ("images_per_sec",), HIGHER_IS_BETTER)
+            _put(metrics, case, run, ("peak_rss_mb_per_process",), LOWER_IS_BETTER)
+            for stage, stats in run["stages"].items():
+                _put(metrics, f"{case}/{stage}", stats, ("mean_ms", "p95_ms"), LOWER_IS_BETTER)
+
+    elif benchmark == "http_load":
+        wall = report["overall"].get("wall_seconds") or 0
+        for scenario, stats in report["scenarios"].items():
+            if not stats.get("count"):
+                continue
+            _put(metrics, scenario, stats, ("p50_ms", "p90_ms", "p95_ms", "p99_ms", "p99_9_ms"), LOWER_IS_BETTER)
+            if wall:
+                metrics[f"{scenario}:throughput_per_sec"] = (stats["count"] / wall, HIGHER_IS_BETTER)
+            errors = sum(n for code, n in stats.get("status_codes", {}).items() if not str(code).startswith("2"))
+            metrics[f"{scenario}:error_rate"] = (errors / stats["count"], LOWER_IS_BETTER)
+        overall = report["overall"]
+        if overall.get("sent"):
+            metrics["overall:dropped_rate"] = (overall.get("dropped_client_saturated", 0) / overall["sent"], LOWER_IS_BETTER)
+
+    else:
+        raise ValueError(f"Benchmark non pris en charge: {benchmark}")
+    return metrics
+
+
+# ============================================================================
+# COMMIT, MACHINE ET STOCKAGE
+# ============================================================================
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        result = subprocess.run(["git", *args], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def resolve_commit(ref: str = "HEAD") -> str:
+    """SHA complet d'une référence git (ou la valeur telle quelle hors dépôt)"""
+    return _git("rev-parse", "--verify", f"{ref}^{{commit}}") or ref
+
+
+def working_tree_dirty() -> bool:
+    return bool(_git("status", "--porcelain", "--untracked-files=no"))
+
+
+def machine_info() -> Dict:
+    memory_gb = None
+    if hasattr(os, "sysconf"):
+        try:
+            memory_gb = round(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 ** 3)
+        except (ValueError, OSError):
+            pass
+    return {
+        "system": platform.system(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "memory_gb": memory_gb,
+        "python": platform.python_version()
+    }
+
+
+def machine_fingerprint(info: Optional[Dict] = None) -> str:
+    """Empreinte courte : deux machines différentes ne se comparent pas"""
+    info = info or machine_info()
+    return hashlib.sha1(json.dumps(info, sort_keys=True).encode()).hexdigest()[:12]
+
+
+class ResultStore:
+    def __init__(self, root: Path = DEFAULT_STORE):
+        self.root = Path(root)
+
+    def record(self, report: Dict, commit: Optional[str] = None, machine: Optional[Dict] = None) -> Path:
+        benchmark = benchmark_name(report)
+        machine = machine or machine_info()
+        fingerprint = machine_fingerprint(machine)
+        head = resolve_commit()
+        commit = commit or head
+        recorded_at = datetime.now()
+        entry = {
+            "benchmark": benchmark,
+            "commit": commit,
+            "dirty": commit == head and working_tree_dirty(),
+            "fingerprint": fingerprint,
+            "machine": machine,
+            "recorded_at": recorded_at.isoformat(),
+            "report": report
+        }
+        directory = self.root / benchmark / fingerprint
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{commit[:12]}_{recorded_at:%Y%m%dT%H%M%S%f}.json"
+        path.write_text(json.dumps(entry, indent=2))
+        return path
+
+    def entries(self, benchmark: str, fingerprint: Optional[str] = None) -> List[Dict]:
+        base = self.root / benchmark
+        pattern = f"{fingerprint}/*.json" if fingerprint else "*/*.json"
+        entries = [json.loads(path.read_text()) for path in sorted(base.glob(pattern))] if base.exists() else []
+        return sorted(entries, key=lambda e: e["recorded_at"])
+
+    def runs_for(self, benchmark: str, commit: str, fingerprint: Optional[str] = None) -> List[Dict]:
+        return [
+            e for e in self.entries(benchmark, fingerprint)
+            if e["commit"] == commit or e["commit"].startswith(commit)
+        ]
+
+
+# ============================================================================
+# COMPARAISON
+# ============================================================================
+
+def _mean(values: List[float]) -> float:
+    return sum(values) / len(values)
+
+
+def permutation_p_value(baseline: List[float], candidate: List[float], seed: int = 0) -> float:
+    """
+    p-value unilatérale (dans le sens de l'écart observé) de la différence
+    des moyennes, par test de permutation
+    """
+    pooled = baseline + candidate
+    n = len(baseline)
+    observed = _mean(candidate) - _mean(baseline)
+    sign = 1 if observed >= 0 else -1
+    total = sum(pooled)
+
+    def extreme(indices) -> bool:
+        base_sum = sum(pooled[i] for i in indices)
+        return sign * ((total - base_sum) / len(candidate) - base_sum / n) >= sign * observed - 1e-12
+
+    combinations = 1
+    for k in range(n):
+        combinations = combinations * (len(pooled) - k) // (k + 1)
+    if combinations <= EXACT_PERMUTATIONS_MAX:
+        hits = sum(extreme(c) for c in itertools.combinations(range(len(pooled)), n))
+        return hits / combinations
+
+    rng = random.Random(seed)
+    indices = list(range(len(pooled)))
+    hits = sum(extreme(rng.sample(indices, n)) for _ in range(RANDOM_PERMUTATIONS))
+    return (hits + 1) / (RANDOM_PERMUTATIONS + 1)
+
+
+def compare_runs(
+    baseline_runs: List[Dict],
+    candidate_runs: List[Dict],
+    tolerance: float = 0.05,
+    alpha: float = 0.05
+) -> List[MetricChange]:
+    def collect(runs: List[Dict]) -> Dict[str, Tuple[List[float], str]]:
+        samples: Dict[str, Tuple[List[float], str]] = {}
+        for run in runs:
+            for name, (value, direction) in extract_metrics(run["report"]).items():
+                samples.setdefault(name, ([], direction))[0].append(value)
+        return samples
+
+    baseline, candidate = collect(baseline_runs), collect(candidate_runs)
+    changes = []
+    for name in sorted(baseline.keys() & candidate.keys()):
+        base_values, direction = baseline[name]
+        cand_values = candidate[name][0]
+        base_mean, cand_mean = _mean(base_values), _mean(cand_values)
+        if base_mean == 0:
+            relative = 0.0 if cand_mean == 0 else float("inf")
+        else:
+            relative = (cand_mean - base_mean) / abs(base_mean)
+        if direction == HIGHER_IS_BETTER:
+            relative = -relative
+
+        p_value = None
+        significant = True
+        if len(base_values) >= 2 and len(cand_values) >= 2:
+            p_value = permutation_p_value(base_values, cand_values)
+            significant = p_value < alpha
+        changes.append(MetricChange(
+            name=name,
+            direction=direction,
+            baseline=base_values,
+            candidate=cand_values,
+            relative_change=relative,
+            p_value=p_value,
+            regression=significant and relative > tolerance,
+            improvement=significant and relative < -tolerance
+        ))
+    return changes
+
+
+def print_changes(changes: List[MetricChange], show_all: bool = False) -> None:
+    print(f"\n{'métrique':70s} {'référence':>12s} {'candidat':>12s} {'écart':>8s} {'p':>7s}")
+    for change in changes:
+        if not (show_all or change.regression or change.improvement):
+            continue
+        marker = "❌" if change.regression else "✅" if change.improvement else "  "
+        # Écart affiché dans le sens "+ = pire"
+        p_value = f"{change.p_value:.3f}" if change.p_value is not None else "-"
+        print(f"{marker} {change.name:67s} {_mean(change.baseline):12.3f} {_mean(change.candidate):12.3f}"
+              f" {change.relative_change * 100:+7.1f}% {p_value:>7s}")
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def cmd_record(args) -> int:
+    store = ResultStore(args.store)
+    for report_path in args.reports:
+        report = json.loads(Path(report_path).read_text())
+        path = store.record(report, commit=resolve_commit(args.commit) if args.commit else None)
+        print(f"✅ {report_path} -> {path}")
+    return 0
+
+
+def cmd_list(args) -> int:
+    store = ResultStore(args.store)
+    fingerprint = None if args.any_machine else machine_fingerprint()
+    for benchmark in [args.benchmark] if args.benchmark else BENCHMARKS:
+        entries = store.entries(benchmark, fingerprint)
+        if not entries:
+            continue
+        print(f"\n📊 {benchmark}")
+        by_commit: Dict[str, List[Dict]] = {}
+        for entry in entries:
+            by_commit.setdefault(entry["commit"], []).append(entry)
+        for commit, runs in by_commit.items():
+            dirty = " (modifié)" if any(r.get("dirty") for r in runs) else ""
+            print(f"  {commit[:12]}{dirty} | {len(runs)} exécution(s) | machine {runs[0]['fingerprint']}"
+                  f" | dernière {runs[-1]['recorded_at']}")
+    return 0
+
+
+def cmd_compare(args) -> int:
+    store = ResultStore(args.store)
+    fingerprint = None if args.any_machine else machine_fingerprint()
+    baseline_commit, candidate_commit = resolve_commit(args.baseline), resolve_commit(args.candidate)
+    baseline_runs = store.runs_for(args.benchmark, baseline_commit, fingerprint)
+    candidate_runs = store.runs_for(args.benchmark, candidate_commit, fingerprint)
+    for label, commit, runs in (("référence", baseline_commit, baseline_runs), ("candidat", candidate_commit, candidate_runs)):
+        if not runs:
+            print(f"❌ Aucun résultat {args.benchmark} pour le commit {label} {commit[:12]}"
+                  f"{'' if args.any_machine else ' sur cette machine (--any-machine pour ignorer)'}")
+            return 2
+
+    changes = compare_runs(baseline_runs, candidate_runs, args.tolerance, args.alpha)
+    print(f"\n🔬 {args.benchmark} : {baseline_commit[:12]} ({len(baseline_runs)} exéc.)"
+          f" -> {candidate_commit[:12]} ({len(candidate_runs)} exéc.), tolérance {args.tolerance:.0%}, alpha {args.alpha}")
+    if min(len(baseline_runs), len(candidate_runs)) < 2:
+        print("⚠️  Une seule exécution d'un côté : seuil de tolérance seul, sans test de significativité")
+    print_changes(changes, args.all)
+
+    regressions = [c for c in changes if c.regression]
+    improvements = [c for c in changes if c.improvement]
+    print(f"\n{len(changes)} métriques comparées, {len(regressions)} régression(s), {len(improvements)} amélioration(s)")
+    if regressions:
+        print("❌ Régression de performance détectée")
+        return 1
+    print("✅ Aucune régression significative")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Historique des benchmarks et détection de régressions")
+    parser.add_argument("--store", type=Path, default=DEFAULT_STORE, help="Dossier de l'historique")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="Archiver des rapports JSON de benchmark")
+    record.add_argument("reports", nargs="+", type=Path)
+    record.add_argument("--commit", default=None, help="Référence git (défaut: HEAD)")
+    record.set_defaults(func=cmd_record)
+
+    listing = commands.add_parser("list", help="Commits et exécutions archivés")
+    listing.add_argument("--benchmark", choices=BENCHMARKS, default=None)
+    listing.add_argument("--any-machine", action="store_true")
+    listing.set_defaults(func=cmd_list)
+
+    compare = commands.add_parser("compare", help="Comparer un commit à une référence (code 1 si régression)")
+    compare.add_argument("--benchmark", choices=BENCHMARKS, required=True)
+    compare.add_argument("--baseline", required=True, help="Commit / branche de référence")
+    compare.add_argument("--candidate", default="HEAD")
+    compare.add_argument("--tolerance", type=float, default=0.05, help="Dégradation relative tolérée")
+    compare.add_argument("--alpha", type=float, default=0.05, help="Seuil de significativité")
+    compare.add_argument("--any-machine", action="store_true", help="Comparer entre machines différentes")
+    compare.add_argument("--all", action="store_true", help="Afficher toutes les métriques")
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Benchmark du pipeline image (compression upload, miniature, base64, taille cible)
+sur un dossier de vraies photos d'événement
+
+Étapes mesurées pour chaque photo :
+- read             : lecture du fichier
+- compress_image   : compression de l'upload (photos.compress_image)
+- thumbnail        : miniature de la route /photos/{id}/thumbnail (photos.make_thumbnail)
+- compress_base64  : ImageCompressor.compress_base64 (décodage + réduction + base64)
+- compress_to_size : ImageCompressor._compress_to_size (qualité décroissante jusqu'à la cible)
+
+Le même travail est rejoué avec 1..N processus pour montrer où le débit
+cesse de croître (efficacité = débit / (processus x débit à 1 processus)).
+
+Usage (depuis photoevent-backend/) :
+    python tests/bench_image_pipeline.py --photos ../poc-test/photos-toutes
+    python tests/bench_image_pipeline.py --photos /data/event42 --processes 1,2,4,8 --rounds 3 --output pipeline.json
+"""
+import argparse
+import base64
+import io
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+try:
+    import resource
+except ImportError:  # Windows : pas de mesure du RSS max
+    resource = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.api.photos import compress_image, make_thumbnail
+from app.services.image_compressor import ImageCompressor
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+STAGES = ("read", "compress_image", "thumbnail", "compress_base64", "compress_to_size")
+TARGET_SIZE_KB = 150
+# En dessous, le processus supplémentaire n'apporte presque plus de débit
+SCALING_EFFICIENCY_FLOOR = 0.7
+
+
+def list_photos(photos_dir: Path, limit: int) -> List[str]:
+    paths = [
+        str(p) for p in sorted(photos_dir.iterdir())
+        if p.name.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+    return paths[:limit] if limit else paths
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss : Ko sous Linux, octets sous macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+def process_photo(path: str) -> Dict:
+    """Pipeline complet sur une photo : durée (ms) et octets par étape"""
+    timings = {}
+    sizes = {}
+
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        content = f.read()
+    timings["read"] = time.perf_counter() - start
+    sizes["read"] = len(content)
+
+    start = time.perf_counter()
+    sizes["compress_image"] = len(compress_image(content))
+    timings["compress_image"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sizes["thumbnail"] = len(make_thumbnail(content))
+    timings["thumbnail"] = time.perf_counter() - start
+
+    encoded = base64.b64encode(content).decode()
+    start = time.perf_counter()
+    compressed_b64, _ = ImageCompressor.compress_base64(encoded)
+    timings["compress_base64"] = time.perf_counter() - start
+    sizes["compress_base64"] = len(compressed_b64)
+
+    # Même préparation que compress_base64 avec target_size_kb (RGB, 800 px max)
+    image = Image.open(io.BytesIO(content)).convert("RGB")
+    image.thumbnail((800, 800), Image.Resampling.LANCZOS)
+    start = time.perf_counter()
+    sizes["compress_to_size"] = len(ImageCompressor._compress_to_size(image, TARGET_SIZE_KB))
+    timings["compress_to_size"] = time.perf_counter() - start
+
+    return {
+        "timings_ms": {stage: seconds * 1000 for stage, seconds in timings.items()},
+        "bytes_in": len(content),
+        "bytes_out": sizes,
+        "pid": os.getpid(),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def run_with_processes(paths: List[str], processes: int, rounds: int) -> Dict:
+    tasks = paths * rounds
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes) as pool:
+        # Chauffe : imports et premier décodage hors mesure
+        pool.map(process_photo, paths[:processes])
+        start = time.perf_counter()
+        results = list(pool.imap_unordered(process_photo, tasks, chunksize=1))
+        wall = time.perf_counter() - start
+
+    stage_stats = {}
+    for stage in STAGES:
+        values = [r["timings_ms"][stage] for r in results]
+        stage_stats[stage] = {
+            "mean_ms": round(statistics.mean(values), 3),
+            "p95_ms": round(float(np.percentile(values, 95)), 3),
+            "bytes_out_mean": int(statistics.mean(r["bytes_out"][stage] for r in results))
+        }
+
+    images_per_sec = len(results) / wall
+    return {
+        "processes": processes,
+        "images": len(results),
+        "wall_seconds": round(wall, 3),
+        "images_per_sec": round(images_per_sec, 2),
+        "images_per_sec_per_process": round(images_per_sec / processes, 2),
+        "bytes_in_total": sum(r["bytes_in"] for r in results),
+        "peak_rss_mb_per_process": round(max(r["peak_rss_mb"] for r in results), 1) if resource else None,
+        "stages": stage_stats
+    }
+
+
+def default_process_counts() -> str:
+    cpus = os.cpu_count() or 1
+    counts = []
+    n = 1
+    while n < cpus:
+        counts.append(n)
+        n *= 2
+    counts.append(cpus)
+    return ",".join(str(c) for c in counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du pipeline image")
+    parser.add_argument("--photos", type=Path, default=Path("../poc-test/photos-toutes"))
+    parser.add_argument("--limit", type=int, default=0, help="Nombre max de photos (0 = toutes)")
+    parser.add_argument("--processes", default=default_process_counts(), help="Liste CSV, ex: 1,2,4")
+    parser.add_argument("--rounds", type=int, default=1, help="Passages sur le corpus par mesure")
+    parser.add_argument("--output", type=Path, default=None, help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    paths = list_photos(args.photos, args.limit)
+    if not paths:
+        print(f"❌ Aucune photo dans {args.photos}")
+        sys.exit(1)
+    counts = [int(c) for c in args.processes.split(",") if c]
+    print(f"\n🚀 {len(paths)} photos ({sum(os.path.getsize(p) for p in paths) / (1024 * 1024):.1f} Mo)"
+          f", {args.rounds} passage(s), processus : {counts} ({os.cpu_count()} CPU)")
+
+    runs = []
+    baseline = None
+    for processes in counts:
+        run = run_with_processes(paths, processes, args.rounds)
+        baseline = baseline or run["images_per_sec"] / run["processes"]
+        run["scaling_efficiency"] = round(run["images_per_sec"] / (processes * baseline), 3)
+        runs.append(run)
+        print(f"  {processes:3d} proc | {run['images_per_sec']:8.2f} img/s | {run['images_per_sec_per_process']:7.2f} img/s/proc"
+              f" | efficacité {run['scaling_efficiency']:.2f} | RSS max {run['peak_rss_mb_per_process']} Mo/proc")
+
+    print("\n⏱️  Étapes (1er palier de processus)")
+    for stage, stats in runs[0]["stages"].items():
+        print(f"  {stage:18s} | moy {stats['mean_ms']:8.2f} ms | p95 {stats['p95_ms']:8.2f} ms"
+              f" | sortie moy {stats['bytes_out_mean'] / 1024:8.1f} Ko")
+
+    saturated = next((r["processes"] for r in runs if r["scaling_efficiency"] < SCALING_EFFICIENCY_FLOOR), None)
+    if saturated:
+        print(f"\n⚠️  Le débit cesse de croître linéairement à partir de {saturated} processus")
+
+    report = {
+        "benchmark": "image_pipeline",
+        "created_at": datetime.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "pillow": Image.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "params": {
+            "photos": str(args.photos),
+            "images": len(paths),
+            "rounds": args.rounds,
+            "target_size_kb": TARGET_SIZE_KB
+        },
+        "scaling_saturates_at": saturated,
+        "results": runs
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\n✅ Résultats sauvegardés dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark de l'index mémoire compressé (float32 / float16 / int8)
+Mesure, sur des embeddings synthétiques, la mémoire par million de visages,
+la latence de recherche et le rappel au seuil par défaut par rapport à la
+recherche exacte float32
+
+Usage (depuis photoevent-backend/) :
+    python tests/bench_index_quantization.py --faces 100000
+    python tests/bench_index_quantization.py --faces 1000000 --output quantization.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.face_index import EventFaceIndex, INDEX_DTYPES, quantize_embeddings
+from tests.synthetic import clustered_embeddings, query_embeddings, synthetic_ids
+
+
+def build_index(embeddings: np.ndarray, dtype: str) -> EventFaceIndex:
+    """Index synthétique ; la pleine précision est relue depuis la matrice float32"""
+    n_faces = len(embeddings)
+    codes, scales = quantize_embeddings(embeddings, dtype)
+    return EventFaceIndex(
+        event_id=0,
+        codes=codes,
+        scales=scales,
+        photo_ids=synthetic_ids(n_faces),
+        face_ids=synthetic_ids(n_faces),
+        bboxes=np.zeros((n_faces, 4), dtype=np.int32),
+        confidences=np.ones(n_faces, dtype=np.float32),
+        face_ordinals=np.zeros(n_faces, dtype=np.int32),
+        exact_loader=lambda positions: embeddings[positions]
+    )
+
+
+def run(index: EventFaceIndex, queries: np.ndarray, threshold: float, reference: List[set]) -> Dict:
+    timings_ms = []
+    found_total = 0
+    recalled = 0
+    expected_total = 0
+
+    for query, expected in zip(queries, reference):
+        start = time.perf_counter()
+        matches = index.search(query, threshold)
+        timings_ms.append((time.perf_counter() - start) * 1000)
+
+        found = {m['photo_id'] for m in matches}
+        found_total += len(found)
+        recalled += len(found & expected)
+        expected_total += len(expected)
+
+    return {
+        "dtype": index.dtype,
+        "bytes_per_face": round(index.nbytes / len(index), 1),
+        "mb_per_million_faces": round(index.nbytes / len(index) * 1_000_000 / (1024 * 1024), 1),
+        "mean_ms": round(statistics.mean(timings_ms), 3),
+        "p95_ms": round(float(np.percentile(timings_ms, 95)), 3),
+        "matches": found_total,
+        "recall": round(recalled / expected_total, 5) if expected_total else 1.0,
+        "false_matches": found_total - recalled
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark index compressé")
+    parser.add_argument("--faces", type=int, default=100_000)
+    parser.add_argument("--identities", type=int, default=None, help="Défaut: faces / 20")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--threshold", type=float, default=0.55)
+    parser.add_argument("--output", type=Path, default=None, help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    identities = args.identities or max(1, args.faces // 20)
+    print(f"\n🚀 Génération de {args.faces} visages ({identities} identités)...")
+    embeddings, _, centers = clustered_embeddings(args.faces, identities)
+    queries, _ = query_embeddings(centers, args.queries)
+
+    # Référence : recherche exacte float32
+    reference = []
+    for query in queries:
+        positions = np.flatnonzero(embeddings @ query >= args.threshold)
+        reference.append({f"{pos:024x}" for pos in positions})
+
+    results = []
+    for dtype in INDEX_DTYPES:
+        index = build_index(embeddings, dtype)
+        result = run(index, queries, args.threshold, reference)
+        results.append(result)
+        print(f"  {dtype:8s} | {result['bytes_per_face']:7.1f} o/visage | {result['mb_per_million_faces']:7.1f} Mo/M"
+              f" | moy {result['mean_ms']:8.3f} ms | p95 {result['p95_ms']:8.3f} ms | rappel {result['recall']:.4f}")
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "faces": args.faces,
+            "identities": identities,
+            "threshold": args.threshold,
+            "results": results
+        }, indent=2))
+        print(f"\n✅ Résultats sauvegardés dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Micro-benchmarks de la recherche et du scoring sur des événements synthétiques
+Aucun modèle chargé : InsightFace / DeepFace ne sont pas nécessaires
+
+Mesure, pour chaque taille d'événement, backend de recherche et seuil :
+latences (p50 / p95 / p99), débit séquentiel et pic d'allocation mémoire.
+Backends :
+- legacy          : FaceRecognitionService.search_faces_in_event (boucle Python,
+                    embeddings en listes comme relus depuis MongoDB)
+- numpy_exact     : produit matriciel float32 brut (référence)
+- index_<dtype>   : EventFaceIndex (float32 / float16 / int8 + re-scoring)
+Plus les appels unitaires normalize_embedding et compare_faces.
+
+Usage (depuis photoevent-backend/) :
+    python tests/bench_search.py
+    python tests/bench_search.py --sizes 1000,10000 --thresholds 0.55 --output search.json
+    python tests/bench_search.py --sizes 1000000 --backends index_int8,index_float32
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.face_index import INDEX_DTYPES
+from app.services.face_recognition import FaceRecognitionService, normalize_embedding
+from tests.bench_index_quantization import build_index
+from tests.synthetic import clustered_embeddings, query_embeddings
+
+DEFAULT_SIZES = "1000,10000,100000,1000000"
+DEFAULT_THRESHOLDS = "0.45,0.55,0.65"
+BACKENDS = ("legacy", "numpy_exact") + tuple(f"index_{dtype}" for dtype in INDEX_DTYPES)
+
+# Au-delà, la boucle Python legacy prend plusieurs secondes par requête
+# (et les listes d'embeddings plusieurs Go) : backend ignoré
+LEGACY_MAX_FACES = 10_000
+
+# Requêtes rejouées sous tracemalloc pour le pic mémoire (tracemalloc ralentit)
+MEMORY_QUERIES = 3
+
+
+def scoring_service() -> FaceRecognitionService:
+    """Service sans modèle : seules les méthodes de scoring sont utilisées"""
+    service = FaceRecognitionService.__new__(FaceRecognitionService)
+    service.use_insightface = True
+    service.model = None
+    return service
+
+
+def latency_stats(timings_ms: List[float]) -> Dict:
+    return {
+        "mean_ms": round(statistics.mean(timings_ms), 4),
+        "p50_ms": round(float(np.percentile(timings_ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(timings_ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(timings_ms, 99)), 4),
+        "qps": round(len(timings_ms) / (sum(timings_ms) / 1000), 2) if sum(timings_ms) else None
+    }
+
+
+def measure(search: Callable, queries: np.ndarray, warmup: int = 2) -> Dict:
+    """Latences de `search(query)` puis pic d'allocation sur quelques requêtes"""
+    for query in queries[:warmup]:
+        search(query)
+
+    timings_ms = []
+    matches = 0
+    for query in queries:
+        start = time.perf_counter()
+        result = search(query)
+        timings_ms.append((time.perf_counter() - start) * 1000)
+        matches += len(result)
+
+    tracemalloc.start()
+    for query in queries[:MEMORY_QUERIES]:
+        search(query)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        **latency_stats(timings_ms),
+        "queries": len(queries),
+        "mean_matches": round(matches / len(queries), 2),
+        "peak_alloc_mb": round(peak / (1024 * 1024), 3)
+    }
+
+
+def legacy_event(embeddings: np.ndarray) -> List:
+    """Format attendu par search_faces_in_event : une photo par visage, embedding en liste"""
+    return [
+        (f"{i:024x}", [{"embedding": row.tolist(), "bbox": [0, 0, 0, 0], "confidence": 1.0}])
+        for i, row in enumerate(embeddings)
+    ]
+
+
+def bench_micro(service: FaceRecognitionService, embeddings: np.ndarray, calls: int) -> List[Dict]:
+    """Coût unitaire de normalize_embedding et compare_faces"""
+    rows = [embeddings[i % len(embeddings)] for i in range(calls)]
+    as_lists = [row.tolist() for row in rows[:min(calls, 1000)]]
+    cases = {
+        "normalize_embedding/list": lambda i: normalize_embedding(as_lists[i % len(as_lists)]),
+        "normalize_embedding/ndarray": lambda i: normalize_embedding(rows[i]),
+        "compare_faces/ndarray": lambda i: service.compare_faces(rows[i], rows[-1 - i]),
+        "compare_faces/list": lambda i: service.compare_faces(as_lists[i % len(as_lists)], rows[i]),
+    }
+    results = []
+    for name, call in cases.items():
+        timings_ms = []
+        for i in range(calls):
+            start = time.perf_counter()
+            call(i)
+            timings_ms.append((time.perf_counter() - start) * 1000)
+        stats = latency_stats(timings_ms)
+        results.append({"name": f"micro/{name}", "calls": calls, **stats})
+        print(f"  {name:28s} | p50 {stats['p50_ms'] * 1000:8.2f} µs | p99 {stats['p99_ms'] * 1000:8.2f} µs"
+              f" | {stats['qps']:>12,.0f} appels/s")
+    return results
+
+
+def bench_event(
+    service: FaceRecognitionService,
+    n_faces: int,
+    backends: List[str],
+    thresholds: List[float],
+    n_queries: int,
+    legacy_max_faces: int
+) -> List[Dict]:
+    identities = max(1, n_faces // 20)
+    print(f"\n🚀 Événement synthétique : {n_faces:,} visages ({identities:,} identités)")
+    embeddings, _, centers = clustered_embeddings(n_faces, identities)
+    queries, _ = query_embeddings(centers, n_queries)
+
+    results = []
+    for backend in backends:
+        if backend == "legacy" and n_faces > legacy_max_faces:
+            print(f"  {backend:14s} | ignoré au-delà de {legacy_max_faces:,} visages (--legacy-max-faces)")
+            results.append({"name": f"search/{backend}/faces={n_faces}", "backend": backend,
+                            "faces": n_faces, "skipped": True})
+            continue
+
+        if backend == "legacy":
+            event = legacy_event(embeddings)
+            index_mb = None
+            make_search = lambda t: (lambda q: service.search_faces_in_event(q, event, t))
+        elif backend == "numpy_exact":
+            index_mb = embeddings.nbytes / (1024 * 1024)
+            make_search = lambda t: (lambda q: np.flatnonzero(embeddings @ q >= t))
+        else:
+            index = build_index(embeddings, backend[len("index_"):])
+            index_mb = index.nbytes / (1024 * 1024)
+            make_search = lambda t, index=index: (lambda q: index.search(q, t))
+
+        for threshold in thresholds:
+            # Moins de requêtes pour la boucle Python (quelques secondes par requête à 10k)
+            backend_queries = queries[:max(5, n_queries // 10)] if backend == "legacy" else queries
+            stats = measure(make_search(threshold), backend_queries)
+            results.append({
+                "name": f"search/{backend}/faces={n_faces}/threshold={threshold}",
+                "backend": backend,
+                "faces": n_faces,
+                "threshold": threshold,
+                "index_mb": round(index_mb, 2) if index_mb is not None else None,
+                **stats
+            })
+            print(f"  {backend:14s} | seuil {threshold:.2f} | p50 {stats['p50_ms']:9.3f} ms"
+                  f" | p95 {stats['p95_ms']:9.3f} ms | p99 {stats['p99_ms']:9.3f} ms"
+                  f" | {stats['qps']:>9,.1f} req/s | pic {stats['peak_alloc_mb']:8.2f} Mo"
+                  f" | {stats['mean_matches']:.1f} matches")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks recherche / scoring")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Visages par événement (liste CSV)")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="Seuils (liste CSV)")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help=f"Parmi {', '.join(BACKENDS)}")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--micro-calls", type=int, default=10_000)
+    parser.add_argument("--legacy-max-faces", type=int, default=LEGACY_MAX_FACES)
+    parser.add_argument("--output", type=Path, default=None, help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    thresholds = [float(t) for t in args.thresholds.split(",") if t]
+    backends = [b for b in args.backends.split(",") if b]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"Backends inconnus : {', '.join(sorted(unknown))}")
+
+    service = scoring_service()
+
+    print("\n🔬 Appels unitaires")
+    micro_embeddings, _, _ = clustered_embeddings(1000, 50)
+    results = bench_micro(service, micro_embeddings, args.micro_calls)
+
+    for n_faces in sizes:
+        results.extend(bench_event(service, n_faces, backends, thresholds, args.queries, args.legacy_max_faces))
+
+    report = {
+        "benchmark": "search",
+        "created_at": datetime.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine()
+        },
+        "params": {
+            "sizes": sizes,
+            "thresholds": thresholds,
+            "backends": backends,
+            "queries": args.queries,
+            "dim": int(micro_embeddings.shape[1])
+        },
+        "results": results
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\n✅ Résultats sauvegardés dans {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
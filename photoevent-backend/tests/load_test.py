@@ -1,303 +1,438 @@
 """
-Tests de charge avec simulation de 100 utilisateurs
-Mesure les performances du système sous charge
+Test de charge en boucle ouverte (open-loop) pour Owen'Snap
+
+Les arrivées suivent un processus de Poisson au débit du profil choisi,
+indépendamment des réponses du serveur : un serveur lent ne ralentit pas le
+générateur (pas d'omission coordonnée). La latence est mesurée depuis l'heure
+d'arrivée PRÉVUE, elle inclut donc l'attente côté client si le générateur
+prend du retard.
+
+- un seul httpx.AsyncClient partagé (pool de connexions keep-alive)
+- profils : constant, ramp (montée linéaire puis palier), step (paliers), spike
+- scénarios pondérés : recherche kiosque, vignettes de galerie,
+  pages de partage, uploads en masse des photographes
+- histogrammes log-linéaires type HDR (erreur relative < 1 %) :
+  p50 / p90 / p95 / p99 / p99.9 par scénario
+
+Usage (depuis photoevent-backend/, API démarrée) :
+    python tests/load_test.py --event-id 1 --rate 20 --duration 60
+    python tests/load_test.py --event-id 1 --profile ramp --start-rate 1 --rate 50 --ramp 120 --duration 300
+    python tests/load_test.py --event-id 1 --mix kiosk_search=1 --selfies ../poc-test/photos-toutes
 """
+import argparse
 import asyncio
-import time
-import statistics
-from typing import List, Dict
-import httpx
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import base64
+import io
 import json
+import math
+import random
+import time
 from datetime import datetime
-import base64
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
 from PIL import Image
-import io
 
-class LoadTester:
-    """Test de charge pour Owen'Snap"""
-    
+API_PREFIX = "/api/v1"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+DEFAULT_MIX = "kiosk_search=0.4,gallery_thumbnails=0.4,share_view=0.15,bulk_upload=0.05"
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+
+class LatencyHistogram:
+    """
+    Histogramme log-linéaire de latences (microsecondes), à la HdrHistogram
+
+    Valeurs < 256 µs exactes, au-delà 128 sous-seaux par puissance de 2 :
+    erreur relative bornée (< 1 %) et mémoire constante quel que soit le
+    nombre de requêtes.
+    """
+
+    SUB_BUCKETS = 128
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    @classmethod
+    def _index(cls, value: int) -> int:
+        shift = max(0, value.bit_length() - 8)
+        if shift == 0:
+            return value
+        return 2 * cls.SUB_BUCKETS + (shift - 1) * cls.SUB_BUCKETS + ((value >> shift) - cls.SUB_BUCKETS)
+
+    @classmethod
+    def _upper_value(cls, index: int) -> int:
+        """Plus grande valeur du seau (valeur rapportée pour un percentile)"""
+        if index < 2 * cls.SUB_BUCKETS:
+            return index
+        shift = (index - 2 * cls.SUB_BUCKETS) // cls.SUB_BUCKETS + 1
+        mantissa = (index - 2 * cls.SUB_BUCKETS) % cls.SUB_BUCKETS + cls.SUB_BUCKETS
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, seconds: float) -> None:
+        value = max(0, int(seconds * 1_000_000))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum_us += value
+        self.max_us = max(self.max_us, value)
+
+    def percentile(self, percent: float) -> float:
+        """Latence (ms) sous laquelle se trouvent `percent` % des requêtes"""
+        if not self.total:
+            return 0.0
+        rank = max(1, math.ceil(self.total * percent / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._upper_value(index), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def to_dict(self) -> Dict:
+        if not self.total:
+            return {"count": 0}
+        return {
+            "count": self.total,
+            "mean_ms": round(self.sum_us / self.total / 1000, 3),
+            **{f"p{str(p).replace('.', '_')}_ms": round(self.percentile(p), 3) for p in PERCENTILES},
+            "max_ms": round(self.max_us / 1000, 3)
+        }
+
+
+class ArrivalProfile:
+    """Débit cible (requêtes/s) en fonction du temps écoulé"""
+
+    def __init__(self, kind: str, rate: float, start_rate: float = 1.0, ramp_seconds: float = 60.0,
+                 steps: int = 4, spike_at: float = 30.0, spike_seconds: float = 10.0, spike_factor: float = 5.0):
+        self.kind = kind
+        self.rate = rate
+        self.start_rate = start_rate
+        self.ramp_seconds = ramp_seconds
+        self.steps = steps
+        self.spike_at = spike_at
+        self.spike_seconds = spike_seconds
+        self.spike_factor = spike_factor
+
+    def rate_at(self, elapsed: float) -> float:
+        if self.kind == "ramp":
+            progress = min(1.0, elapsed / self.ramp_seconds) if self.ramp_seconds else 1.0
+            return self.start_rate + (self.rate - self.start_rate) * progress
+        if self.kind == "step":
+            # `steps` paliers égaux de start_rate à rate, chacun de ramp_seconds / steps
+            step = min(self.steps - 1, int(elapsed / (self.ramp_seconds / self.steps))) if self.ramp_seconds else self.steps - 1
+            return self.start_rate + (self.rate - self.start_rate) * step / max(1, self.steps - 1)
+        if self.kind == "spike":
+            in_spike = self.spike_at <= elapsed < self.spike_at + self.spike_seconds
+            return self.rate * self.spike_factor if in_spike else self.rate
+        return self.rate
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        if item:
+            name, weight = item.split("=")
+            weights[name.strip()] = float(weight)
+    return weights
+
+
+def encode_jpeg(image: Image.Image, max_dimension: int = 800) -> bytes:
+    image = image.convert("RGB")
+    image.thumbnail((max_dimension, max_dimension))
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def load_images(directory: Optional[Path], limit: int) -> List[bytes]:
+    """Photos réelles d'un dossier, sinon une image unie (aucun visage détecté)"""
+    images = []
+    if directory and directory.exists():
+        for path in sorted(directory.iterdir()):
+            if path.name.lower().endswith(IMAGE_EXTENSIONS):
+                images.append(encode_jpeg(Image.open(path)))
+            if len(images) >= limit:
+                break
+    return images or [encode_jpeg(Image.new('RGB', (300, 300), color='red'))]
+
+
+class OpenLoopLoadGenerator:
+    """Générateur de charge en boucle ouverte, scénarios pondérés"""
+
     def __init__(
-        self, 
-        base_url: str = "http://localhost:8000",
-        num_users: int = 100,
-        requests_per_user: int = 10
+        self,
+        base_url: str,
+        event_id: int,
+        profile: ArrivalProfile,
+        duration: float,
+        mix: Dict[str, float],
+        selfies: List[bytes],
+        uploads: List[bytes],
+        photo_ids: Optional[List[str]] = None,
+        share_codes: Optional[List[str]] = None,
+        gallery_page: int = 12,
+        upload_batch: int = 10,
+        threshold: float = 0.55,
+        max_connections: int = 100,
+        max_in_flight: int = 1000,
+        timeout: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        seed: Optional[int] = None
     ):
         self.base_url = base_url
-        self.num_users = num_users
-        self.requests_per_user = requests_per_user
-        self.results = {
-            "search_times": [],
-            "upload_times": [],
-            "errors": [],
-            "status_codes": {}
+        self.event_id = event_id
+        self.profile = profile
+        self.duration = duration
+        self.selfies_b64 = [base64.b64encode(img).decode() for img in selfies]
+        self.uploads = uploads
+        self.photo_ids = photo_ids or []
+        self.share_codes = share_codes or []
+        self.gallery_page = gallery_page
+        self.upload_batch = upload_batch
+        self.threshold = threshold
+        self.max_in_flight = max_in_flight
+        self.random = random.Random(seed)
+
+        self.scenarios: Dict[str, Callable] = {
+            "kiosk_search": self.kiosk_search,
+            "gallery_thumbnails": self.gallery_thumbnails,
+            "share_view": self.share_view,
+            "bulk_upload": self.bulk_upload,
         }
-    
-    @staticmethod
-    def create_test_image(size: int = 300) -> str:
-        """Créer une image de test en base64"""
-        image = Image.new('RGB', (size, size), color='red')
-        buffer = io.BytesIO()
-        image.save(buffer, format='JPEG', quality=80)
-        return base64.b64encode(buffer.getvalue()).decode()
-    
-    def test_search_endpoint(self, event_id: str, image_b64: str) -> Dict:
-        """Tester l'endpoint de recherche faciale"""
-        start_time = time.time()
-        
+        unknown = set(mix) - set(self.scenarios)
+        if unknown:
+            raise ValueError(f"Scénarios inconnus : {', '.join(sorted(unknown))}")
+        self.mix = {name: weight for name, weight in mix.items() if weight > 0}
+
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            transport=transport,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self.histograms: Dict[str, LatencyHistogram] = {name: LatencyHistogram() for name in self.mix}
+        self.status_codes: Dict[str, Dict[str, int]] = {name: {} for name in self.mix}
+        self.errors: List[Dict] = []
+        self.sent = 0
+        self.dropped = 0
+        self.max_lag_ms = 0.0
+        self._in_flight = 0
+
+    # Scénarios : chacun renvoie le code HTTP significatif de l'opération
+
+    async def kiosk_search(self) -> int:
+        response = await self.client.post(f"{API_PREFIX}/search/face", json={
+            "event_id": self.event_id,
+            "face_image": self.random.choice(self.selfies_b64),
+            "threshold": self.threshold
+        })
+        return response.status_code
+
+    async def gallery_thumbnails(self) -> int:
+        """Une page de galerie : les vignettes sont demandées en parallèle"""
+        if not self.photo_ids:
+            response = await self.client.get(f"{API_PREFIX}/photos/event/{self.event_id}")
+            return response.status_code
+        page = self.random.sample(self.photo_ids, min(self.gallery_page, len(self.photo_ids)))
+        responses = await asyncio.gather(*(
+            self.client.get(f"{API_PREFIX}/photos/{photo_id}/thumbnail") for photo_id in page
+        ))
+        return max(r.status_code for r in responses)
+
+    async def share_view(self) -> int:
+        if not self.share_codes:
+            response = await self.client.get(f"{API_PREFIX}/shares", params={"event_id": self.event_id})
+            return response.status_code
+        response = await self.client.get(f"{API_PREFIX}/shares/{self.random.choice(self.share_codes)}")
+        return response.status_code
+
+    async def bulk_upload(self) -> int:
+        batch = [self.random.choice(self.uploads) for _ in range(self.upload_batch)]
+        files = [("files", (f"load_{i}.jpg", content, "image/jpeg")) for i, content in enumerate(batch)]
+        response = await self.client.post(
+            f"{API_PREFIX}/photos/upload-fast", data={"event_id": str(self.event_id)}, files=files
+        )
+        return response.status_code
+
+    async def _run(self, name: str, scheduled: float) -> None:
+        self._in_flight += 1
         try:
-            with httpx.Client(timeout=30.0) as client:
-                response = client.post(
-                    f"{self.base_url}/api/search/face",
-                    json={
-                        "event_id": event_id,
-                        "face_image": image_b64
-                    }
-                )
-            
-            elapsed = time.time() - start_time
-            
-            return {
-                "status_code": response.status_code,
-                "elapsed_time": elapsed,
-                "success": response.status_code == 200,
-                "error": None
-            }
-        
+            status_code = await self.scenarios[name]()
+            status_key = str(status_code)
         except Exception as e:
-            elapsed = time.time() - start_time
-            return {
-                "status_code": 0,
-                "elapsed_time": elapsed,
-                "success": False,
-                "error": str(e)
-            }
-    
-    def test_upload_endpoint(self, event_id: str, image_b64: str) -> Dict:
-        """Tester l'endpoint d'upload de photos"""
-        start_time = time.time()
-        
+            status_key = type(e).__name__
+            if len(self.errors) < 20:
+                self.errors.append({"scenario": name, "error": str(e) or status_key})
+        finally:
+            self._in_flight -= 1
+        # Depuis l'heure prévue : inclut le retard du générateur
+        self.histograms[name].record(time.perf_counter() - scheduled)
+        codes = self.status_codes[name]
+        codes[status_key] = codes.get(status_key, 0) + 1
+
+    async def run(self) -> Dict:
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        tasks = set()
+        start = time.perf_counter()
+        next_arrival = start
+
         try:
-            with httpx.Client(timeout=30.0) as client:
-                response = client.post(
-                    f"{self.base_url}/api/photos",
-                    json={
-                        "event_id": event_id,
-                        "photo_base64": image_b64,
-                        "photographer_id": "test_user"
-                    }
-                )
-            
-            elapsed = time.time() - start_time
-            
-            return {
-                "status_code": response.status_code,
-                "elapsed_time": elapsed,
-                "success": response.status_code in [200, 201],
-                "error": None
-            }
-        
-        except Exception as e:
-            elapsed = time.time() - start_time
-            return {
-                "status_code": 0,
-                "elapsed_time": elapsed,
-                "success": False,
-                "error": str(e)
-            }
-    
-    async def run_user_simulation(self, user_id: int, event_id: str = "JK0LHAWK"):
-        """Simuler un utilisateur qui fait des requêtes"""
-        test_image = self.create_test_image()
-        
-        for request_num in range(self.requests_per_user):
-            # Alterner entre upload et search
-            if request_num % 2 == 0:
-                result = self.test_upload_endpoint(event_id, test_image)
-            else:
-                result = self.test_search_endpoint(event_id, test_image)
-            
-            # Enregistrer les résultats
-            if result["success"]:
-                if request_num % 2 == 0:
-                    self.results["upload_times"].append(result["elapsed_time"])
+            while True:
+                elapsed = next_arrival - start
+                if elapsed >= self.duration:
+                    break
+                now = time.perf_counter()
+                if next_arrival > now:
+                    await asyncio.sleep(next_arrival - now)
                 else:
-                    self.results["search_times"].append(result["elapsed_time"])
-            else:
-                self.results["errors"].append({
-                    "user_id": user_id,
-                    "error": result["error"]
-                })
-            
-            # Enregistrer le code de statut
-            status = result["status_code"]
-            self.results["status_codes"][status] = self.results["status_codes"].get(status, 0) + 1
-            
-            # Petit délai pour éviter de surcharger
-            await asyncio.sleep(0.1)
-    
-    def run_load_test(self) -> Dict:
-        """Exécuter le test de charge complet"""
-        print(f"\n🚀 Démarrage du test de charge")
-        print(f"   - {self.num_users} utilisateurs simulés")
-        print(f"   - {self.requests_per_user} requêtes par utilisateur")
-        print(f"   - Total: {self.num_users * self.requests_per_user} requêtes\n")
-        
-        start_time = time.time()
-        
-        # Utiliser ThreadPoolExecutor pour paralléliser
-        with ThreadPoolExecutor(max_workers=min(50, self.num_users)) as executor:
-            futures = [
-                executor.submit(
-                    self._run_user_sync,
-                    user_id
-                )
-                for user_id in range(self.num_users)
-            ]
-            
-            completed = 0
-            for future in as_completed(futures):
-                completed += 1
-                if completed % 10 == 0:
-                    print(f"✓ {completed}/{self.num_users} utilisateurs traités")
-                try:
-                    future.result()
-                except Exception as e:
-                    self.results["errors"].append({"error": str(e)})
-        
-        total_time = time.time() - start_time
-        
-        # Générer le rapport
-        return self.generate_report(total_time)
-    
-    def _run_user_sync(self, user_id: int):
-        """Wrapper synchrone pour la simulation utilisateur"""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            loop.run_until_complete(self.run_user_simulation(user_id))
+                    self.max_lag_ms = max(self.max_lag_ms, (now - next_arrival) * 1000)
+
+                if self._in_flight >= self.max_in_flight:
+                    # Client saturé : arrivée comptée comme perdue plutôt que de bloquer
+                    self.dropped += 1
+                else:
+                    name = self.random.choices(names, weights)[0]
+                    task = asyncio.create_task(self._run(name, next_arrival))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    self.sent += 1
+
+                rate = self.profile.rate_at(elapsed)
+                next_arrival += self.random.expovariate(rate) if rate > 0 else 0.1
+
+            if tasks:
+                await asyncio.gather(*tasks)
         finally:
-            loop.close()
-    
-    def generate_report(self, total_time: float) -> Dict:
-        """Générer le rapport des tests"""
-        search_times = self.results["search_times"]
-        upload_times = self.results["upload_times"]
-        
-        report = {
+            await self.client.aclose()
+
+        return self.report(time.perf_counter() - start)
+
+    def report(self, total_seconds: float) -> Dict:
+        completed = sum(h.total for h in self.histograms.values())
+        return {
+            "benchmark": "http_load",
             "timestamp": datetime.now().isoformat(),
-            "test_configuration": {
-                "num_users": self.num_users,
-                "requests_per_user": self.requests_per_user,
-                "total_requests": self.num_users * self.requests_per_user
+            "configuration": {
+                "base_url": self.base_url,
+                "event_id": self.event_id,
+                "profile": vars(self.profile),
+                "duration_seconds": self.duration,
+                "mix": self.mix
             },
-            "overall_stats": {
-                "total_time_seconds": round(total_time, 2),
-                "requests_per_second": round(
-                    (self.num_users * self.requests_per_user) / total_time, 2
-                ),
-                "total_errors": len(self.results["errors"]),
-                "error_rate_percent": round(
-                    (len(self.results["errors"]) / (self.num_users * self.requests_per_user)) * 100, 2
-                )
+            "overall": {
+                "wall_seconds": round(total_seconds, 2),
+                "sent": self.sent,
+                "completed": completed,
+                "dropped_client_saturated": self.dropped,
+                "achieved_rate_per_second": round(self.sent / self.duration, 2) if self.duration else None,
+                "max_generator_lag_ms": round(self.max_lag_ms, 2)
             },
-            "status_codes": self.results["status_codes"],
-            "search_endpoint": self._calculate_stats(search_times, "Search API"),
-            "upload_endpoint": self._calculate_stats(upload_times, "Upload API"),
-            "errors": self.results["errors"][:10]  # Montrer les 10 premiers erreurs
-        }
-        
-        self._print_report(report)
-        return report
-    
-    @staticmethod
-    def _calculate_stats(times: List[float], endpoint_name: str) -> Dict:
-        """Calculer les statistiques pour un endpoint"""
-        if not times:
-            return {
-                "endpoint": endpoint_name,
-                "requests": 0,
-                "message": "Aucune requête réussie"
-            }
-        
-        times_ms = [t * 1000 for t in times]
-        
-        return {
-            "endpoint": endpoint_name,
-            "requests": len(times),
-            "min_ms": round(min(times_ms), 2),
-            "max_ms": round(max(times_ms), 2),
-            "avg_ms": round(statistics.mean(times_ms), 2),
-            "median_ms": round(statistics.median(times_ms), 2),
-            "p95_ms": round(statistics.quantiles(times_ms, n=20)[18] if len(times_ms) > 20 else max(times_ms), 2),
-            "p99_ms": round(statistics.quantiles(times_ms, n=100)[98] if len(times_ms) > 100 else max(times_ms), 2),
-            "std_dev_ms": round(statistics.stdev(times_ms), 2) if len(times_ms) > 1 else 0
+            "scenarios": {
+                name: {**histogram.to_dict(), "status_codes": self.status_codes[name]}
+                for name, histogram in self.histograms.items()
+            },
+            "errors": self.errors
         }
-    
-    def _print_report(self, report: Dict):
-        """Afficher le rapport formaté"""
-        print("\n" + "="*70)
-        print("📊 RAPPORT DE TEST DE CHARGE - Owen'Snap")
-        print("="*70)
-        
-        print(f"\n⏱️  Temps total: {report['overall_stats']['total_time_seconds']}s")
-        print(f"📈 Débit: {report['overall_stats']['requests_per_second']} req/s")
-        print(f"❌ Erreurs: {report['overall_stats']['total_errors']} ({report['overall_stats']['error_rate_percent']}%)")
-        
-        print(f"\n🔍 {report['search_endpoint']['endpoint']}:")
-        if report['search_endpoint'].get('requests', 0) > 0:
-            print(f"   - Requêtes: {report['search_endpoint']['requests']}")
-            print(f"   - Min: {report['search_endpoint']['min_ms']}ms")
-            print(f"   - Avg: {report['search_endpoint']['avg_ms']}ms")
-            print(f"   - Median: {report['search_endpoint']['median_ms']}ms")
-            print(f"   - P95: {report['search_endpoint']['p95_ms']}ms")
-            print(f"   - P99: {report['search_endpoint']['p99_ms']}ms")
-            print(f"   - Max: {report['search_endpoint']['max_ms']}ms")
-        else:
-            print(f"   - {report['search_endpoint'].get('message', 'N/A')}")
-        
-        print(f"\n📤 {report['upload_endpoint']['endpoint']}:")
-        if report['upload_endpoint'].get('requests', 0) > 0:
-            print(f"   - Requêtes: {report['upload_endpoint']['requests']}")
-            print(f"   - Min: {report['upload_endpoint']['min_ms']}ms")
-            print(f"   - Avg: {report['upload_endpoint']['avg_ms']}ms")
-            print(f"   - Median: {report['upload_endpoint']['median_ms']}ms")
-            print(f"   - P95: {report['upload_endpoint']['p95_ms']}ms")
-            print(f"   - P99: {report['upload_endpoint']['p99_ms']}ms")
-            print(f"   - Max: {report['upload_endpoint']['max_ms']}ms")
-        else:
-            print(f"   - {report['upload_endpoint'].get('message', 'N/A')}")
-        
-        print(f"\n📊 Codes de statut:")
-        for code, count in sorted(report['status_codes'].items()):
-            print(f"   - {code}: {count}")
-        
-        print("\n" + "="*70)
+
+
+async def discover_targets(base_url: str, event_id: int, max_shares: int) -> Dict[str, List[str]]:
+    """Photos de l'événement (vignettes) et codes de partage existants"""
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
+        photos = await client.get(f"{API_PREFIX}/photos/event/{event_id}")
+        photo_ids = [p["_id"] for p in photos.json().get("photos", [])] if photos.status_code == 200 else []
+        shares = await client.get(f"{API_PREFIX}/shares", params={"event_id": event_id, "limit": max_shares})
+        share_codes = [
+            s["share_code"] for s in shares.json().get("shares", []) if not s.get("is_expired")
+        ] if shares.status_code == 200 else []
+    return {"photo_ids": photo_ids, "share_codes": share_codes}
+
+
+def print_report(report: Dict) -> None:
+    overall = report["overall"]
+    print("\n" + "=" * 78)
+    print("📊 RAPPORT DE TEST DE CHARGE (boucle ouverte) - Owen'Snap")
+    print("=" * 78)
+    print(f"\n⏱️  Durée: {overall['wall_seconds']}s | envoyées: {overall['sent']}"
+          f" | débit atteint: {overall['achieved_rate_per_second']} req/s")
+    print(f"⚠️  Perdues (client saturé): {overall['dropped_client_saturated']}"
+          f" | retard max du générateur: {overall['max_generator_lag_ms']} ms")
+    print(f"\n{'scénario':20s} {'n':>7s} {'p50':>9s} {'p90':>9s} {'p95':>9s} {'p99':>9s} {'p99.9':>9s} {'max':>9s}  codes")
+    for name, stats in report["scenarios"].items():
+        if not stats["count"]:
+            print(f"{name:20s} {0:7d}")
+            continue
+        print(f"{name:20s} {stats['count']:7d} {stats['p50_ms']:9.1f} {stats['p90_ms']:9.1f} {stats['p95_ms']:9.1f}"
+              f" {stats['p99_ms']:9.1f} {stats['p99_9_ms']:9.1f} {stats['max_ms']:9.1f}  {stats['status_codes']}")
+    print("\n(latences en ms, depuis l'heure d'arrivée prévue)")
+    print("=" * 78)
+
 
 def main():
-    """Exécuter le test de charge"""
-    import argparse
-    
-    parser = argparse.ArgumentParser(description="Test de charge Owen'Snap")
-    parser.add_argument("--users", type=int, default=100, help="Nombre d'utilisateurs")
-    parser.add_argument("--requests", type=int, default=10, help="Requêtes par utilisateur")
+    parser = argparse.ArgumentParser(description="Test de charge Owen'Snap (boucle ouverte)")
     parser.add_argument("--url", default="http://localhost:8000", help="URL de base")
-    
+    parser.add_argument("--event-id", type=int, required=True, help="ID (entier) de l'événement ciblé")
+    parser.add_argument("--duration", type=float, default=60, help="Durée d'injection (s)")
+    parser.add_argument("--profile", choices=("constant", "ramp", "step", "spike"), default="constant")
+    parser.add_argument("--rate", type=float, default=10, help="Débit cible (req/s), palier final du ramp/step")
+    parser.add_argument("--start-rate", type=float, default=1, help="Débit initial (ramp / step)")
+    parser.add_argument("--ramp", type=float, default=60, help="Durée de la montée (ramp / step, s)")
+    parser.add_argument("--steps", type=int, default=4, help="Nombre de paliers (step)")
+    parser.add_argument("--spike-at", type=float, default=30, help="Début du pic (spike, s)")
+    parser.add_argument("--spike-seconds", type=float, default=10)
+    parser.add_argument("--spike-factor", type=float, default=5)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Poids des scénarios (nom=poids,...)")
+    parser.add_argument("--selfies", type=Path, default=Path("../poc-test/photos-toutes"),
+                        help="Dossier de selfies pour la recherche kiosque")
+    parser.add_argument("--upload-photos", type=Path, default=Path("../poc-test/photos-toutes"),
+                        help="Dossier de photos pour les uploads")
+    parser.add_argument("--gallery-page", type=int, default=12, help="Vignettes par page de galerie")
+    parser.add_argument("--upload-batch", type=int, default=10, help="Photos par upload en masse")
+    parser.add_argument("--threshold", type=float, default=0.55)
+    parser.add_argument("--connections", type=int, default=100, help="Taille du pool de connexions")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", type=Path, default=Path("load_test_report.json"))
     args = parser.parse_args()
-    
-    tester = LoadTester(
+
+    profile = ArrivalProfile(
+        args.profile, args.rate, start_rate=args.start_rate, ramp_seconds=args.ramp, steps=args.steps,
+        spike_at=args.spike_at, spike_seconds=args.spike_seconds, spike_factor=args.spike_factor
+    )
+    mix = parse_mix(args.mix)
+    targets = asyncio.run(discover_targets(args.url, args.event_id, max_shares=50))
+    print(f"\n🚀 Boucle ouverte : profil {args.profile}, {args.rate} req/s, {args.duration}s")
+    print(f"   - {len(targets['photo_ids'])} photos pour les vignettes, {len(targets['share_codes'])} partages")
+    print(f"   - mix: {mix}")
+
+    generator = OpenLoopLoadGenerator(
         base_url=args.url,
-        num_users=args.users,
-        requests_per_user=args.requests
+        event_id=args.event_id,
+        profile=profile,
+        duration=args.duration,
+        mix=mix,
+        selfies=load_images(args.selfies, limit=20),
+        uploads=load_images(args.upload_photos, limit=20) if mix.get("bulk_upload") else [],
+        photo_ids=targets["photo_ids"],
+        share_codes=targets["share_codes"],
+        gallery_page=args.gallery_page,
+        upload_batch=args.upload_batch,
+        threshold=args.threshold,
+        max_connections=args.connections,
+        max_in_flight=args.max_in_flight,
+        seed=args.seed
     )
-    
-    report = tester.run_load_test()
-    
-    # Sauvegarder le rapport
-    with open("load_test_report.json", "w") as f:
-        json.dump(report, f, indent=2)
-    
-    print(f"\n✅ Rapport sauvegardé dans load_test_report.json")
+    report = asyncio.run(generator.run())
+    print_report(report)
+
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"\n✅ Rapport sauvegardé dans {args.output}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,70 @@
+"""
+Génération d'embeddings synthétiques pour les benchmarks
+Identités regroupées : chaque visage est un tirage bruité du centre de son
+identité, L2-normalisé comme les embeddings ArcFace stockés
+"""
+from typing import Tuple
+
+import numpy as np
+
+# Génération par blocs pour borner la mémoire (1M x 512 float32 = 2 Go)
+CHUNK_ROWS = 100_000
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix
+
+
+def sample_identity_faces(
+    rng: np.random.Generator,
+    centers: np.ndarray,
+    identities: np.ndarray,
+    min_similarity: float,
+    max_similarity: float
+) -> np.ndarray:
+    """Visages bruités autour des centres : cos(visage, centre) ~ U(min, max)"""
+    dim = centers.shape[1]
+    cos = rng.uniform(min_similarity, max_similarity, len(identities)).astype(np.float32)
+    # |bruit| tel que cos(centre + bruit, centre) = cos (bruit ~ orthogonal en grande dimension)
+    noise_norm = np.sqrt(1.0 / cos ** 2 - 1.0)
+    noise = _normalize(rng.standard_normal((len(identities), dim), dtype=np.float32))
+    faces = centers[identities] + noise * noise_norm[:, None]
+    return _normalize(faces)
+
+
+def clustered_embeddings(
+    n_faces: int,
+    n_identities: int,
+    dim: int = 512,
+    seed: int = 0,
+    min_similarity: float = 0.6,
+    max_similarity: float = 0.95
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns:
+        (embeddings (n_faces, dim), identité de chaque visage, centres des identités)
+    """
+    rng = np.random.default_rng(seed)
+    centers = _normalize(rng.standard_normal((n_identities, dim), dtype=np.float32))
+    identities = rng.integers(0, n_identities, n_faces)
+
+    embeddings = np.empty((n_faces, dim), dtype=np.float32)
+    for start in range(0, n_faces, CHUNK_ROWS):
+        stop = min(start + CHUNK_ROWS, n_faces)
+        embeddings[start:stop] = sample_identity_faces(
+            rng, centers, identities[start:stop], min_similarity, max_similarity
+        )
+    return embeddings, identities, centers
+
+
+def query_embeddings(centers: np.ndarray, n_queries: int, seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """Selfies kiosque synthétiques : un nouveau tirage d'identités existantes"""
+    rng = np.random.default_rng(seed)
+    identities = rng.integers(0, len(centers), n_queries)
+    return sample_identity_faces(rng, centers, identities, 0.75, 0.95), identities
+
+
+def synthetic_ids(n: int, offset: int = 0) -> np.ndarray:
+    """Ids au format ObjectId hex (24 caractères) en tableau d'octets fixes"""
+    return np.array([f"{offset + i:024x}" for i in range(n)], dtype='S24')